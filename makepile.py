@@ -227,8 +227,8 @@ def test():
     r"""
     Applies unit testing.
     """
-    path = "tests/test_sample.py"
-    cmd = "python " + os.path.normpath(path)
+    path = "tests"
+    cmd = "python -m unittest discover -s " + os.path.normpath(path) + ' -p "test_*.py"'
     print(cmd)
     os.system(cmd)
 
@@ -28,9 +28,14 @@ if _MODULE_PATH not in sys.path:
 # import should be placed at the top of the module.
 import spyondemain  # # pylint: disable=C0413
 
+# "spyonde.spyondemain" (the console script) and "spyondemain" (the other modules)
+# must be the same module, otherwise they would have different ConvertOptions.
+sys.modules[__name__ + ".spyondemain"] = spyondemain
+
 def convert_file(input_file_name, output_file_name=None):
     """
     Converts a .py file to a .ipynb file.
     .py file must be written in a specific format to be converter.
     """
-    spyondemain.convert_file(input_file_name, output_file_name)
+    options = spyondemain.ConvertOptions(output=output_file_name)
+    spyondemain.convert_file(input_file_name, options)
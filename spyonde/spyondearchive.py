@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reads .py files from, and writes notebooks to, zip and tar archives.
+
+    spyonde --overwrite --archive course.zip lectures/*.py
+    spyonde --overwrite course-sources.tar.gz
+
+The notebooks are written to the archive as they are converted,
+without a file for each notebook, so a bulk conversion is a single sequential write
+instead of creating thousands of small files.
+The files and the members that can not be converted are reported and skipped,
+and the archive is renamed into place when it is complete.
+The .py members of input archives are converted in memory,
+without extracting them.
+"""
+
+import io
+import os
+import tarfile
+import time
+import tokenize
+import zipfile
+
+import spyondemain  # pylint: disable=E0401
+
+# the errors of a file that can not be converted, the others are not skipped.
+_CONVERSION_ERRORS = (OSError, SyntaxError, tokenize.TokenError, UnicodeDecodeError, ValueError)
+
+# suffix: tarfile mode for streaming writes, None for zip.
+_ARCHIVE_SUFFIXES = {
+    ".zip": None,
+    ".tar": "w|",
+    ".tar.gz": "w|gz",
+    ".tgz": "w|gz",
+    ".tar.bz2": "w|bz2",
+    ".tar.xz": "w|xz",
+}
+
+
+def _archive_suffix(file_name):
+    """
+    Returns the archive suffix of a file name, or None.
+    """
+    lower_name = file_name.lower()
+    for suffix in _ARCHIVE_SUFFIXES:
+        if lower_name.endswith(suffix):
+            return suffix
+    return None
+
+
+def is_archive(file_name):
+    """
+    Returns True if the file name has the extension of a supported archive.
+
+    :type file_name: str
+    """
+    assert isinstance(file_name, str)
+    return _archive_suffix(file_name) is not None
+
+
+def member_name(path):
+    """
+    Returns a safe member name for a path: relative, with forward slashes,
+    and without "..", so extracting the archive can not write elsewhere.
+
+    :type path: str
+    """
+    assert isinstance(path, str)
+    path = path.replace("\\", "/")
+    parts = [x for x in path.split("/") if x and x not in (".", "..")]
+    if parts and parts[0].endswith(":"):
+        # a Windows drive.
+        parts = parts[1:]
+    return "/".join(parts)
+
+
+def iter_archive_py_files(archive_file_name):
+    """
+    Yields the .py members of a zip or tar archive as (name, bytes) tuples.
+    Tar archives are read sequentially, so compressed tar files
+    are decompressed only once.
+
+    :type archive_file_name: str
+    """
+    assert isinstance(archive_file_name, str)
+
+    if _archive_suffix(archive_file_name) == ".zip":
+        with zipfile.ZipFile(archive_file_name) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.endswith(".py"):
+                    yield info.filename, archive.read(info)
+        return
+
+    with tarfile.open(archive_file_name, "r|*") as archive:
+        for info in archive:
+            if info.isfile() and info.name.endswith(".py"):
+                yield info.name, archive.extractfile(info).read()
+
+
+class ArchiveWriter:
+    """
+    Writes text files to a zip or tar archive, one member at a time.
+    The type of the archive is selected by the extension of its name.
+
+        with ArchiveWriter("course.zip") as writer:
+            writer.add("demo.py.gen.ipynb", output_as_str)
+
+    The file written is file_name if it is given, such as a temporary file,
+    the type of the archive is still selected by archive_file_name.
+    """
+
+    def __init__(self, archive_file_name, file_name=None):
+        suffix = _archive_suffix(archive_file_name)
+        if suffix is None:
+            raise ValueError("not a zip or tar file name: " + archive_file_name)
+        file_name = file_name or archive_file_name
+        self.names = set()
+        self.mode = _ARCHIVE_SUFFIXES[suffix]
+        if self.mode is None:
+            self.archive = zipfile.ZipFile(file_name, "w", zipfile.ZIP_DEFLATED)
+        else:
+            self.archive = tarfile.open(file_name, self.mode)
+
+    def add(self, name, text):
+        """
+        Adds a member, returns False if the name is already in the archive.
+
+        :type name: str
+        :type text: str
+        """
+        name = member_name(name)
+        if name in self.names:
+            return False
+        self.names.add(name)
+
+        data = text.encode("utf8")
+        if self.mode is None:
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            self.archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self.archive.addfile(info, io.BytesIO(data))
+        return True
+
+    def close(self):
+        """
+        Finishes the archive.
+        """
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def generate_archive_file_name(input_archive_file_name):
+    """
+    Generates the output archive name for an input archive.
+
+    :type input_archive_file_name: str
+    """
+    assert isinstance(input_archive_file_name, str)
+    return input_archive_file_name + ".gen.zip"
+
+
+def iter_notebooks(file_names, options):
+    """
+    Converts the .py files and the .py members of archives,
+    and yields (member_name, output_as_str) tuples.
+    Files skipped because of onlymulticell, and with options.validate,
+    invalid notebooks are not yielded.
+    The files, the archives and the members that can not be read or converted
+    are reported and skipped.
+
+    :type file_names: list
+    :type options: ConvertOptions
+    """
+    for file_name in file_names:
+        if not os.path.isfile(file_name):
+            print("NOT a file: ", file_name)
+        elif is_archive(file_name):
+            try:
+                for name, content in iter_archive_py_files(file_name):
+                    notebook = _convert_member(file_name, name, content, options)
+                    if notebook is not None:
+                        yield notebook
+            except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as ex:
+                # the members before the error are kept.
+                print("archive could not be read:", file_name, ex)
+        else:
+            try:
+                _, output_as_str = spyondemain.file_to_notebook(file_name, options)
+            except _CONVERSION_ERRORS as ex:
+                print("file could not be converted:", file_name, ex)
+                continue
+            output_file_name = spyondemain.generate_output_file_name(file_name)
+            if output_as_str is not None and spyondemain.notebook_is_valid(output_file_name, output_as_str, options):
+                yield output_file_name, output_as_str
+
+
+def _convert_member(archive_file_name, name, content, options):
+    """
+    Converts a .py member of an archive,
+    returns (member_name, output_as_str), or None if it is skipped.
+    """
+    if options.onlymulticell and not spyondemain.content_may_have_multiple_cells(content):
+        return None
+    try:
+        output_as_str = spyondemain.convert_text(content.decode("utf-8-sig"), options)
+    except _CONVERSION_ERRORS as ex:
+        print("file could not be converted:", archive_file_name, name, ex)
+        return None
+    output_file_name = spyondemain.generate_output_file_name(name)
+    if output_as_str is None or not spyondemain.notebook_is_valid(output_file_name, output_as_str, options):
+        return None
+    return output_file_name, output_as_str
+
+
+def convert_to_archive(file_names, archive_file_name, options):
+    """
+    Converts .py files and the .py members of archives,
+    and writes the notebooks to a single archive.
+    Returns the number of notebooks written, or None if it is not written.
+
+    :type file_names: list
+    :type archive_file_name: str
+    :type options: ConvertOptions
+    """
+    assert isinstance(file_names, list)
+    assert isinstance(archive_file_name, str)
+    assert isinstance(options, spyondemain.ConvertOptions)
+
+    if not spyondemain.confirm_overwrite(archive_file_name, options):
+        print("file is not written.")
+        return None
+
+    count = 0
+    # an archive is not left half written.
+    temp_file_name = spyondemain.create_temporary_file(archive_file_name)
+    try:
+        with ArchiveWriter(archive_file_name, temp_file_name) as writer:
+            for name, output_as_str in iter_notebooks(file_names, options):
+                if writer.add(name, output_as_str):
+                    count += 1
+                else:
+                    print("duplicate name, skipped: ", name)
+        os.replace(temp_file_name, archive_file_name)
+    finally:
+        if os.path.isfile(temp_file_name):
+            os.remove(temp_file_name)
+    print("notebooks in archive:", count)
+    print("created: ", archive_file_name)
+    return count
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+Converts many files concurrently from asyncio code, such as web services.
+
+    async for result in spyondeasync.convert_many(file_names, concurrency=4):
+        print(result["input"], result["status"])
+
+Files are read and written in threads, and the conversion itself
+runs in an executor, so the event loop is never blocked.
+The default executor is a thread pool, pass a process pool to convert on multiple cores.
+Nothing is asked to the user, existing files are only overwritten on request.
+"""
+
+import asyncio
+import collections
+import os
+
+import spyondemain  # pylint: disable=E0401
+
+STATUS_WRITTEN = "written"
+STATUS_CONVERTED = "converted"
+STATUS_EXISTS = "exists"
+STATUS_SINGLE_CELL = "single-cell"
+STATUS_FAILED = "failed"
+
+# Python 3.5 and 3.6 have no get_running_loop(), their get_event_loop() in a coroutine is the running loop.
+_get_running_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+
+
+def _read_item(item):
+    """
+    Reads a path or a buffer and returns its contents as bytes.
+    """
+    if isinstance(item, str):
+        with open(item, "rb") as handle:
+            return handle.read()
+    if isinstance(item, (bytes, bytearray)):
+        return bytes(item)
+    content = item.read()
+    if isinstance(content, str):
+        content = content.encode("utf8")
+    return content
+
+
+def _write_file(output_file_name, output_as_str, overwrite):
+    """
+    Writes a notebook, returns False if the file exists and overwrite is False.
+    """
+    if not overwrite and os.path.isfile(output_file_name):
+        return False
+    with open(output_file_name, "w", encoding="utf8") as handle:
+        handle.write(output_as_str)
+    return True
+
+
+async def convert_one(item, pyversion="3.7.4", onlymulticell=True,
+                      overwrite=False, executor=None):
+    """
+    Converts a single path or buffer, see convert_many() for the details.
+    Returns a result dictionary.
+    """
+    loop = _get_running_loop()
+    result = {
+        "input": item,
+        "output": None,
+        "notebook": None,
+        "status": STATUS_CONVERTED,
+        "error": None,
+    }
+
+    try:
+        content = await loop.run_in_executor(None, _read_item, item)
+        if onlymulticell and not spyondemain.content_may_have_multiple_cells(content):
+            result["status"] = STATUS_SINGLE_CELL
+            return result
+
+        text = content.decode("utf-8-sig")
+        options = spyondemain.ConvertOptions(
+            pyversion=pyversion, overwrite_confirmed=overwrite, onlymulticell=onlymulticell)
+        # the includes of a path are relative to it, and confined to its directory.
+        base_dir = os.path.dirname(os.path.abspath(item)) if isinstance(item, str) else None
+        output_as_str = await loop.run_in_executor(
+            executor, spyondemain.convert_text, text, options, None, base_dir)
+        if output_as_str is None:
+            result["status"] = STATUS_SINGLE_CELL
+            return result
+        result["notebook"] = output_as_str
+
+        if isinstance(item, str):
+            output_file_name = spyondemain.generate_output_file_name(item)
+            result["output"] = output_file_name
+            written = await loop.run_in_executor(
+                None, _write_file, output_file_name, output_as_str, overwrite)
+            result["status"] = STATUS_WRITTEN if written else STATUS_EXISTS
+    except asyncio.CancelledError:
+        # it is an Exception before Python 3.8, a cancelled item is not a failed one.
+        raise
+    except Exception as ex:  # pylint: disable=W0703
+        # W0703: catching too general exception.
+        # a broken file should not stop the other conversions.
+        result["status"] = STATUS_FAILED
+        result["error"] = ex
+
+    return result
+
+
+class _Conversions:
+    """
+    The asynchronous iterator of convert_many().
+    It is not an asynchronous generator, they need Python 3.6.
+    """
+
+    def __init__(self, paths_or_buffers, concurrency, arguments):
+        self.items = iter(paths_or_buffers)
+        self.concurrency = concurrency
+        # (pyversion, onlymulticell, overwrite, executor) of convert_one().
+        self.arguments = arguments
+        self.exhausted = False
+        self.running = set()
+        self.done = collections.deque()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            while not self.done:
+                while not self.exhausted and len(self.running) < self.concurrency:
+                    try:
+                        item = next(self.items)
+                    except StopIteration:
+                        self.exhausted = True
+                        break
+                    self.running.add(asyncio.ensure_future(convert_one(item, *self.arguments)))
+
+                if not self.running:
+                    raise StopAsyncIteration
+
+                done, self.running = await asyncio.wait(self.running, return_when=asyncio.FIRST_COMPLETED)
+                self.done.extend(done)
+            return self.done.popleft().result()
+        except BaseException:
+            # the consumer is cancelled, the items are cancelled too.
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        """
+        Cancels the items that are not yet completed.
+        """
+        self.exhausted = True
+        self.done.clear()
+        running, self.running = self.running, set()
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.wait(running)
+
+
+def convert_many(paths_or_buffers, concurrency=4, pyversion="3.7.4",
+                 onlymulticell=True, overwrite=False, executor=None):
+    """
+    Converts paths or buffers concurrently,
+    and returns an asynchronous iterator yielding a result dictionary
+    as soon as each one is completed.
+    At most concurrency items are being converted at any time.
+
+        async for result in convert_many(file_names):
+            print(result["status"])
+
+    :param paths_or_buffers: an iterable of items.
+        A str is a path of a .py file, and the notebook is written next to it.
+        bytes or file-like objects (io.BytesIO, io.StringIO)
+        are converted in memory and nothing is written,
+        their include directives are not expanded.
+        The includes of a path can only be in its directory.
+    :type concurrency: int
+    :type pyversion: str
+    :type onlymulticell: bool
+    :type overwrite: bool
+    :param overwrite: if False, existing notebooks are not overwritten,
+        and their status is "exists". The user is never asked.
+    :param executor: a concurrent.futures executor for the conversion.
+        The default executor of the loop is used if it is None.
+        It is a thread pool, the event loop is not blocked, but the conversions
+        are Python code and share a single core because of the GIL.
+        A ProcessPoolExecutor spreads the conversions to multiple cores.
+
+    Result dictionaries are like:
+
+    {
+        'input': 'demo.py',
+        'output': 'demo.py.gen.ipynb',
+        'notebook': '{"cells": ...}',
+        'status': 'written',
+        'error': None
+    }
+
+    status is one of "written", "converted" (buffers), "exists",
+    "single-cell" and "failed", the exception is in "error" if it failed.
+
+    When the consumer is cancelled, or calls aclose() of the iterator
+    after it stops iterating, the items that are not yet completed are cancelled.
+    """
+    assert isinstance(concurrency, int)
+    assert concurrency > 0
+    return _Conversions(paths_or_buffers, concurrency, (pyversion, onlymulticell, overwrite, executor))
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+
+"""
+Embeds the local images of the markdown cells as notebook attachments.
+
+    spyonde --overwrite --embed-images lecture.py
+
+An image reference like ![plot](img/plot.png) becomes ![plot](attachment:plot.png),
+and the image is stored in the "attachments" of the cell,
+so the notebook can be moved or archived without its images.
+
+The base64 encodings are cached by the hash of the image file,
+in memory for the last IMAGE_MEMORY_CACHE_SIZE images and on disk for the later runs.
+The hash of a file is found by its path, size and modification time,
+so an image shared by many lectures is read and encoded once.
+"""
+
+import base64
+import collections
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+
+__CELL_TYPE_MARKDOWN = "markdown"
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "spyonde", "attachments")
+
+_MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".svg": "image/svg+xml",
+    ".webp": "image/webp",
+    ".bmp": "image/bmp",
+}
+
+# ![alt](path "title"), only the path is replaced.
+_IMAGE_PATTERN = re.compile(r'(!\[[^\]]*\]\(\s*)([^)\s]+)((?:\s+"[^"]*")?\s*\))')
+_ATTACHMENT_PREFIX = "attachment:"
+
+# the number of images kept in memory, see encode_image().
+IMAGE_MEMORY_CACHE_SIZE = 128
+
+
+class _LruCache:
+    """
+    A dictionary keeping the last maxsize items used, shared by the threads.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the value of a key, or None.
+        """
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """
+        Sets the value of a key, and removes the least recently used one if it is full.
+        """
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all the items.
+        """
+        with self.lock:
+            self.items.clear()
+
+
+# these are shared by the threads converting the files,
+# and bounded, "spyonde serve" and "spyonde live" run for a long time.
+# a race only computes the same value twice.
+_HASHES = _LruCache(IMAGE_MEMORY_CACHE_SIZE * 8)  # (path, size, mtime_ns): hash
+_ENCODINGS = _LruCache(IMAGE_MEMORY_CACHE_SIZE)  # hash: base64 string
+
+
+def is_local_image(path):
+    """
+    Returns True if the path of an image reference is a local image file name,
+    not a URL or an attachment.
+
+    :type path: str
+    """
+    assert isinstance(path, str)
+    if re.match(r'[a-zA-Z][a-zA-Z0-9+.-]*:', path) and not re.match(r'[a-zA-Z]:[\\/]', path):
+        # http:, data:, attachment: and the others, but not C:\ on Windows.
+        return False
+    return os.path.splitext(path)[1].lower() in _MIME_TYPES
+
+
+def _stat_cache_file_name(cache_dir, stat_key):
+    """
+    Returns the file name keeping the hash of a file on disk.
+    """
+    key = hashlib.sha1(repr(stat_key).encode("utf8")).hexdigest()
+    return os.path.join(cache_dir, "files", key[:2], key + ".json")
+
+
+def _encoding_cache_file_name(cache_dir, hash1):
+    """
+    Returns the file name keeping the base64 encoding of an image on disk.
+    """
+    return os.path.join(cache_dir, hash1[:2], hash1 + ".b64")
+
+
+def _write_cache_file(file_name, text):
+    """
+    Writes a cache file, the last writer wins.
+    The cache is only an optimization, so a failure is ignored.
+    """
+    try:
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        # a unique temporary file, the threads and processes writing the same entry do not clash.
+        handle, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(file_name))
+        try:
+            with os.fdopen(handle, "w", encoding="ascii") as file1:
+                file1.write(text)
+            os.replace(temp_file_name, file_name)
+        except OSError:
+            os.remove(temp_file_name)
+            raise
+    except OSError:
+        pass
+
+
+def encode_image(file_name, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Returns (hash, base64 string) of an image file,
+    or None if it can not be read.
+
+    :type file_name: str
+    :type cache_dir: str
+    :param cache_dir: the directory of the disk cache, None to disable it.
+    """
+    assert isinstance(file_name, str)
+
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    stat_key = (os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns)
+
+    hash1 = _HASHES.get(stat_key)
+    if hash1 is None and cache_dir:
+        try:
+            with open(_stat_cache_file_name(cache_dir, stat_key), "r", encoding="ascii") as handle:
+                hash1 = json.load(handle)["hash"]
+        except (OSError, ValueError, KeyError):
+            hash1 = None
+    if hash1 is not None:
+        encoded = _ENCODINGS.get(hash1)
+        if encoded is None and cache_dir:
+            try:
+                with open(_encoding_cache_file_name(cache_dir, hash1), "r", encoding="ascii") as handle:
+                    encoded = handle.read()
+            except OSError:
+                encoded = None
+        if encoded is not None:
+            _HASHES.put(stat_key, hash1)
+            _ENCODINGS.put(hash1, encoded)
+            return hash1, encoded
+
+    try:
+        with open(file_name, "rb") as handle:
+            content = handle.read()
+    except OSError:
+        return None
+    hash1 = hashlib.sha1(content).hexdigest()
+    encoded = _ENCODINGS.get(hash1)
+    if encoded is None:
+        encoded = base64.b64encode(content).decode("ascii")
+        if cache_dir:
+            _write_cache_file(_encoding_cache_file_name(cache_dir, hash1), encoded)
+    if cache_dir:
+        _write_cache_file(_stat_cache_file_name(cache_dir, stat_key), json.dumps({"hash": hash1}))
+    _HASHES.put(stat_key, hash1)
+    _ENCODINGS.put(hash1, encoded)
+    return hash1, encoded
+
+
+def embed_images(cell, base_dir, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Embeds the local images of a markdown cell as attachments.
+    Returns the number of images embedded.
+
+    :type cell: dict
+    :param cell: a cell dictionary, it is modified in place.
+    :type base_dir: str
+    :param base_dir: relative image paths are relative to it.
+    :type cache_dir: str
+
+    The images that can not be read are left as they are.
+    """
+    assert isinstance(cell, dict)
+    assert isinstance(base_dir, str)
+
+    if cell.get("cell_type") != __CELL_TYPE_MARKDOWN:
+        return 0
+
+    attachments = {}
+    hashes_by_name = {}
+    count = [0]
+
+    def replace(match):
+        path = match.group(2)
+        if not is_local_image(path):
+            return match.group(0)
+        result = encode_image(os.path.join(base_dir, path), cache_dir)
+        if result is None:
+            return match.group(0)
+        hash1, encoded = result
+        name = os.path.basename(path)
+        if hashes_by_name.get(name, hash1) != hash1:
+            # another image with the same name.
+            name = hash1[:8] + "-" + name
+        hashes_by_name[name] = hash1
+        attachments[name] = {_MIME_TYPES[os.path.splitext(path)[1].lower()]: encoded}
+        count[0] += 1
+        return match.group(1) + _ATTACHMENT_PREFIX + name + match.group(3)
+
+    source = [_IMAGE_PATTERN.sub(replace, x) if "![" in x else x for x in cell["source"]]
+    if count[0]:
+        cell["source"] = source
+        cell["attachments"] = attachments
+    return count[0]
+
+
+def embed_cell_images(all_cells_list, base_dir, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Embeds the local images of all the markdown cells, see embed_images().
+    Returns the number of images embedded.
+
+    :type all_cells_list: list
+    :type base_dir: str
+    :type cache_dir: str
+    """
+    assert isinstance(all_cells_list, list)
+    return sum(embed_images(cell, base_dir, cache_dir) for cell in all_cells_list)
+
+
+def resolve_attachments(cell):
+    """
+    Returns the source lines of a cell with the attachment references
+    replaced by data URLs, for the formats without attachments.
+
+    :type cell: dict
+    """
+    assert isinstance(cell, dict)
+
+    attachments = cell.get("attachments")
+    if not attachments:
+        return list(cell["source"])
+
+    def replace(match):
+        path = match.group(2)
+        bundle = attachments.get(path[len(_ATTACHMENT_PREFIX):]) if path.startswith(_ATTACHMENT_PREFIX) else None
+        if not bundle:
+            return match.group(0)
+        mimetype, encoded = next(iter(bundle.items()))
+        if isinstance(encoded, list):
+            encoded = "".join(encoded)
+        return match.group(1) + "data:%s;base64,%s" % (mimetype, encoded) + match.group(3)
+
+    return [_IMAGE_PATTERN.sub(replace, x) for x in cell["source"]]
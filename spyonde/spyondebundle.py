@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bundles the .py files of a directory into a single notebook.
+
+    spyonde bundle workshop -o workshop.ipynb
+
+The files are read and split concurrently, sorted by their paths,
+and a heading cell with the path of each file is put before its cells.
+The cells are streamed to the output file as the files are parsed,
+so the whole notebook is never in memory.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import os
+import tokenize
+
+import spyondemain  # pylint: disable=E0401
+
+__CELL_TYPE_MARKDOWN = "markdown"
+
+
+def read_source_cells(input_file_name):
+    """
+    Splits and parses a .py file, returns the result of parse_cells().
+    Empty files give an empty list.
+
+    :type input_file_name: str
+    """
+    assert isinstance(input_file_name, str)
+    cells = spyondemain.split_to_cells(input_file_name)
+    input_path = os.path.abspath(input_file_name)
+    cells = spyondemain.expand_includes(cells, os.path.dirname(input_path), (input_path,))
+    cells = [x for x in cells if spyondemain.is_list_having_non_empty_items(x)]
+    if not cells:
+        return []
+    return spyondemain.parse_cells(cells)
+
+
+def heading_cell(relative_path):
+    """
+    Returns the markdown cell dictionary put before the cells of a file.
+
+    :type relative_path: str
+    """
+    assert isinstance(relative_path, str)
+    # forward slashes, so the notebook is the same on every platform.
+    title = relative_path.replace(os.sep, "/")
+    return spyondemain.build_cell_dict((__CELL_TYPE_MARKDOWN, ["# " + title]))
+
+
+def iter_bundle_cells(topdir, file_names, max_workers=None, bundled_files=None):
+    """
+    Yields the cell dictionaries of the bundle.
+
+    :type topdir: str
+    :param topdir: the paths in the headings are relative to it.
+    :type file_names: list
+    :param file_names: the .py files, in the order of the bundle.
+    :param max_workers: the number of threads reading the files.
+    :type bundled_files: list
+    :param bundled_files: if it is given, the files with cells are appended to it.
+
+    The files are parsed in a thread pool,
+    and their cells are yielded in the order of file_names.
+    At most twice as many files as the threads are parsed ahead of the cells yielded,
+    so the parsed files are not all in memory.
+    """
+    assert isinstance(topdir, str)
+    assert isinstance(file_names, list)
+
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    pending = collections.deque()  # (file_name, future)
+    index = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while index < len(file_names) or pending:
+            while index < len(file_names) and len(pending) < 2 * max_workers:
+                pending.append((file_names[index], executor.submit(read_source_cells, file_names[index])))
+                index += 1
+            file_name, future = pending.popleft()
+            data = future.result()
+            if not data:
+                continue
+            if bundled_files is not None:
+                bundled_files.append(file_name)
+            yield heading_cell(os.path.relpath(file_name, topdir))
+            for cell_dict in spyondemain.build_cell_dicts(data):
+                yield cell_dict
+
+
+def bundle(topdir, output_file_name, pyversion="3.7.4"):
+    """
+    Writes the notebook bundling the .py files under topdir.
+    Returns the number of files bundled, the files without cells are not counted.
+
+    :type topdir: str
+    :type output_file_name: str
+    :type pyversion: str
+    """
+    assert isinstance(topdir, str)
+    assert isinstance(output_file_name, str)
+
+    output_path = os.path.abspath(output_file_name)
+    file_names = [x for x in spyondemain.find_py_files(topdir) if os.path.abspath(x) != output_path]
+    # sorted by the path in the heading, so the order is the same on every platform.
+    file_names.sort(key=lambda x: os.path.relpath(x, topdir).replace(os.sep, "/"))
+
+    # a file that can not be parsed should not leave half a notebook.
+    temp_file_name = spyondemain.create_temporary_file(output_file_name)
+    bundled_files = []
+    try:
+        with open(temp_file_name, "w", encoding="utf8") as handle:
+            cells = iter_bundle_cells(topdir, file_names, bundled_files=bundled_files)
+            for chunk in spyondemain.iter_notebook_chunks(cells, pyversion):
+                handle.write(chunk)
+        os.replace(temp_file_name, output_file_name)
+    finally:
+        if os.path.isfile(temp_file_name):
+            os.remove(temp_file_name)
+    return len(bundled_files)
+
+
+def bundle_command_line(argv):
+    """
+    Runs "spyonde bundle" with the arguments after "bundle".
+
+    :type argv: list
+    """
+    parser = argparse.ArgumentParser(prog="spyonde bundle")
+
+    help1 = "The directory of the .py files."
+    parser.add_argument('dir', help=help1)
+
+    help1 = "The notebook to be written."
+    parser.add_argument('-o', '--output', help=help1, required=True)
+
+    help1 = 'The version string to be embedded into the Jupyter file. It is "3.7.4" by default.'
+    parser.add_argument('--nbversion', nargs='?', help=help1, default="3.7.4")
+
+    help1 = 'If provided, automatically confirms overwrite. It does not overwrites files by default.'
+    parser.add_argument('--overwrite', action='store_true', help=help1)
+
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.dir):
+        print("NOT a directory: ", args.dir)
+        return
+
+    options = spyondemain.ConvertOptions(output=args.output, overwrite_confirmed=args.overwrite)
+    if not spyondemain.confirm_overwrite(args.output, options):
+        print("file is not written.")
+        return
+
+    try:
+        count = bundle(args.dir, args.output, args.nbversion)
+    except (SyntaxError, tokenize.TokenError, UnicodeDecodeError, ValueError) as ex:
+        print("file could not be parsed:", ex)
+        print("file is not written.")
+        return
+    print("bundled files:", count)
+    print("created: ", args.output)
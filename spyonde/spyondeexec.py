@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+
+"""
+Executes the code cells of a notebook in a local Python subprocess.
+
+    spyonde --execute --overwrite lecture.py
+
+No Jupyter kernel is needed.
+The outputs of the cells are cached on disk, keyed by the hash of the cell
+and the code cells it depends on, so running an unchanged lecture again
+does not start Python at all, and after an edit only the changed cells
+and the cells using their names are executed again.
+The standard output, standard error and the repr() of the last expression
+of each cell are stored as nbformat outputs.
+"""
+
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import spyondeflow  # pylint: disable=E0401
+import spyondemain  # pylint: disable=E0401
+
+__CELL_TYPE_CODE = "code"
+_MARKER = "\0spyonde:"
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "spyonde", "outputs")
+
+# the program run by the subprocess.
+# it reads one JSON request per line and writes one marked JSON result per line,
+# after a line break.
+# user code can not read the requests, since sys.stdin is replaced.
+_DRIVER = r'''
+import ast, io, json, sys, traceback
+_requests, _results = sys.stdin, sys.stdout
+sys.stdin = io.StringIO()
+_namespace = {"__name__": "__main__"}
+for _request in _requests:
+    _source = json.loads(_request)["source"]
+    _stdout, _stderr = io.StringIO(), io.StringIO()
+    sys.stdout, sys.stderr = _stdout, _stderr
+    _result = {"stdout": "", "stderr": "", "repr": None, "error": None}
+    try:
+        _tree = ast.parse(_source, "<cell>")
+        _last = None
+        if _tree.body and isinstance(_tree.body[-1], ast.Expr):
+            _last = ast.Expression(_tree.body.pop().value)
+        exec(compile(_tree, "<cell>", "exec"), _namespace)
+        if _last is not None:
+            _value = eval(compile(_last, "<cell>", "eval"), _namespace)
+            if _value is not None:
+                _result["repr"] = repr(_value)
+    except BaseException as _ex:
+        _result["error"] = {
+            "ename": type(_ex).__name__,
+            "evalue": str(_ex),
+            "traceback": traceback.format_exception(type(_ex), _ex, _ex.__traceback__.tb_next),
+        }
+    finally:
+        sys.stdout, sys.stderr = _results, sys.__stderr__
+    _result["stdout"] = _stdout.getvalue()
+    _result["stderr"] = _stderr.getvalue()
+    # the marker starts a new line, after the output written without a line break.
+    _results.write("\n%s" + json.dumps(_result) + "\n")
+    _results.flush()
+''' % _MARKER.replace("\0", "\\0")
+
+
+def prefix_graph(count):
+    """
+    Returns a dependency graph where each cell depends on the cell before it,
+    so it depends on all the earlier cells.
+    See spyondeflow.dependency_graph() for the format.
+
+    :type count: int
+    """
+    return [{k - 1: ["*"]} if k else {} for k in range(count)]
+
+
+def cell_cache_keys(sources, graph):
+    """
+    Returns a cache key for each code cell.
+
+    :type sources: list
+    :param sources: the sources of the code cells.
+    :type graph: list
+    :param graph: the dependencies of the code cells.
+
+    The key of a cell depends on its source, the keys of the cells
+    it depends on, and the Python version that runs them.
+    So the key changes when a cell or any of its dependencies changes.
+    """
+    assert isinstance(sources, list)
+    assert isinstance(graph, list)
+
+    keys = []
+    for source, deps in zip(sources, graph):
+        key = hashlib.sha1(sys.version.encode("utf8"))
+        key.update(spyondemain.normalized_source_hash(source).encode("ascii"))
+        for j in sorted(deps):
+            key.update(keys[j].encode("ascii"))
+        keys.append(key.hexdigest())
+    return keys
+
+
+def _cache_file_name(cache_dir, key):
+    """
+    Returns the file name of a cache entry.
+    """
+    return os.path.join(cache_dir, key[:2], key + ".json")
+
+
+def read_cached_outputs(cache_dir, key):
+    """
+    Returns the cached outputs of a cell, or None if they are not cached.
+
+    :type cache_dir: str
+    :type key: str
+    """
+    try:
+        with open(_cache_file_name(cache_dir, key), "r", encoding="utf8") as handle:
+            return json.load(handle)["outputs"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def write_cached_outputs(cache_dir, key, outputs):
+    """
+    Writes the outputs of a cell to the cache.
+
+    :type cache_dir: str
+    :type key: str
+    :type outputs: list
+
+    The cache is only an optimization, so a failure is ignored.
+    """
+    file_name = _cache_file_name(cache_dir, key)
+    try:
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        # a unique temporary file, the threads and processes writing the same entry do not clash.
+        handle, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(file_name))
+        try:
+            with os.fdopen(handle, "w", encoding="utf8") as file1:
+                json.dump({"outputs": outputs}, file1)
+            # the last writer wins, the entries are the same.
+            os.replace(temp_file_name, file_name)
+        except OSError:
+            os.remove(temp_file_name)
+            raise
+    except OSError:
+        pass
+
+
+def build_outputs(result, execution_count):
+    """
+    Returns the nbformat outputs of a cell from a result of the subprocess.
+
+    :type result: dict
+    :type execution_count: int
+    """
+    outputs = []
+    for name in ["stdout", "stderr"]:
+        if result[name]:
+            outputs.append({
+                "name": name,
+                "output_type": "stream",
+                "text": result[name].splitlines(True),
+            })
+    if result["repr"] is not None:
+        outputs.append({
+            "data": {"text/plain": result["repr"].splitlines(True)},
+            "execution_count": execution_count,
+            "metadata": {},
+            "output_type": "execute_result",
+        })
+    if result["error"] is not None:
+        error = dict(result["error"])
+        error["output_type"] = "error"
+        outputs.append(error)
+    return outputs
+
+
+def error_output(ename, evalue):
+    """
+    Returns an nbformat error output without a traceback.
+
+    :type ename: str
+    :type evalue: str
+    """
+    return {
+        "ename": ename,
+        "evalue": evalue,
+        "output_type": "error",
+        "traceback": [],
+    }
+
+
+class CellRunner:
+    """
+    A Python subprocess that runs cells one by one, in the same namespace.
+    """
+
+    def __init__(self, working_dir):
+        env = dict(os.environ)
+        env["PYTHONIOENCODING"] = "utf8"
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", "-c", _DRIVER], cwd=working_dir, env=env,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        # Popen has encoding and errors only in Python 3.6 and later.
+        # the child processes of a cell may write anything to the file descriptor.
+        self.stdin = io.TextIOWrapper(self.process.stdin, encoding="utf8")
+        self.stdout = io.TextIOWrapper(self.process.stdout, encoding="utf8", errors="replace")
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self._read_lines, daemon=True)
+        self.reader.start()
+
+    def _read_lines(self):
+        """
+        Moves the lines of the subprocess to a queue, None at the end.
+        """
+        for line in self.stdout:
+            self.lines.put(line)
+        self.lines.put(None)
+
+    def run(self, source, timeout):
+        """
+        Runs the source of a cell, returns the result dictionary.
+        Raises queue.Empty if it takes longer than timeout seconds,
+        and RuntimeError if the subprocess dies.
+
+        :type source: str
+        :param timeout: seconds, or None to wait forever.
+        """
+        self.stdin.write(json.dumps({"source": source}) + "\n")
+        self.stdin.flush()
+        # the timeout is for the whole cell, not for each line of its output.
+        deadline = time.monotonic() + timeout if timeout else None
+
+        # the lines written directly to the file descriptor,
+        # such as the output of child processes, belong to stdout.
+        extra_stdout = []
+        while True:
+            if deadline is None:
+                line = self.lines.get()
+            else:
+                line = self.lines.get(timeout=max(deadline - time.monotonic(), 0))
+            if line is None:
+                raise RuntimeError("Python process exited")
+            if line.startswith(_MARKER):
+                result = json.loads(line[len(_MARKER):])
+                # without the line break written before the marker.
+                result["stdout"] = "".join(extra_stdout)[:-1] + result["stdout"]
+                return result
+            extra_stdout.append(line)
+
+    def close(self):
+        """
+        Stops the subprocess.
+        """
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.stdin.close()
+        self.stdout.close()
+
+
+def explain_plan(code_indices, graph, stale, needed):
+    """
+    Returns a line for each code cell, telling why it is executed or not.
+
+    :type code_indices: list
+    :param code_indices: the indices of the code cells in the notebook.
+    :type graph: list
+    :type stale: set
+    :param stale: the code cells that are not in the cache.
+    :type needed: set
+    :param needed: the code cells to be executed.
+
+    The cells are numbered by their position in the notebook, from 1.
+    """
+    lines = []
+    for k, i in enumerate(code_indices):
+        if k not in needed:
+            reason = "up to date, outputs from the cache"
+        elif k in stale:
+            stale_deps = [j for j in sorted(graph[k]) if j in stale]
+            if stale_deps:
+                reason = "executed, depends on " + ", ".join(
+                    "cell %d (%s)" % (code_indices[j] + 1, ", ".join(graph[k][j])) for j in stale_deps)
+            else:
+                reason = "executed, changed or not in the cache"
+        else:
+            reason = "executed again to rebuild the state, outputs from the cache"
+        lines.append("cell %d: %s" % (i + 1, reason))
+    return lines
+
+
+def _run_group(cells, sources, group, stale, keys, working_dir, timeout, cache_dir):
+    """
+    Runs a group of code cells in order, in a new subprocess.
+    Returns the number of stale cells executed.
+
+    :param cells: the cell dictionaries of the code cells.
+    """
+    executed = 0
+    runner = CellRunner(working_dir)
+    try:
+        for k in group:
+            cell = cells[k]
+            cell["execution_count"] = k + 1
+            try:
+                result = runner.run(sources[k], timeout)
+            except queue.Empty:
+                cell["outputs"] = [error_output("TimeoutError", "Cell execution timed out after %s seconds" % timeout)]
+                break
+            except (RuntimeError, OSError) as ex:
+                # the subprocess has exited, probably by sys.exit() in the cell.
+                cell["outputs"] = [error_output("RuntimeError", str(ex))]
+                break
+
+            if k not in stale:
+                # the cell is run for the state, it already has its cached outputs.
+                if result["error"] is not None:
+                    # the environment has changed, do not trust the cache.
+                    cell["outputs"] = build_outputs(result, k + 1)
+                    break
+                continue
+
+            executed += 1
+            cell["outputs"] = build_outputs(result, k + 1)
+            if result["error"] is not None:
+                break
+            if cache_dir:
+                write_cached_outputs(cache_dir, keys[k], cell["outputs"])
+    finally:
+        runner.close()
+    return executed
+
+
+def execute_cells(all_cells_list, working_dir=None, timeout=60, cache_dir=DEFAULT_CACHE_DIR,
+                  dataflow=True, jobs=1, explain=False):
+    """
+    Executes the code cells and stores their outputs in the cell dictionaries.
+    Returns a dictionary of counts: {"cached": 2, "executed": 3}
+
+    :type all_cells_list: list
+    :param all_cells_list: cell dictionaries, they are modified in place.
+    :type working_dir: str
+    :param working_dir: the current directory of the subprocess.
+    :param timeout: maximum seconds for each cell, None for no limit.
+    :type cache_dir: str
+    :param cache_dir: the cache directory, None to disable the cache.
+    :type dataflow: bool
+    :param dataflow: if True, a cell depends only on the cells that define
+        the names it uses, see spyondeflow.dependency_graph().
+        Otherwise, a cell depends on all the cells before it.
+    :type jobs: int
+    :param jobs: the number of cell groups without common dependencies
+        that can be executed at the same time, each in its own subprocess.
+    :type explain: bool
+    :param explain: if True, prints why each cell is executed or not.
+
+    If all the code cells are in the cache, no subprocess is started.
+    Otherwise, the changed cells and the cells depending on them are run,
+    in order, in a fresh subprocess.
+    The cells they depend on are run again to rebuild the state of the
+    interpreter, but their cached outputs are used.
+
+    Execution of a group stops at the first error or timeout,
+    the remaining changed cells are left without outputs.
+    Errors are not cached, so the cell runs again next time.
+    """
+    assert isinstance(all_cells_list, list)
+    assert jobs > 0
+
+    code_indices = [i for i, cell in enumerate(all_cells_list) if cell["cell_type"] == __CELL_TYPE_CODE]
+    cells = [all_cells_list[i] for i in code_indices]
+    sources = ["".join(cell["source"]) for cell in cells]
+    if dataflow:
+        graph = spyondeflow.dependency_graph(sources)
+    else:
+        graph = prefix_graph(len(sources))
+    keys = cell_cache_keys(sources, graph)
+
+    stale = set()
+    for k, cell in enumerate(cells):
+        outputs = read_cached_outputs(cache_dir, keys[k]) if cache_dir else None
+        if outputs is None:
+            stale.add(k)
+        else:
+            cell["outputs"] = outputs
+            cell["execution_count"] = k + 1
+
+    needed = stale | spyondeflow.ancestors(graph, stale)
+
+    if explain:
+        for line in explain_plan(code_indices, graph, stale, needed):
+            print(line)
+
+    counts = {"cached": len(cells) - len(stale), "executed": 0}
+    if not needed:
+        return counts
+
+    if jobs > 1:
+        groups = spyondeflow.connected_groups(graph, needed)
+    else:
+        groups = [sorted(needed)]
+
+    def run(group):
+        return _run_group(cells, sources, group, stale, keys, working_dir, timeout, cache_dir)
+
+    if len(groups) == 1:
+        counts["executed"] = run(groups[0])
+    else:
+        # each group writes only to its own cells.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            counts["executed"] = sum(executor.map(run, groups))
+    return counts
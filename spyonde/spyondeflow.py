@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+
+"""
+Finds the dependencies between code cells by analysing their names.
+
+A cell depends on an earlier cell if it uses a name that the earlier cell
+defines or modifies. With --execute, only the changed cells and the cells
+that depend on them are executed again.
+
+A function reads the names in its body when it is called, not when it is defined,
+so a cell calling a function also depends on the cells writing those names.
+
+The analysis is static, it can not see everything:
+a cell that writes a file read by another cell is not a dependency.
+"""
+
+import ast
+
+# cells using these names can read any variable.
+_DYNAMIC_NAMES = {"globals", "locals", "vars", "exec", "eval", "__import__"}
+
+
+class _NameCollector(ast.NodeVisitor):
+    """
+    Collects the module level names defined, modified and used by a cell.
+    """
+
+    def __init__(self):
+        self.defined = set()
+        self.modified = set()
+        self.used = set()
+        self.imported = set()
+        self.opaque = False
+        self.depth = 0
+        self.global_names = set()
+        # the free names of the functions, read when they are called.
+        self.deferred = set()
+        # (used names, local names) of the functions being visited.
+        self.functions = []
+
+    def _define(self, name):
+        if self.depth == 0 or name in self.global_names:
+            self.defined.add(name)
+        elif self.functions:
+            self.functions[-1][1].add(name)
+
+    def _use(self, name):
+        self.used.add(name)
+        if name in _DYNAMIC_NAMES:
+            self.opaque = True
+        if self.functions:
+            self.functions[-1][0].add(name)
+
+    def visit_Name(self, node):  # pylint: disable=C0103
+        """
+        x = 1 defines x, print(x) uses x.
+        """
+        if isinstance(node.ctx, ast.Load):
+            self._use(node.id)
+        else:
+            self._define(node.id)
+
+    def visit_AugAssign(self, node):  # pylint: disable=C0103
+        """
+        x += 1 uses and defines x.
+        """
+        if isinstance(node.target, ast.Name):
+            self._use(node.target.id)
+        self.generic_visit(node)
+
+    def visit_Global(self, node):  # pylint: disable=C0103
+        """
+        global x in a function makes its assignments module level.
+        """
+        self.global_names.update(node.names)
+        self.defined.update(node.names)
+
+    def _visit_import(self, node):
+        for alias in node.names:
+            if alias.name == "*":
+                # from module import * can define anything.
+                self.opaque = True
+                continue
+            name = alias.asname or alias.name.split(".")[0]
+            self._define(name)
+            self.imported.add(name)
+
+    visit_Import = _visit_import
+    visit_ImportFrom = _visit_import
+
+    def _visit_scope(self, node, name=None, function=False):
+        if name is not None:
+            self._define(name)
+        for decorator in getattr(node, "decorator_list", []):
+            self.visit(decorator)
+        if function:
+            arguments = {x.arg for x in ast.walk(node.args) if isinstance(x, ast.arg)}
+            self.functions.append((set(), arguments))
+        self.depth += 1
+        for child in ast.iter_child_nodes(node):
+            if child not in getattr(node, "decorator_list", []):
+                self.visit(child)
+        self.depth -= 1
+        if function:
+            used, local_names = self.functions.pop()
+            free_names = used - local_names
+            if self.functions:
+                self.functions[-1][0].update(free_names)
+            else:
+                self.deferred.update(free_names)
+
+    def visit_FunctionDef(self, node):  # pylint: disable=C0103
+        """
+        def f() defines f, the names used in its body are used,
+        and its free names are deferred.
+        """
+        self._visit_scope(node, node.name, True)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):  # pylint: disable=C0103
+        """
+        class C defines C, its body runs at once, its methods are functions.
+        """
+        self._visit_scope(node, node.name)
+
+    def visit_Lambda(self, node):  # pylint: disable=C0103
+        """
+        The arguments of a lambda are local, its free names are deferred.
+        """
+        self._visit_scope(node, function=True)
+
+    def visit_ListComp(self, node):  # pylint: disable=C0103
+        """
+        The variables of a comprehension are local.
+        """
+        self._visit_scope(node)
+
+    visit_SetComp = visit_ListComp
+    visit_DictComp = visit_ListComp
+    visit_GeneratorExp = visit_ListComp
+
+    def _modify(self, target):
+        """
+        x.a = 1, x[0] = 1 and x.append(1) modify x.
+        """
+        while isinstance(target, (ast.Attribute, ast.Subscript)):
+            target = target.value
+        if isinstance(target, ast.Name):
+            self.modified.add(target.id)
+
+    def visit_Attribute(self, node):  # pylint: disable=C0103
+        """
+        An attribute assignment modifies the object.
+        """
+        if not isinstance(node.ctx, ast.Load):
+            self._modify(node)
+        self.generic_visit(node)
+
+    visit_Subscript = visit_Attribute
+
+    def visit_Call(self, node):  # pylint: disable=C0103
+        """
+        A method call may modify the object.
+        """
+        if isinstance(node.func, ast.Attribute):
+            self._modify(node.func.value)
+        self.generic_visit(node)
+
+
+def analyse_cell(source):
+    """
+    Returns the names of a cell as a dictionary of sets:
+
+    {
+        "defined": {"x", "os"},
+        "modified": {"data"},
+        "used": {"print", "data"},
+        "imported": {"os"},
+        "deferred": {"x"},
+        "opaque": False
+    }
+
+    deferred has the free names of the functions and lambdas of the cell,
+    they are read when the functions are called.
+
+    :type source: str
+
+    An opaque cell can use or define any name, such as a cell with
+    "from module import *", a call to exec() or a syntax error.
+    """
+    assert isinstance(source, str)
+
+    collector = _NameCollector()
+    try:
+        collector.visit(ast.parse(source))
+    except SyntaxError:
+        collector.opaque = True
+    return {
+        "defined": collector.defined,
+        "modified": collector.modified,
+        "used": collector.used,
+        "imported": collector.imported,
+        "deferred": collector.deferred,
+        "opaque": collector.opaque,
+    }
+
+
+def dependency_graph(sources):
+    """
+    Returns the dependencies of each cell on the earlier cells.
+
+    :type sources: list
+    :param sources: the sources of the code cells, in order.
+
+    Returns a list with a dictionary for each cell,
+    mapping an earlier cell index to the names that connect them:
+
+    [
+        {},
+        {0: ["x"]},
+        {0: ["x"], 1: ["y"]}
+    ]
+
+    Every earlier cell that defines or modifies a used name is a dependency.
+    A name defined by a cell with functions, such as a function, a class or
+    an object made by calling them, also carries their free names,
+    and a cell using it depends on the earlier cells writing those names too.
+    Method calls on imported modules, such as np.array(),
+    are not taken as modifications.
+    An opaque cell depends on all the earlier cells,
+    and all the later cells depend on it, with the name "*".
+    """
+    assert isinstance(sources, list)
+
+    analyses = [analyse_cell(x) for x in sources]
+    imported = set()
+    for analysis in analyses:
+        imported.update(analysis["imported"])
+
+    writers = {}
+    # name: the free names of the functions it may call.
+    deferred = {}
+    opaque_cells = []
+    graph = []
+    for i, analysis in enumerate(analyses):
+        names = analysis["used"] | analysis["modified"]
+        pending = list(names)
+        while pending:
+            for name in deferred.get(pending.pop(), ()):
+                if name not in names:
+                    names.add(name)
+                    pending.append(name)
+
+        deps = {}
+        if analysis["opaque"]:
+            for j in range(i):
+                deps[j] = ["*"]
+        else:
+            for name in sorted(names):
+                for j in writers.get(name, []):
+                    deps.setdefault(j, []).append(name)
+            for j in opaque_cells:
+                deps.setdefault(j, []).append("*")
+        graph.append(deps)
+
+        if analysis["opaque"]:
+            opaque_cells.append(i)
+        cell_deferred = set(analysis["deferred"])
+        for name in analysis["used"]:
+            cell_deferred.update(deferred.get(name, ()))
+        for name in analysis["defined"]:
+            deferred[name] = cell_deferred
+        written = analysis["defined"] | (analysis["modified"] - imported)
+        for name in written:
+            writers.setdefault(name, []).append(i)
+    return graph
+
+
+def ancestors(graph, indices):
+    """
+    Returns the set of cells that the cells in indices depend on, transitively.
+    The cells in indices are not included unless they depend on each other.
+
+    :type graph: list
+    :type indices: set
+    """
+    result = set()
+    pending = list(indices)
+    while pending:
+        i = pending.pop()
+        for j in graph[i]:
+            if j not in result:
+                result.add(j)
+                pending.append(j)
+    return result
+
+
+def connected_groups(graph, indices):
+    """
+    Splits the cells into groups that do not depend on each other.
+    Each group is sorted, the groups are sorted by their first cell.
+
+    :type graph: list
+    :type indices: set
+    """
+    parent = {i: i for i in indices}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in indices:
+        for j in graph[i]:
+            if j in parent:
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i in sorted(indices):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values())
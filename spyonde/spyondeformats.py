@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+Writes a script in several formats from a single parse.
+
+    spyonde --formats ipynb,md,html lecture.py
+
+The script is split and parsed once, and the cells are given to the writer
+of each format. Each writer streams its output to its own file,
+so another format only costs its rendering time.
+"""
+
+import os
+
+import spyondemain  # pylint: disable=E0401
+
+__CELL_TYPE_CODE = "code"
+
+
+def iter_markdown_chunks(cells, options, title):
+    """
+    Yields a Markdown document of the cells in chunks, a cell at a time.
+    Code cells are fenced Python blocks, followed by their text outputs.
+
+    :param cells: an iterable of cell dictionaries.
+    :type options: ConvertOptions
+    :type title: str
+    :param title: the name of the input file.
+
+    All the writers have the same parameters.
+    Markdown cells have their own headings, so the title is not used.
+    """
+    del options, title
+    separator = ""
+    for cell in cells:
+        source = cell["source"]
+        if cell.get("attachments"):
+            import spyondeattach  # pylint: disable=C0415,E0401
+            # C0415: import outside toplevel, it is only needed for attachments.
+            source = spyondeattach.resolve_attachments(cell)
+        source = "".join(source).rstrip("\n")
+        if cell["cell_type"] == __CELL_TYPE_CODE:
+            parts = ["```python\n" + source + "\n```"]
+            for output in cell.get("outputs", []):
+                if output.get("output_type") == "stream":
+                    text = "".join(output.get("text", []))
+                elif output.get("output_type") == "error":
+                    text = "%s: %s" % (output.get("ename", ""), output.get("evalue", ""))
+                else:
+                    text = "".join(output.get("data", {}).get("text/plain", []))
+                if text.strip():
+                    parts.append("```\n" + text.rstrip("\n") + "\n```")
+            source = "\n\n".join(parts)
+        yield separator + source + "\n"
+        separator = "\n"
+
+
+def iter_ipynb_chunks(cells, options, title):
+    """
+    Yields the notebook JSON in chunks, see iter_notebook_chunks().
+    """
+    del title
+    return spyondemain.iter_notebook_chunks(cells, options.pyversion, spyondemain.notebook_format_minor(options))
+
+
+def iter_html_chunks(cells, options, title):
+    """
+    Yields the HTML slides in chunks, see spyondehtml.iter_slides_chunks().
+    """
+    del options
+    import spyondehtml  # pylint: disable=C0415,E0401
+    # C0415: import outside toplevel, it is only needed for HTML.
+    return spyondehtml.iter_slides_chunks(cells, title)
+
+
+# format name: (file name suffix, writer function)
+WRITERS = {
+    "ipynb": (".gen.ipynb", iter_ipynb_chunks),
+    "md": (".gen.md", iter_markdown_chunks),
+    "html": (".gen.html", iter_html_chunks),
+}
+
+
+def parse_formats(formats_str):
+    """
+    Returns the list of format names in a string like "ipynb,md,html".
+    Raises ValueError for an unknown format.
+
+    :type formats_str: str
+    """
+    assert isinstance(formats_str, str)
+
+    formats = []
+    for name in formats_str.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in WRITERS:
+            raise ValueError("unknown format: %s, the formats are: %s" % (name, ", ".join(sorted(WRITERS))))
+        if name not in formats:
+            formats.append(name)
+    return formats
+
+
+def generate_format_file_name(input_file_name, output_file_name, format_name):
+    """
+    Returns the output file name of a format.
+
+    :type input_file_name: str
+    :type output_file_name: str
+    :param output_file_name: the output option, or None.
+        If it is given, its extension is replaced with the format name.
+    :type format_name: str
+    """
+    if output_file_name:
+        return os.path.splitext(output_file_name)[0] + "." + format_name
+    return input_file_name + WRITERS[format_name][0]
+
+
+def write_chunks(output_file_name, chunks):
+    """
+    Writes the chunks to a file.
+
+    :type output_file_name: str
+    """
+    with open(output_file_name, "w", encoding="utf8") as handle:
+        for chunk in chunks:
+            handle.write(chunk)
+
+
+def convert_file_to_formats(input_file_name, options):
+    """
+    Converts a .py file to the formats in options.formats.
+    Returns the list of file names written.
+
+    :type input_file_name: str
+    :type options: ConvertOptions
+    """
+    assert isinstance(input_file_name, str)
+    assert isinstance(options, spyondemain.ConvertOptions)
+
+    cell_count, data = spyondemain.file_to_data(input_file_name, options)
+    if cell_count is not None:
+        print("Number of cells in file:", cell_count)
+    if data is None:
+        spyondemain.print_single_cell_message()
+        return []
+
+    previous_cells = None
+    if options.keep_outputs:
+        ipynb_file_name = generate_format_file_name(input_file_name, options.output, "ipynb")
+        previous_cells = spyondemain.read_previous_cells(ipynb_file_name)
+
+    working_dir = os.path.dirname(os.path.abspath(input_file_name))
+    all_cells_list = spyondemain.notebook_cells_from_data(data, options, previous_cells, working_dir)
+
+    written = []
+    for format_name in options.formats:
+        output_file_name = generate_format_file_name(input_file_name, options.output, format_name)
+        if not spyondemain.confirm_overwrite(output_file_name, options):
+            print("file is not written:", output_file_name)
+            continue
+        chunks = WRITERS[format_name][1](all_cells_list, options, os.path.basename(input_file_name))
+        if format_name == "ipynb" and options.validate:
+            output_as_str = "".join(chunks)
+            if not spyondemain.notebook_is_valid(output_file_name, output_as_str, options):
+                print("file is not written:", output_file_name)
+                continue
+            chunks = [output_as_str]
+        write_chunks(output_file_name, chunks)
+        print("created: ", output_file_name)
+        written.append(output_file_name)
+    return written
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Finds the .py files that have changed in a local git repository.
+Spyonde uses it to convert only the changed files, in pre-commit and CI.
+"""
+
+import os
+import subprocess
+
+import spyondemain  # pylint: disable=E0401
+
+__STATUS_DELETED = "D"
+__STATUS_RENAMED = "R"
+__STATUS_COPIED = "C"
+
+
+def run_git(arguments, cwd=None):
+    """
+    Runs git with arguments and returns its standard output as a string.
+    Raises subprocess.CalledProcessError if git fails.
+
+    :type arguments: list
+    :type cwd: str
+    """
+    assert isinstance(arguments, list)
+    completed = subprocess.run(
+        ["git"] + arguments, cwd=cwd,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return completed.stdout.decode("utf8")
+
+
+def find_repository_root(cwd=None):
+    """
+    Returns the top level directory of the git repository containing cwd.
+
+    :type cwd: str
+    """
+    return run_git(["rev-parse", "--show-toplevel"], cwd=cwd).strip()
+
+
+def parse_name_status(output):
+    """
+    Parses the output of "git diff --name-status -z".
+
+    :type output: str
+
+    Returns a tuple of two lists of paths: (changed, deleted)
+    A renamed file is a changed file with its new name,
+    and a deleted file with its old name.
+
+    output is NUL separated, like:
+    "M\\0a.py\\0R100\\0old.py\\0new.py\\0D\\0gone.py\\0"
+
+    becomes:
+    (['a.py', 'new.py'], ['old.py', 'gone.py'])
+    """
+    assert isinstance(output, str)
+
+    changed = []
+    deleted = []
+    fields = output.split("\0")
+    i = 0
+    while i < len(fields):
+        status = fields[i]
+        i += 1
+        if not status:
+            continue
+        if status.startswith(__STATUS_RENAMED):
+            deleted.append(fields[i])
+            changed.append(fields[i + 1])
+            i += 2
+        elif status.startswith(__STATUS_COPIED):
+            changed.append(fields[i + 1])
+            i += 2
+        elif status.startswith(__STATUS_DELETED):
+            deleted.append(fields[i])
+            i += 1
+        else:
+            changed.append(fields[i])
+            i += 1
+    return changed, deleted
+
+
+def changed_python_files(ref=None, staged=False, pathspecs=None, cwd=None):
+    """
+    Asks git for the .py files changed since ref, or staged for commit.
+
+    :type ref: str
+    :param ref: any git revision, such as "HEAD~3" or "origin/main".
+        If None, the working tree is compared with the index,
+        or the index is compared with HEAD if staged is True.
+    :type staged: bool
+    :param staged: only the changes in the index are taken into account.
+    :type pathspecs: list
+    :param pathspecs: limits the search to these paths, relative to cwd.
+    :type cwd: str
+
+    Returns a tuple of two lists of absolute paths: (changed, deleted)
+    Only the paths ending with .py are returned.
+    """
+    assert ref is None or isinstance(ref, str)
+    assert isinstance(staged, bool)
+
+    if cwd is None:
+        cwd = os.getcwd()
+
+    arguments = ["diff", "--name-status", "-z", "-M", "--diff-filter=ACMRD"]
+    if staged:
+        arguments.append("--cached")
+    if ref:
+        arguments.append(ref)
+    arguments.append("--")
+    if pathspecs:
+        arguments.extend(pathspecs)
+
+    root = find_repository_root(cwd)
+    output = run_git(arguments, cwd=cwd)
+    changed, deleted = parse_name_status(output)
+
+    changed = [os.path.join(root, x) for x in changed if x.endswith(".py")]
+    deleted = [os.path.join(root, x) for x in deleted if x.endswith(".py")]
+    return changed, deleted
+
+
+def remove_stale_notebooks(deleted_files):
+    """
+    Removes the generated notebooks of deleted .py files.
+    Returns the list of removed notebooks.
+
+    :type deleted_files: list
+    """
+    assert isinstance(deleted_files, list)
+
+    removed = []
+    for file_name in deleted_files:
+        if os.path.isfile(file_name):
+            # the file has been restored or renamed back, keep its notebook.
+            continue
+        output_file_name = spyondemain.generate_output_file_name(file_name)
+        if os.path.isfile(output_file_name):
+            os.remove(output_file_name)
+            removed.append(output_file_name)
+    return removed
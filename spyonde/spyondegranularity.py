@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+Adjusts the sizes of the cells, after they are parsed.
+
+    spyonde --overwrite --merge-markdown 20 --split-code 80 lecture.py
+
+Jupyter gets slow with thousands of tiny cells, and hard to read
+with cells of thousands of lines.
+Consecutive markdown cells are merged while the merged cell has at most
+the given number of lines.
+Code cells longer than the given number of lines are split between their
+top level statements, the comment lines right above a statement stay with it.
+A single statement longer than the limit, such as a long function,
+is not split, and the cells that can not be parsed are left as they are.
+"""
+
+import ast
+import io
+import tokenize
+
+__CELL_TYPE_MARKDOWN = "markdown"
+__CELL_TYPE_CODE = "code"
+
+
+def merge_markdown_cells(data, max_lines):
+    """
+    Merges the consecutive markdown cells while the merged cell has
+    at most max_lines lines, including an empty line between the cells.
+    Returns the new list of (cell_type, lines) tuples.
+
+    :type data: list
+    :param data: the result of parse_cells().
+    :type max_lines: int
+    """
+    assert isinstance(data, list)
+    assert isinstance(max_lines, int)
+
+    merged = []
+    for cell_type, lines in data:
+        if (cell_type == __CELL_TYPE_MARKDOWN and merged and merged[-1][0] == __CELL_TYPE_MARKDOWN and
+                len(merged[-1][1]) + 1 + len(lines) <= max_lines):
+            merged[-1] = (cell_type, merged[-1][1] + [""] + lines)
+        else:
+            merged.append((cell_type, lines))
+    return merged
+
+
+def _is_blank_or_comment(line):
+    """
+    Returns True if the line is empty or only a comment.
+    """
+    stripped = line.strip()
+    return not stripped or stripped.startswith("#")
+
+
+def _code_token_rows(text):
+    """
+    Returns (start row, end row) of the tokens that are not comments or line breaks,
+    rows start from 1.
+    """
+    rows = []
+    for token1 in tokenize.generate_tokens(io.StringIO(text).readline):
+        if token1.type not in (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT,
+                               tokenize.DEDENT, tokenize.ENDMARKER):
+            rows.append((token1.start[0], token1.end[0]))
+    return rows
+
+
+def statement_start_lines(lines):
+    """
+    Returns the indices of the lines where the top level statements start,
+    or None if the lines can not be parsed.
+    The start of a statement is moved up over the comments and the empty lines
+    above it, except for the first statement,
+    but not above the end of the previous statement, such as the end of a string.
+
+    :type lines: list
+    """
+    assert isinstance(lines, list)
+
+    text = "\n".join(lines)
+    try:
+        tree = ast.parse(text)
+        code_rows = _code_token_rows(text)
+    except (SyntaxError, ValueError, tokenize.TokenError):
+        return None
+
+    starts = []
+    last_line_number = -1
+    token_index = 0
+    # the index of the line after the last code line before the statement.
+    previous_end = 0
+    for node in tree.body:
+        # the decorators are a part of the definition.
+        line_number = min([node.lineno] + [x.lineno for x in getattr(node, "decorator_list", [])]) - 1
+        if line_number == last_line_number:
+            # statements separated by semicolons.
+            continue
+        last_line_number = line_number
+        while token_index < len(code_rows) and code_rows[token_index][0] <= line_number:
+            previous_end = max(previous_end, code_rows[token_index][1])
+            token_index += 1
+        if starts:
+            while line_number > previous_end and _is_blank_or_comment(lines[line_number - 1]):
+                line_number -= 1
+        starts.append(line_number)
+    return starts
+
+
+def split_code_cell(lines, max_lines):
+    """
+    Splits the lines of a code cell longer than max_lines between
+    its top level statements, into parts of at most max_lines lines where possible.
+    Returns the list of the parts.
+
+    :type lines: list
+    :type max_lines: int
+    """
+    assert isinstance(lines, list)
+    assert isinstance(max_lines, int)
+
+    if len(lines) <= max_lines:
+        return [lines]
+    starts = statement_start_lines(lines)
+    if not starts:
+        return [lines]
+
+    # the first part also has the lines before the first statement, such as the separator.
+    boundaries = [0] + starts[1:] + [len(lines)]
+    parts = []
+    part_start = 0
+    for index in range(1, len(boundaries) - 1):
+        if boundaries[index + 1] - part_start > max_lines:
+            parts.append(lines[part_start:boundaries[index]])
+            part_start = boundaries[index]
+    parts.append(lines[part_start:])
+
+    results = []
+    for part in parts:
+        while part and not part[-1].strip():
+            part = part[:-1]
+        while part and not part[0].strip():
+            part = part[1:]
+        if part:
+            results.append(part)
+    return results
+
+
+def optimize_granularity(data, merge_markdown_lines=None, split_code_lines=None):
+    """
+    Merges the small markdown cells and splits the long code cells.
+    Returns the new list of (cell_type, lines) tuples.
+
+    :type data: list
+    :param data: the result of parse_cells().
+    :type merge_markdown_lines: int
+    :param merge_markdown_lines: see merge_markdown_cells(), None to keep the markdown cells.
+    :type split_code_lines: int
+    :param split_code_lines: see split_code_cell(), None to keep the code cells.
+    """
+    assert isinstance(data, list)
+
+    if merge_markdown_lines:
+        data = merge_markdown_cells(data, merge_markdown_lines)
+    if split_code_lines:
+        split_data = []
+        for cell_type, lines in data:
+            if cell_type == __CELL_TYPE_CODE:
+                split_data.extend((cell_type, x) for x in split_code_cell(lines, split_code_lines))
+            else:
+                split_data.append((cell_type, lines))
+        data = split_data
+    return data
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+
+"""
+Exports the cells of a script as HTML slides, without nbconvert.
+
+    spyonde --slides lecture.py
+
+Each cell is a slide, like the "slideshow" metadata of the notebook.
+The slides are a single HTML file with the styles and the script inside,
+so they can be opened offline.
+Markdown is rendered by a small renderer, which supports headings, lists,
+block quotes, fenced code, inline code, emphasis, links and images.
+
+The page template is prepared once, when the module is imported,
+so converting many files only costs rendering their cells.
+"""
+
+import html
+import os
+import re
+import string
+
+import spyondemain  # pylint: disable=E0401
+
+__CELL_TYPE_CODE = "code"
+
+_HEADING_PATTERN = re.compile(r'(#{1,6})\s+(.*?)\s*#*\s*\Z')
+_UNORDERED_ITEM_PATTERN = re.compile(r'\s*[-*+]\s+(.*)\Z')
+_ORDERED_ITEM_PATTERN = re.compile(r'\s*\d+[.)]\s+(.*)\Z')
+_QUOTE_PATTERN = re.compile(r'\s*>\s?(.*)\Z')
+_FENCE_PATTERN = re.compile(r'\s*(```|~~~)')
+
+# a link target may have a single level of parentheses, as in Wikipedia links.
+_LINK_TARGET = r'\((?P<%s>(?:[^()\s]|\([^()\s]*\))+)\)'
+_INLINE_PATTERN = re.compile(
+    r'(?P<ticks>`+)(?P<code>.+?)(?P=ticks)'
+    r'|!\[(?P<alt>[^\]]*)\]' + _LINK_TARGET % "src" +
+    r'|\[(?P<text>[^\]]+)\]' + _LINK_TARGET % "href" +
+    r'|\*\*(?P<strong>.+?)\*\*'
+    r'|\*(?P<em>[^*\s](?:.*?[^*\s])??)\*')
+# underscores are not emphasis, they are common in Python names.
+
+_SAFE_URL_PATTERN = re.compile(r'(?i)\s*(?:https?:|mailto:|data:image/|[^:]*(?:[/?#]|\Z))')
+
+_STYLE = """
+html, body { margin: 0; height: 100%; background: #fff; color: #222;
+  font-family: "Helvetica Neue", Arial, sans-serif; }
+section.slide { display: none; box-sizing: border-box; height: 100%;
+  padding: 4vh 6vw; overflow: auto; font-size: 2.6vh; }
+section.slide.current { display: block; }
+h1, h2, h3, h4, h5, h6 { color: #1a3d6d; margin: 0.4em 0; }
+pre { background: #f4f4f4; padding: 0.8em; overflow: auto; font-size: 0.9em; }
+code { font-family: Menlo, Consolas, monospace; }
+pre.output { background: #fff; border-left: 3px solid #ccc; }
+pre.error { background: #fff0f0; border-left: 3px solid #c33; }
+blockquote { border-left: 4px solid #ddd; margin: 0; padding-left: 1em; color: #555; }
+img { max-width: 100%; }
+#counter { position: fixed; right: 1em; bottom: 0.5em; color: #888; font-size: 1.6vh; }
+"""
+
+_SCRIPT = """
+(function () {
+  var slides = document.querySelectorAll("section.slide");
+  var counter = document.getElementById("counter");
+  var current = 0;
+  function show(index) {
+    if (!slides.length) { return; }
+    index = Math.max(0, Math.min(slides.length - 1, index));
+    slides[current].classList.remove("current");
+    current = index;
+    slides[current].classList.add("current");
+    counter.textContent = (current + 1) + " / " + slides.length;
+    history.replaceState(null, "", "#" + (current + 1));
+  }
+  document.addEventListener("keydown", function (event) {
+    var key = event.key;
+    if (key === "ArrowRight" || key === "PageDown" || key === " ") { show(current + 1); }
+    else if (key === "ArrowLeft" || key === "PageUp") { show(current - 1); }
+    else if (key === "Home") { show(0); }
+    else if (key === "End") { show(slides.length - 1); }
+    else { return; }
+    event.preventDefault();
+  });
+  show((parseInt(location.hash.slice(1), 10) || 1) - 1);
+})();
+"""
+
+# only the title and the slides change between the decks.
+_PAGE_HEAD_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>$title</title>
+<style>""" + _STYLE.replace("$", "$$") + """</style>
+</head>
+<body>
+""")
+_PAGE_TAIL = """
+<div id="counter"></div>
+<script>""" + _SCRIPT + """</script>
+</body>
+</html>
+"""
+
+
+def _safe_url(url):
+    """
+    Returns the escaped url, or "#" for urls like "javascript:".
+    """
+    if not _SAFE_URL_PATTERN.match(url):
+        return "#"
+    return html.escape(url, quote=True)
+
+
+def render_inline(text):
+    """
+    Returns the HTML of a line of markdown text.
+
+    :type text: str
+
+    'a **b** `c<d`' gives 'a <strong>b</strong> <code>c&lt;d</code>'
+    """
+    assert isinstance(text, str)
+
+    parts = []
+    pos = 0
+    for match in _INLINE_PATTERN.finditer(text):
+        parts.append(html.escape(text[pos:match.start()], quote=False))
+        pos = match.end()
+        groups = match.groupdict()
+        if groups["code"] is not None:
+            parts.append("<code>" + html.escape(groups["code"].strip(), quote=False) + "</code>")
+        elif groups["src"] is not None:
+            parts.append('<img src="%s" alt="%s">' % (
+                _safe_url(groups["src"]), html.escape(groups["alt"], quote=True)))
+        elif groups["href"] is not None:
+            parts.append('<a href="%s">%s</a>' % (_safe_url(groups["href"]), render_inline(groups["text"])))
+        elif groups["strong"] is not None:
+            parts.append("<strong>" + render_inline(groups["strong"]) + "</strong>")
+        else:
+            parts.append("<em>" + render_inline(groups["em"]) + "</em>")
+    parts.append(html.escape(text[pos:], quote=False))
+    return "".join(parts)
+
+
+def render_markdown(lines):
+    """
+    Returns the HTML of markdown lines.
+
+    :type lines: list
+
+    ['# Title', '- a', '- b'] gives
+    '<h1>Title</h1>\\n<ul>\\n<li>a</li>\\n<li>b</li>\\n</ul>'
+    """
+    assert isinstance(lines, list)
+
+    blocks = []
+    # the open block: "p", "ul", "ol" or "blockquote", and its items.
+    open_block = [None, []]
+
+    def close():
+        tag, items = open_block
+        if tag == "p":
+            blocks.append("<p>" + "\n".join(items) + "</p>")
+        elif tag == "blockquote":
+            blocks.append("<blockquote><p>" + "\n".join(items) + "</p></blockquote>")
+        elif tag is not None:
+            blocks.append("<%s>\n%s\n</%s>" % (tag, "\n".join("<li>%s</li>" % x for x in items), tag))
+        open_block[:] = [None, []]
+
+    def add(tag, item):
+        if open_block[0] != tag:
+            close()
+            open_block[0] = tag
+        open_block[1].append(item)
+
+    fence = None
+    code_lines = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if fence is not None:
+            if line.strip().startswith(fence):
+                blocks.append("<pre><code>" + html.escape("\n".join(code_lines), quote=False) + "</code></pre>")
+                fence = None
+            else:
+                code_lines.append(line)
+            continue
+
+        match = _FENCE_PATTERN.match(line)
+        if match:
+            close()
+            fence = match.group(1)
+            code_lines = []
+            continue
+
+        if not line.strip():
+            close()
+            continue
+
+        match = _HEADING_PATTERN.match(line.strip())
+        if match:
+            close()
+            level = len(match.group(1))
+            blocks.append("<h%d>%s</h%d>" % (level, render_inline(match.group(2)), level))
+            continue
+
+        match = _UNORDERED_ITEM_PATTERN.match(line)
+        if match:
+            add("ul", render_inline(match.group(1)))
+            continue
+
+        match = _ORDERED_ITEM_PATTERN.match(line)
+        if match:
+            add("ol", render_inline(match.group(1)))
+            continue
+
+        match = _QUOTE_PATTERN.match(line)
+        if match:
+            add("blockquote", render_inline(match.group(1)))
+            continue
+
+        if open_block[0] in ("ul", "ol"):
+            # a continuation of the last item.
+            open_block[1][-1] += " " + render_inline(line.strip())
+            continue
+        add("p", render_inline(line.strip()))
+
+    if fence is not None:
+        # an unterminated fence runs to the end of the cell.
+        blocks.append("<pre><code>" + html.escape("\n".join(code_lines), quote=False) + "</code></pre>")
+    close()
+    return "\n".join(blocks)
+
+
+def render_outputs(outputs):
+    """
+    Returns the HTML of the outputs of a code cell.
+
+    :type outputs: list
+    """
+    assert isinstance(outputs, list)
+
+    parts = []
+    for output in outputs:
+        output_type = output.get("output_type")
+        if output_type == "stream":
+            css_class = "error" if output.get("name") == "stderr" else "output"
+            text = "".join(output.get("text", []))
+        elif output_type == "error":
+            css_class = "error"
+            text = "%s: %s" % (output.get("ename", ""), output.get("evalue", ""))
+        else:
+            # execute_result and display_data.
+            data = output.get("data", {})
+            image = data.get("image/png")
+            if image:
+                if isinstance(image, list):
+                    image = "".join(image)
+                parts.append('<img src="data:image/png;base64,%s" alt="">' % image.replace("\n", ""))
+                continue
+            css_class = "output"
+            text = "".join(data.get("text/plain", []))
+        parts.append('<pre class="%s">%s</pre>' % (css_class, html.escape(text.rstrip("\n"), quote=False)))
+    return "\n".join(parts)
+
+
+def render_cell(cell):
+    """
+    Returns the HTML of a cell dictionary, as a slide.
+
+    :type cell: dict
+    """
+    assert isinstance(cell, dict)
+
+    source = cell["source"]
+    if cell.get("attachments"):
+        import spyondeattach  # pylint: disable=C0415,E0401
+        # C0415: import outside toplevel, it is only needed for attachments.
+        source = spyondeattach.resolve_attachments(cell)
+    lines = [x.rstrip("\n") for x in source]
+    if cell["cell_type"] == __CELL_TYPE_CODE:
+        body = "<pre><code>" + html.escape("\n".join(lines), quote=False) + "</code></pre>"
+        outputs = render_outputs(cell.get("outputs", []))
+        if outputs:
+            body += "\n" + outputs
+    else:
+        body = render_markdown(lines)
+    return '<section class="slide">\n' + body + "\n</section>"
+
+
+def render_slides(all_cells_list, title):
+    """
+    Returns the HTML page of the slides.
+
+    :type all_cells_list: list
+    :param all_cells_list: cell dictionaries, see build_cell_dicts().
+    :type title: str
+
+    The cells with the "skip" slide type are not rendered.
+    """
+    assert isinstance(all_cells_list, list)
+    return "".join(iter_slides_chunks(all_cells_list, title))
+
+
+def iter_slides_chunks(cells, title):
+    """
+    Yields the HTML page of the slides in chunks, a slide at a time.
+    See render_slides() for the parameters.
+
+    :param cells: an iterable of cell dictionaries.
+    """
+    assert isinstance(title, str)
+
+    yield _PAGE_HEAD_TEMPLATE.substitute(title=html.escape(title, quote=False))
+    separator = ""
+    for cell in cells:
+        slide_type = cell.get("metadata", {}).get("slideshow", {}).get("slide_type")
+        if slide_type == "skip":
+            continue
+        yield separator + render_cell(cell)
+        separator = "\n"
+    yield _PAGE_TAIL
+
+
+def generate_html_file_name(input_file_name):
+    """
+    Generates an HTML file name from an input file name.
+
+    :type input_file_name: str
+    """
+    assert isinstance(input_file_name, str)
+    return input_file_name + ".gen.html"
+
+
+def convert_file_to_slides(input_file_name, options):
+    """
+    Converts a .py file to HTML slides.
+    Returns the HTML, or None if the file is skipped.
+
+    :type input_file_name: str
+    :type options: ConvertOptions
+    """
+    assert isinstance(input_file_name, str)
+    assert isinstance(options, spyondemain.ConvertOptions)
+
+    output_file_name = options.output or generate_html_file_name(input_file_name)
+
+    cell_count, data = spyondemain.file_to_data(input_file_name, options)
+    if cell_count is not None:
+        print("Number of cells in file:", cell_count)
+    if data is None:
+        spyondemain.print_single_cell_message()
+        return None
+
+    working_dir = os.path.dirname(os.path.abspath(input_file_name))
+    all_cells_list = spyondemain.notebook_cells_from_data(data, options, None, working_dir)
+    output_as_str = render_slides(all_cells_list, os.path.basename(input_file_name))
+
+    if spyondemain.confirm_overwrite(output_file_name, options):
+        with open(output_file_name, "w", encoding="utf8") as handle:
+            handle.write(output_as_str)
+        print("created: ", output_file_name)
+    else:
+        print("file is not written.")
+    return output_as_str
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+Builds a SQLite catalog of the cells in a directory tree and searches it.
+
+    spyonde index lectures
+    spyonde search generators
+
+The catalog is updated incrementally,
+only the files whose contents have changed are parsed again.
+Full-text search is provided by the FTS5 extension of SQLite.
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import tokenize
+
+import spyondemain  # pylint: disable=E0401
+
+__DEFAULT_DATABASE_NAME = ".spyonde-index.sqlite"
+
+__SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cells (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    cell_number INTEGER NOT NULL,
+    start_line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    cell_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cells_path ON cells (path);
+CREATE VIRTUAL TABLE IF NOT EXISTS cells_fts USING fts5 (
+    title, body, content='cells', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS cells_after_insert AFTER INSERT ON cells BEGIN
+    INSERT INTO cells_fts (rowid, title, body) VALUES (new.id, new.title, new.body);
+END;
+CREATE TRIGGER IF NOT EXISTS cells_after_delete AFTER DELETE ON cells BEGIN
+    INSERT INTO cells_fts (cells_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+END;
+"""
+
+
+def open_index(database_file_name):
+    """
+    Opens the catalog, creating its tables if they do not exist.
+    Returns a sqlite3 connection.
+
+    :type database_file_name: str
+    """
+    assert isinstance(database_file_name, str)
+    connection = sqlite3.connect(database_file_name)
+    try:
+        connection.executescript(__SCHEMA)
+    except sqlite3.OperationalError:
+        connection.close()
+        raise
+    return connection
+
+
+def file_hash(file_name):
+    """
+    Returns the SHA-1 hash of the contents of a file as a hex string.
+
+    :type file_name: str
+    """
+    assert isinstance(file_name, str)
+    sha1 = hashlib.sha1()
+    with open(file_name, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 16), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def catalog_cells(input_file_name):
+    """
+    Returns the catalog rows of the cells in a file.
+
+    :type input_file_name: str
+
+    Each row is a tuple like:
+    (cell_number, start_line, end_line, cell_type, title, body)
+
+    cell_number is the position of the cell in the generated notebook,
+    starting from 1.
+    start_line and end_line are the line numbers in the .py file,
+    starting from 1, trailing empty lines are not included.
+    """
+    assert isinstance(input_file_name, str)
+
+    file_content, ranges = spyondemain.split_to_cell_ranges(input_file_name)
+
+    rows = []
+    for start1, stop1 in ranges:
+        lines = file_content[start1:stop1]
+        parsed = spyondemain.parse_cells([lines])
+        if not parsed:
+            # empty or ignored cell, it is not in the notebook.
+            continue
+        cell_type, cell_lines = parsed[0]
+        end_line = start1 + len(spyondemain.remove_trailing_empty_elements(lines))
+        title = spyondemain.cell_title(lines)
+        body = "\n".join(cell_lines)
+        rows.append((len(rows) + 1, start1 + 1, end_line, cell_type, title, body))
+    return rows
+
+
+def index_file(connection, file_name, onlymulticell):
+    """
+    Adds or updates a file in the catalog, if it has changed.
+    Returns True if the file has been parsed, False if it is unchanged.
+
+    :type file_name: str
+    :type onlymulticell: bool
+    """
+    stat = os.stat(file_name)
+    row = connection.execute(
+        "SELECT mtime, size, hash FROM files WHERE path = ?", (file_name,)).fetchone()
+    if row and row[0] == stat.st_mtime and row[1] == stat.st_size:
+        return False
+
+    hash1 = file_hash(file_name)
+    if row and row[2] == hash1:
+        # touched but not changed.
+        connection.execute(
+            "UPDATE files SET mtime = ?, size = ? WHERE path = ?",
+            (stat.st_mtime, stat.st_size, file_name))
+        return False
+
+    rows = []
+    if not onlymulticell or spyondemain.may_have_multiple_cells(file_name):
+        try:
+            rows = catalog_cells(file_name)
+        except (SyntaxError, ValueError, tokenize.TokenError) as ex:
+            # it will be tried again when the file changes.
+            print("could not be indexed:", file_name, ex)
+        if onlymulticell and len(rows) < 2:
+            rows = []
+
+    connection.execute("DELETE FROM cells WHERE path = ?", (file_name,))
+    connection.executemany(
+        "INSERT INTO cells (path, cell_number, start_line, end_line, cell_type, title, body)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(file_name,) + x for x in rows])
+    connection.execute(
+        "INSERT OR REPLACE INTO files (path, mtime, size, hash) VALUES (?, ?, ?, ?)",
+        (file_name, stat.st_mtime, stat.st_size, hash1))
+    return True
+
+
+def index_tree(connection, topdir, onlymulticell=True):
+    """
+    Brings the catalog up to date with the .py files under topdir.
+
+    :type topdir: str
+    :type onlymulticell: bool
+
+    Returns a tuple of counts: (parsed, unchanged, removed)
+    """
+    assert isinstance(topdir, str)
+
+    topdir = os.path.abspath(topdir)
+    file_names = spyondemain.find_py_files(topdir)
+
+    parsed = 0
+    with connection:
+        for file_name in file_names:
+            if index_file(connection, file_name, onlymulticell):
+                parsed += 1
+
+        # forget the files that are no longer in the tree.
+        existing = set(file_names)
+        prefix = os.path.join(topdir, "")
+        removed = []
+        for (file_name,) in connection.execute("SELECT path FROM files"):
+            if file_name.startswith(prefix) and file_name not in existing:
+                removed.append(file_name)
+        for file_name in removed:
+            connection.execute("DELETE FROM cells WHERE path = ?", (file_name,))
+            connection.execute("DELETE FROM files WHERE path = ?", (file_name,))
+
+    return parsed, len(file_names) - parsed, len(removed)
+
+
+def search(connection, query, limit=20):
+    """
+    Searches the titles and bodies of the cells in the catalog.
+    Returns a list of tuples, best matches first:
+    (path, cell_number, start_line, end_line, cell_type, title)
+
+    :type query: str
+    :param query: an FTS5 query, such as: generators OR iterators
+    :type limit: int
+    """
+    assert isinstance(query, str)
+    assert isinstance(limit, int)
+    return connection.execute(
+        "SELECT c.path, c.cell_number, c.start_line, c.end_line, c.cell_type, c.title"
+        " FROM cells_fts JOIN cells c ON c.id = cells_fts.rowid"
+        " WHERE cells_fts MATCH ? ORDER BY bm25(cells_fts, 10.0, 1.0) LIMIT ?",
+        (query, limit)).fetchall()
+
+
+def index_command_line(argv):
+    """
+    Runs "spyonde index" with the arguments after "index".
+
+    :type argv: list
+    """
+    parser = argparse.ArgumentParser(prog="spyonde index")
+
+    help1 = "Directories to be indexed. The current directory by default."
+    parser.add_argument('dirs', nargs='*', help=help1, default=["."])
+
+    help1 = 'The catalog file. It is "%s" by default.' % __DEFAULT_DATABASE_NAME
+    parser.add_argument('--db', nargs='?', help=help1, default=__DEFAULT_DATABASE_NAME)
+
+    help1 = 'Index only files with multiple cells.'
+    parser.add_argument('--onlymulticell', nargs='?', help=help1, default="True")
+
+    args = parser.parse_args(argv)
+    onlymulticell = spyondemain.if_affirmative(args.onlymulticell)
+
+    try:
+        connection = open_index(args.db)
+    except sqlite3.OperationalError as ex:
+        print("catalog could not be opened:", ex)
+        return
+
+    with connection:
+        for topdir in args.dirs:
+            parsed, unchanged, removed = index_tree(connection, topdir, onlymulticell)
+            print("indexed:", topdir)
+            print("  parsed:", parsed, "unchanged:", unchanged, "removed:", removed)
+    connection.close()
+
+
+def search_command_line(argv):
+    """
+    Runs "spyonde search" with the arguments after "search".
+
+    :type argv: list
+    """
+    parser = argparse.ArgumentParser(prog="spyonde search")
+
+    help1 = "Words to search for, in FTS5 query syntax."
+    parser.add_argument('query', nargs='+', help=help1)
+
+    help1 = 'The catalog file. It is "%s" by default.' % __DEFAULT_DATABASE_NAME
+    parser.add_argument('--db', nargs='?', help=help1, default=__DEFAULT_DATABASE_NAME)
+
+    help1 = 'Maximum number of results. It is 20 by default.'
+    parser.add_argument('--limit', type=int, help=help1, default=20)
+
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.db):
+        print("catalog not found, run spyonde index first:", args.db)
+        return
+
+    connection = open_index(args.db)
+    try:
+        results = search(connection, " ".join(args.query), args.limit)
+    except sqlite3.OperationalError as ex:
+        print("invalid query:", ex)
+        print('put the words in double quotes to search for them as is.')
+        return
+    finally:
+        connection.close()
+
+    for path, cell_number, start_line, end_line, cell_type, title in results:
+        print("%s:%d-%d: [%s %d] %s" % (path, start_line, end_line, cell_type, cell_number, title))
@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keeps the notebook cells of unsaved editor buffers in sync with their edits.
+
+    spyonde live
+
+It is meant for editor plugins with a notebook preview.
+The plugin starts "spyonde live" and talks JSON-RPC 2.0 over its standard
+input and output, one JSON message per line:
+
+    {"jsonrpc": "2.0", "id": 1, "method": "open", "params": {"uri": "lecture.py", "text": "..."}}
+    {"jsonrpc": "2.0", "id": 2, "method": "edit", "params": {"uri": "lecture.py", "edits": [
+        {"range": {"start": {"line": 3, "character": 0}, "end": {"line": 3, "character": 5}},
+         "text": "print"}]}}
+
+The methods are:
+open (uri, text), returns {"cells": [...]}
+edit (uri, edits), returns {"patches": [...], "cell_count": 12}
+cells (uri), returns {"cells": [...]}
+notebook (uri, pyversion), returns {"notebook": "..."}
+close (uri), shutdown
+
+Lines and characters start from 0, and characters are Python string indices.
+An edit without a range replaces the whole buffer.
+
+Each patch replaces "delete" cells at "start" with "cells",
+the cells are the cell dictionaries of the notebook.
+Only the cells around an edit are split and parsed again,
+so the work depends on the size of the edit, not on the size of the buffer,
+except for a single pass of the tokenizer over the buffer,
+which finds out whether it can still be tokenized.
+If the buffer can not be tokenized after an edit, such as with an unterminated string
+or a dedent not matching the indentation of the cells before it,
+the whole buffer is split again, and while the whole buffer can not be tokenized,
+the lines looking like separators are used, as "spyonde outline" does.
+"""
+
+import argparse
+import bisect
+import io
+import json
+import sys
+import tokenize
+
+import spyondemain  # pylint: disable=E0401
+
+_PARSE_ERROR = -32700
+_INVALID_REQUEST = -32600
+_METHOD_NOT_FOUND = -32601
+_INVALID_PARAMS = -32602
+
+_METHODS = {"open", "edit", "cells", "notebook", "close"}
+
+
+def find_separators(lines):
+    """
+    Returns the indices of the separator lines in a list of lines,
+    like find_separator_line_numbers() does for a whole file.
+
+    :type lines: list
+    :param lines: the lines of a part of the buffer, starting with a cell.
+
+    Raises SyntaxError or tokenize.TokenError if the lines can not be tokenized.
+
+    The lines are found by the positions of the comment tokens,
+    so a separator is not mistaken for an identical line in a string before it,
+    and a part of the buffer gives the same separators as the whole buffer.
+    """
+    assert isinstance(lines, list)
+    text = "\n".join(lines) + "\n"
+    separator_line_numbers = []
+    for token1 in tokenize.generate_tokens(io.StringIO(text).readline):
+        if token1.type != tokenize.COMMENT:
+            # the same as is_comment_token(), without formatting each token.
+            continue
+        line_number = token1.start[0] - 1
+        line = lines[line_number]
+        if line_number == 0 or line[:1].isspace():
+            # the same lines are skipped by find_separator_line_numbers().
+            continue
+        if spyondemain.is_cell_separator(line) and spyondemain.is_cell_separator(token1.string):
+            separator_line_numbers.append(line_number)
+    return separator_line_numbers
+
+
+def minimal_patch(old_cells, new_cells, offset=0):
+    """
+    Returns the patch replacing old_cells with new_cells,
+    without the cells that are the same at the start and at the end.
+    Returns None if they are the same.
+
+    :type old_cells: list
+    :type new_cells: list
+    :type offset: int
+    :param offset: the index of the first old cell in the notebook.
+    """
+    assert isinstance(old_cells, list)
+    assert isinstance(new_cells, list)
+
+    prefix = 0
+    limit = min(len(old_cells), len(new_cells))
+    while prefix < limit and old_cells[prefix] == new_cells[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix and
+           old_cells[len(old_cells) - suffix - 1] == new_cells[len(new_cells) - suffix - 1]):
+        suffix += 1
+
+    if prefix == len(old_cells) == len(new_cells):
+        return None
+    return {
+        "start": offset + prefix,
+        "delete": len(old_cells) - prefix - suffix,
+        "cells": new_cells[prefix:len(new_cells) - suffix],
+    }
+
+
+class LiveDocument:
+    """
+    The lines of a buffer, the first line of each cell in it,
+    and the notebook cells of each of them.
+
+        document = LiveDocument("#%%\\nx = 1\\n")
+        patch = document.apply_edit(1, 4, 1, 5, "2")
+    """
+
+    def __init__(self, text=""):
+        """
+        :type text: str
+        """
+        assert isinstance(text, str)
+        self.lines = text.split("\n")
+        # the first line of each cell, the first one is always 0.
+        self.starts = [0]
+        # the notebook cell dictionaries of each cell, a cell may have none.
+        self.parsed = []
+        # False if the buffer could not be tokenized, the separators are approximate.
+        self.tokenized = True
+        self.resplit()
+
+    def parse_range(self, start, stop):
+        """
+        Returns the notebook cell dictionaries of the lines between start and stop.
+        """
+        lines = [x.rstrip() for x in self.lines[start:stop]]
+        if stop == len(self.lines) and lines and not lines[-1]:
+            # the end of the last line, not a line.
+            lines.pop()
+        return spyondemain.build_cell_dicts(spyondemain.parse_cells([lines]))
+
+    def split_range(self, start, stop):
+        """
+        Returns the first lines of the cells between start and stop,
+        start must be the first line of a cell.
+        """
+        return [start] + [start + x for x in find_separators(self.lines[start:stop])]
+
+    def resplit(self):
+        """
+        Splits and parses the whole buffer.
+        If it can not be tokenized, the lines looking like separators are used.
+        """
+        try:
+            self.starts = self.split_range(0, len(self.lines))
+            self.tokenized = True
+        except (SyntaxError, tokenize.TokenError):
+            self.tokenized = False
+            import spyondeoutline  # pylint: disable=C0415,E0401
+            # C0415: import outside toplevel, it is only needed for broken buffers.
+            file_content = [x.rstrip() for x in self.lines]
+            self.starts = [0] + spyondeoutline.find_separator_line_numbers_by_lines(file_content)
+        stops = self.starts[1:] + [len(self.lines)]
+        self.parsed = [self.parse_range(start, stop) for start, stop in zip(self.starts, stops)]
+
+    def check_tokens(self):
+        """
+        Raises SyntaxError or tokenize.TokenError if the whole buffer can not be tokenized.
+
+        The indentation and the unmatched brackets are carried from cell to cell,
+        so the cells around an edit can be tokenized while the whole buffer can not.
+        """
+        text = "\n".join(self.lines) + "\n"
+        for _ in tokenize.generate_tokens(io.StringIO(text).readline):
+            pass
+
+    def cells(self):
+        """
+        Returns the notebook cell dictionaries of the buffer.
+        """
+        return [cell for cells in self.parsed for cell in cells]
+
+    def clamp_position(self, line, character):
+        """
+        Returns the position clamped to the buffer, as (line, character).
+        """
+        line = min(max(int(line), 0), len(self.lines) - 1)
+        character = min(max(int(character), 0), len(self.lines[line]))
+        return line, character
+
+    def apply_edit(self, start_line, start_character, end_line, end_character, text):
+        """
+        Replaces the text between the start and the end positions.
+        Returns the patch of the notebook cells, see minimal_patch().
+
+        :type text: str
+        """
+        assert isinstance(text, str)
+
+        start_line, start_character = self.clamp_position(start_line, start_character)
+        end_line, end_character = self.clamp_position(end_line, end_character)
+        if (end_line, end_character) < (start_line, start_character):
+            raise ValueError("the end of the range is before its start")
+
+        new_lines = (self.lines[start_line][:start_character] + text +
+                     self.lines[end_line][end_character:]).split("\n")
+        delta = len(new_lines) - (end_line - start_line + 1)
+
+        # the cell before the edit too, the edit may remove the separator of the next cell.
+        first_cell = max(bisect.bisect_right(self.starts, start_line) - 2, 0)
+        last_cell = bisect.bisect_right(self.starts, end_line) - 1
+        window_start = self.starts[first_cell]
+        if last_cell + 1 < len(self.starts):
+            window_stop = self.starts[last_cell + 1] + delta
+        else:
+            window_stop = len(self.lines) + delta
+
+        self.lines[start_line:end_line + 1] = new_lines
+        try:
+            if not self.tokenized:
+                # the separators outside the window may be wrong too.
+                raise tokenize.TokenError("the buffer could not be tokenized")
+            window_starts = self.split_range(window_start, window_stop)
+            self.check_tokens()
+        except (SyntaxError, tokenize.TokenError):
+            # a string or a bracket may be open after the edit.
+            old_cells = self.cells()
+            self.resplit()
+            return minimal_patch(old_cells, self.cells())
+
+        offset = sum(len(x) for x in self.parsed[:first_cell])
+        old_cells = [cell for cells in self.parsed[first_cell:last_cell + 1] for cell in cells]
+        window_stops = window_starts[1:] + [window_stop]
+        window_parsed = [self.parse_range(start, stop) for start, stop in zip(window_starts, window_stops)]
+
+        self.starts[first_cell:] = window_starts + [x + delta for x in self.starts[last_cell + 1:]]
+        self.parsed[first_cell:last_cell + 1] = window_parsed
+        new_cells = [cell for cells in window_parsed for cell in cells]
+        return minimal_patch(old_cells, new_cells, offset)
+
+    def replace_text(self, text):
+        """
+        Replaces the whole buffer, returns the patch of the notebook cells.
+
+        :type text: str
+        """
+        assert isinstance(text, str)
+        old_cells = self.cells()
+        self.lines = text.split("\n")
+        self.resplit()
+        return minimal_patch(old_cells, self.cells())
+
+
+class InvalidParams(ValueError):
+    """
+    Raised for the invalid parameters of a request.
+    """
+
+
+def _uri(params):
+    """
+    Returns the uri in params.
+    """
+    uri = params.get("uri", "")
+    if not isinstance(uri, str):
+        raise InvalidParams("uri must be a string")
+    return uri
+
+
+def _position(range1, name):
+    """
+    Returns (line, character) of the start or the end of a range.
+    """
+    position = range1.get(name)
+    if not isinstance(position, dict):
+        raise InvalidParams("range.%s must be an object" % name)
+    values = (position.get("line"), position.get("character"))
+    if not all(isinstance(x, int) and not isinstance(x, bool) for x in values):
+        raise InvalidParams("range.%s.line and range.%s.character must be integers" % (name, name))
+    return values
+
+
+def _edit_arguments(edit):
+    """
+    Returns (start_line, start_character, end_line, end_character, text) of an edit,
+    the positions are None if it replaces the whole buffer.
+    """
+    if not isinstance(edit, dict):
+        raise InvalidParams("an edit must be an object")
+    text = edit.get("text")
+    if not isinstance(text, str):
+        raise InvalidParams("text must be a string")
+    if "range" not in edit:
+        return None, None, None, None, text
+    if not isinstance(edit["range"], dict):
+        raise InvalidParams("range must be an object")
+    return _position(edit["range"], "start") + _position(edit["range"], "end") + (text,)
+
+
+def _document(documents, params):
+    """
+    Returns the open document of the uri in params.
+    """
+    uri = _uri(params)
+    if uri not in documents:
+        raise InvalidParams("the document is not open: %s" % uri)
+    return documents[uri]
+
+
+def handle_request(documents, method, params):
+    """
+    Runs a method, returns its result.
+    Raises InvalidParams for invalid parameters.
+
+    :type documents: dict
+    :param documents: {uri: LiveDocument}, the open documents.
+    :type method: str
+    :type params: dict
+    """
+    if not isinstance(params, dict):
+        raise InvalidParams("params must be an object")
+
+    if method == "open":
+        text = params.get("text", "")
+        if not isinstance(text, str):
+            raise InvalidParams("text must be a string")
+        uri = _uri(params)
+        document = LiveDocument(text)
+        documents[uri] = document
+        return {"cells": document.cells()}
+
+    if method == "edit":
+        document = _document(documents, params)
+        edits = params.get("edits", [])
+        if not isinstance(edits, list):
+            raise InvalidParams("edits must be a list")
+        patches = []
+        # the edits before an invalid one are applied.
+        for edit in edits:
+            start_line, start_character, end_line, end_character, text = _edit_arguments(edit)
+            if start_line is None:
+                patch = document.replace_text(text)
+            else:
+                try:
+                    patch = document.apply_edit(start_line, start_character, end_line, end_character, text)
+                except ValueError as ex:
+                    raise InvalidParams("invalid edit: %s" % ex) from ex
+            if patch is not None:
+                patches.append(patch)
+        return {"patches": patches, "cell_count": sum(len(x) for x in document.parsed)}
+
+    if method == "cells":
+        return {"cells": _document(documents, params).cells()}
+
+    if method == "notebook":
+        pyversion = params.get("pyversion", spyondemain.ConvertOptions().pyversion)
+        cells = _document(documents, params).cells()
+        return {"notebook": spyondemain.serialize_notebook(cells, str(pyversion))}
+
+    if method == "close":
+        return documents.pop(_uri(params), None) is not None
+
+    raise ValueError("unknown method: %s" % method)
+
+
+def _error(request_id, code, message):
+    """
+    Returns a JSON-RPC error response.
+    """
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def handle_message(documents, line):
+    """
+    Handles a line of JSON-RPC, returns the response,
+    or None for notifications.
+    The "shutdown" method returns a response with "shutdown": True,
+    it is removed before it is sent.
+
+    :type documents: dict
+    :type line: str
+    """
+    try:
+        request = json.loads(line)
+    except ValueError as ex:
+        return _error(None, _PARSE_ERROR, "parse error: %s" % ex)
+    if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+        return _error(None, _INVALID_REQUEST, "invalid request")
+
+    request_id = request.get("id")
+    method = request["method"]
+    if method == "shutdown":
+        return {"jsonrpc": "2.0", "id": request_id, "result": None, "shutdown": True}
+    if method not in _METHODS:
+        return _error(request_id, _METHOD_NOT_FOUND, "method not found: %s" % method)
+    try:
+        result = handle_request(documents, method, request.get("params", {}))
+    except InvalidParams as ex:
+        return _error(request_id, _INVALID_PARAMS, str(ex))
+    if "id" not in request:
+        # a notification.
+        return None
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def serve(input_stream, output_stream):
+    """
+    Reads JSON-RPC requests from input_stream, one per line,
+    and writes the responses to output_stream, until "shutdown" or the end of the input.
+    """
+    documents = {}
+    for line in input_stream:
+        if not line.strip():
+            continue
+        response = handle_message(documents, line)
+        if response is None:
+            continue
+        shutdown = response.pop("shutdown", False)
+        output_stream.write(json.dumps(response) + "\n")
+        output_stream.flush()
+        if shutdown:
+            break
+
+
+def live_command_line(argv):
+    """
+    Runs "spyonde live" with the arguments after "live".
+
+    :type argv: list
+    """
+    parser = argparse.ArgumentParser(
+        prog="spyonde live",
+        description="JSON-RPC 2.0 over standard input and output, one message per line.")
+    parser.parse_args(argv)
+
+    # the editors send UTF-8, whatever the locale is.
+    input_stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf8")
+    serve(input_stream, sys.stdout)
@@ -9,9 +9,17 @@ With Spyonde, it is possible to use any IDE/editor to create
 # pylint: disable=line-too-long
 
 import argparse
+import collections
+import functools
+import hashlib
+import importlib
+import io
 import json
 import os
 import re
+import subprocess
+import sys
+import tempfile
 import tokenize
 
 __TOKEN_CELL_SEPS = ["#%%", "# %%", "# <codecell>"]
@@ -21,10 +29,75 @@ __TOKEN_CELL_SEPS = ["#%%", "# %%", "# <codecell>"]
 #  # <codecell> (IPython notebook cell separator)
 # https://docs.spyder-ide.org/editor.html
 
+# "spyonde <subcommand> ..." runs the function in the module.
+__SUBCOMMANDS = {
+    "index": ("spyondeindex", "index_command_line"),
+    "search": ("spyondeindex", "search_command_line"),
+    "outline": ("spyondeoutline", "outline_command_line"),
+    "bundle": ("spyondebundle", "bundle_command_line"),
+    "validate": ("spyondevalidate", "validate_command_line"),
+    "serve": ("spyondeserve", "serve_command_line"),
+    "live": ("spyondelive", "live_command_line"),
+}
+
+# the patterns are compiled once, when the module is imported.
+# they are never modified, so they are safe to share between threads.
+# note that Spyder does not exactly use these.
+# it only allows one space after #.
+# examples according to Spyder
+# #%% valid cell separator
+# # %% valid cell separator
+# #  %% INvalid cell separator
+__CELL_SEPARATOR_PATTERN = re.compile(r'\s*#\s*%%\S*')
+__ONLY_CELL_SEPARATOR_PATTERN = re.compile(r'\s*#\s*%%\s*\Z')
+__ONLY_CODECELL_SEPARATOR_PATTERN = re.compile(r'\s*#\s*<codecell>\s*\Z')
+
+# a loose pattern on bytes, every match is checked by is_cell_separator().
+__SEPARATOR_PROBE_PATTERN = re.compile(rb'^[ \t\f\v]*#[ \t\f\v]*(?:%%|<codecell>)', re.MULTILINE)
+# the comments that may be include directives, see cell_include().
+__INCLUDE_PROBE_PATTERN = re.compile(rb'^[ \t\f\v]*#+[ \t\f\v]*spyonde[ \t\f\v]*[:=][ \t\f\v]*include\s', re.MULTILINE)
+
+# \s whitespace
+# [:=] : or =
+# \Z : end of string
+__CELL_IGNORE_PATTERN = re.compile(r'\s*#*\s*spyonde\s*[:=]\s*ignore-cell\s*\Z')
+__CELL_INCLUDE_PATTERN = re.compile(r'\s*#*\s*spyonde\s*[:=]\s*include\s+(\S.*?)\s*\Z')
+
+DEFAULT_INCLUDE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "spyonde", "includes")
+
+# the number of included files kept in memory, see read_include_cells().
+INCLUDE_MEMORY_CACHE_SIZE = 256
+
 __CELL_TYPE_MARKDOWN = "markdown"
 __CELL_TYPE_CODE = "code"
 __COMMENT_STARTER = "#"
 
+# used by serialize_cell() to encode the source lines of a cell,
+# the same as json.dumps() of a string.
+__ENCODE_STRING = json.encoder.encode_basestring_ascii
+__SOURCE_LIST_START = "\n" + " " * 12
+__SOURCE_LINE_SEPARATOR = ",\n" + " " * 12
+__SOURCE_LIST_END = "\n" + " " * 8 + "]"
+
+
+# options of a conversion, see convert_file().
+# it is immutable, so the same options can be shared by threads and files.
+ConvertOptions = collections.namedtuple(
+    "ConvertOptions", [
+        "output", "pyversion", "overwrite_confirmed", "onlymulticell", "keep_outputs",
+        "execute", "timeout", "cache_dir", "jobs", "explain",
+        "shard_cells", "shard_bytes", "shard_headings", "formats", "validate",
+        "cell_ids", "embed_images", "externalize_bytes",
+        "merge_markdown_lines", "split_code_lines", "include_root", "transforms"])
+ConvertOptions.__new__.__defaults__ = (
+    None, "3.7.4", False, True, False, False, 60, None, 1, False,
+    None, None, False, None, False, False, False, None,
+    None, None, None, None)
+
+# nbformat_minor of the notebooks, cell ids are a part of nbformat 4.5.
+NBFORMAT_MINOR = 2
+NBFORMAT_MINOR_CELL_IDS = 5
+
 
 def starts_with(haystack, needle):
     """
@@ -135,6 +208,26 @@ def remove_cell_separator_string(haystack):
     return haystack2
 
 
+def cell_title(cell_lines):
+    """
+    Returns the title of a cell, the text after its separator.
+    Returns an empty string if the cell has no title.
+
+    :type cell_lines: list
+
+    print(cell_title(["# %% Generators", "def gen():"]))  # "Generators"
+    print(cell_title(["# %%", "def gen():"]))  # ""
+    """
+    assert isinstance(cell_lines, list)
+    for line in cell_lines:
+        if not line.strip():
+            continue
+        if is_cell_separator(line):
+            return remove_cell_separator_string(line)
+        break
+    return ""
+
+
 def answer_in_yes_or_no(message):
     """
     Gets a yes/no answer.
@@ -166,24 +259,13 @@ def is_cell_separator(line2):
 
     __TOKEN_CELL_SEPS = ["#%%", "# %%", "# <codecell>"]
     """
-    if not hasattr(is_cell_separator, "compiled_pattern"):
-        # it doesn't exist yet, so initialize it once.
-        is_cell_separator.compiled_pattern = re.compile(r'\s*#\s*%%\S*')
-        # compile this pattern once, for performance reasons.
-        # note that Spyder does not exactly use this.
-        # it only allows one space after #.
-        # examples according to Spyder
-        # #%% valid cell separator
-        # # %% valid cell separator
-        # #  %% INvalid cell separator
-
     assert isinstance(line2, str)
 
     cell_separator_it_is = False
     if starts_with(__TOKEN_CELL_SEPS, line2):
         # a simple string comparison to especially find "# <codecell>"
         cell_separator_it_is = True
-    elif is_cell_separator.compiled_pattern.match(line2):
+    elif __CELL_SEPARATOR_PATTERN.match(line2):
         # a more complex regex search.
         cell_separator_it_is = True
     return cell_separator_it_is
@@ -203,26 +285,13 @@ def is_only_cell_separator(line2):
 
     __TOKEN_CELL_SEPS = ["#%%", "# %%", "# <codecell>"]
     """
-
-    if not hasattr(is_only_cell_separator, "compiled_pattern1"):
-        # it doesn't exist yet, so initialize it once.
-        is_only_cell_separator.compiled_pattern1 = re.compile(r'\s*#\s*%%\s*\Z')
-        is_only_cell_separator.compiled_pattern2 = re.compile(r'\s*#\s*<codecell>\s*\Z')
-        # compile this pattern once, for performance reasons.
-        # note that Spyder does not exactly use this.
-        # it only allows one space after #.
-        # examples according to Spyder
-        # #%% valid cell separator
-        # # %% valid cell separator
-        # #  %% INvalid cell separator
-
     assert isinstance(line2, str)
 
     cell_separator_it_is = False
-    if is_only_cell_separator.compiled_pattern1.match(line2):
+    if __ONLY_CELL_SEPARATOR_PATTERN.match(line2):
         # a more complex regex search.
         cell_separator_it_is = True
-    elif is_only_cell_separator.compiled_pattern2.match(line2):
+    elif __ONLY_CODECELL_SEPARATOR_PATTERN.match(line2):
         # a more complex regex search.
         cell_separator_it_is = True
 
@@ -375,22 +444,57 @@ def cell_ignored(cell_lines):
     """
     assert isinstance(cell_lines, list)
 
-    if not hasattr(cell_ignored, "compiled_pattern"):
-        # it doesn't exist yet, so initialize it once.
-        cell_ignored.compiled_pattern = re.compile(r'\s*#*\s*spyonde\s*[:=]\s*ignore-cell\s*\Z')
-        # \s whitespace
-        # [:=] : or =
-        # \Z : end of string
-
     result = False
     for line in cell_lines:
-        if cell_ignored.compiled_pattern.match(line):
+        if __CELL_IGNORE_PATTERN.match(line):
             result = True
             break
 
     return result
 
 
+def cell_include(cell_lines):
+    """
+    Returns the path in the include directive of a cell, or None.
+
+    The include directive is as follows,
+    the cell is replaced by the cells of the file:
+
+    # spyonde:include setup.py
+
+    :type cell_lines: list
+
+    Only a comment token is a directive, so a directive in a string is a part of the string.
+    The cell can only have comments, such as its separator,
+    a directive in a cell with code raises ValueError, since the code would be lost.
+    """
+    assert isinstance(cell_lines, list)
+
+    if not any(__CELL_INCLUDE_PATTERN.match(line) for line in cell_lines):
+        # most cells, without tokenizing them.
+        return None
+
+    try:
+        tokens = list(tokenize.generate_tokens(io.StringIO("\n".join(cell_lines) + "\n").readline))
+    except (tokenize.TokenError, SyntaxError):
+        # IndentationError is a SyntaxError.
+        return None
+
+    path = None
+    has_code = False
+    for token1 in tokens:
+        if token1.type == tokenize.COMMENT:
+            match = __CELL_INCLUDE_PATTERN.match(token1.string)
+            if match and path is None:
+                path = match.group(1)
+        elif token1.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT,
+                                 tokenize.DEDENT, tokenize.ENDMARKER):
+            has_code = True
+    if path is not None and has_code:
+        raise ValueError("include directive in a cell with code: " + path)
+    return path
+
+
 def align_comment_cells(cell_lines):
     """
     This is an idea to use multiline strings as comments, such as:
@@ -512,79 +616,494 @@ def find_in_list(content, token_line, last_number):
     return found
 
 
-def split_to_cells(input_file_name):  # # pylint: disable=R0914
+def may_have_multiple_cells(input_file_name):
     """
-    Tokenizes the contents of input_file_name.
+    Returns True if the file may have multiple cells, False otherwise.
 
     :type input_file_name: str
 
-    Token constants:
-    https://docs.python.org/3/library/token.html
+    This is a cheap probe for --onlymulticell.
+    The raw bytes of the file are searched for cell separators,
+    without tokenizing the file or building any cells.
+    The search stops as soon as a second cell is certain to exist.
 
-    R0914: too many local variables (max:15)
+    False means that the file surely has less than 2 cells,
+    so it can be skipped without parsing it.
+    True only means that it is worth parsing the file,
+    since separators in strings or ignored cells are not detected here.
+    A file with an include directive is always parsed,
+    the cells of the included files are only known after the includes are expanded.
 
-    Returns a list of strings.
+    A file with a single separator can still have two cells:
 
-    [
-        ['# File Read and Write']
-        ['# where are we?', '```python', 'print(os.getcwd())', '```']
-        ['# data files.']
-    ]
+        print("code before the separator is a cell.")
+        # %%
+        print("and this is another one.")
     """
     assert isinstance(input_file_name, str)
 
-    all_cell_lines = []
+    with open(input_file_name, "rb") as handle:
+        content = handle.read()
+    return content_may_have_multiple_cells(content)
+
+
+def content_may_have_multiple_cells(content):
+    """
+    Same as may_have_multiple_cells(), for the contents of a file as bytes.
+
+    :type content: bytes
+    """
+    assert isinstance(content, bytes)
+
+    if __INCLUDE_PROBE_PATTERN.search(content):
+        return True
+
+    separator_count = 0
+    for match in __SEPARATOR_PROBE_PATTERN.finditer(content):
+        line_end = content.find(b"\n", match.start())
+        if line_end == -1:
+            line_end = len(content)
+        line = content[match.start():line_end].decode("utf8", "replace")
+        if not is_cell_separator(line):
+            continue
+
+        if separator_count > 0:
+            # second separator, there are at least two cells.
+            return True
+        if content[:match.start()].strip():
+            # there is something before the first separator,
+            # that is a cell on its own.
+            return True
+        separator_count += 1
+
+    return False
+
+
+def find_separator_line_numbers(file_content, tokens):
+    """
+    Returns the indices of the lines in file_content that are cell separators.
+
+    :type file_content: list
+    :param file_content: the lines of the file, right stripped.
+    :param tokens: the tokens of the same file, from the tokenize module.
+
+    Token constants:
+    https://docs.python.org/3/library/token.html
+
+    Only the comment tokens can be cell separators,
+    so "#%%" in a string does not start a new cell.
+    """
+    assert isinstance(file_content, list)
 
     separator_line_numbers = []
     last_number = 0
 
+    for token1 in tokens:
+        token_str = token1.string
+        token_line = token1.line
+
+        it_is_cell_separator = False
+        if is_comment_token(token1):
+            if is_cell_separator(token_line) and is_cell_separator(token_str):
+                it_is_cell_separator = True
+
+        if it_is_cell_separator:
+            line_number = find_in_list(file_content, token_line, last_number)
+            if line_number:
+                last_number = line_number
+                separator_line_numbers.append(line_number)
+
+    return separator_line_numbers
+
+
+def cell_line_ranges(separator_line_numbers, line_count):
+    """
+    Returns the (start, stop) line indices of each cell, stop is exclusive.
+
+    :type separator_line_numbers: list
+    :type line_count: int
+
+    print(cell_line_ranges([3, 7], 10))  # [(0, 3), (3, 7), (7, 10)]
+    """
+    assert isinstance(separator_line_numbers, list)
+    assert isinstance(line_count, int)
+
+    starts = [0] + separator_line_numbers
+    stops = separator_line_numbers + [line_count]
+    return list(zip(starts, stops))
+
+
+def split_to_cell_ranges(input_file_name):
+    """
+    Tokenizes the contents of input_file_name.
+
+    :type input_file_name: str
+
+    Returns a tuple: (file_content, ranges)
+    file_content is the list of lines of the file, right stripped.
+    ranges is the list of (start, stop) line indices of each cell.
+    """
+    assert isinstance(input_file_name, str)
+
     # read the file once for line number matching later.
     handle = open(input_file_name, "r", encoding="utf8")
     file_content = handle.readlines()
     handle.close()
     file_content = [x.rstrip() for x in file_content]
 
-    # this block fills the separator_lines list.
     with open(input_file_name, 'rb') as handle:
         tokens = tokenize.tokenize(handle.readline)
+        separator_line_numbers = find_separator_line_numbers(file_content, tokens)
+
+    ranges = cell_line_ranges(separator_line_numbers, len(file_content))
+    return file_content, ranges
+
+
+def split_text_to_cell_ranges(text):
+    """
+    Same as split_to_cell_ranges(), for the contents of a file as a string.
+    This is useful for unsaved editor buffers.
+
+    :type text: str
+    """
+    assert isinstance(text, str)
 
-        for token1 in tokens:
-            token_str = token1.string
-            token_line = token1.line
+    file_content = io.StringIO(text).readlines()
+    file_content = [x.rstrip() for x in file_content]
+
+    tokens = tokenize.generate_tokens(io.StringIO(text).readline)
+    separator_line_numbers = find_separator_line_numbers(file_content, tokens)
 
-            it_is_cell_separator = False
-            if is_comment_token(token1):
-                if is_cell_separator(token_line) and is_cell_separator(token_str):
-                    it_is_cell_separator = True
+    ranges = cell_line_ranges(separator_line_numbers, len(file_content))
+    return file_content, ranges
 
-            if it_is_cell_separator:
-                line_number = find_in_list(file_content, token_line, last_number)
-                if line_number:
-                    last_number = line_number
-                    separator_line_numbers.append(line_number)
 
-    separator_line_numbers = [0] + separator_line_numbers
-    for i, value1 in enumerate(separator_line_numbers[:-1]):
-        start1 = value1
-        stop1 = separator_line_numbers[i+1]
-        lines = file_content[start1:stop1]
-        all_cell_lines.append(lines)
+def split_to_cells(input_file_name):
+    """
+    Tokenizes the contents of input_file_name.
 
-    # last cell.
-    start1 = separator_line_numbers[-1]
-    lines = file_content[start1:]
-    all_cell_lines.append(lines)
+    :type input_file_name: str
 
-    # print(separator_line_numbers)
+    Returns a list of strings.
 
+    [
+        ['# File Read and Write']
+        ['# where are we?', '```python', 'print(os.getcwd())', '```']
+        ['# data files.']
+    ]
+    """
+    assert isinstance(input_file_name, str)
+
+    file_content, ranges = split_to_cell_ranges(input_file_name)
+    all_cell_lines = [file_content[start1:stop1] for start1, stop1 in ranges]
     return all_cell_lines
 
 
-def parse_cells(cells):
+@functools.lru_cache(maxsize=INCLUDE_MEMORY_CACHE_SIZE)
+def _include_file_hash(stat_key):
+    """
+    Returns the hash of an included file, stat_key is (path, size, mtime_ns).
+    A changed file has another key, the old one drops out of the cache.
+    """
+    with open(stat_key[0], "rb") as handle:
+        return hashlib.sha1(handle.read()).hexdigest()
+
+
+def _write_include_cache_file(cache_file_name, cells):
+    """
+    Writes the cells of an included file to the disk cache.
+    The cache is only an optimization, so a failure is ignored.
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_file_name), exist_ok=True)
+        # a unique temporary file, the threads and processes writing the same entry do not clash.
+        handle, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(cache_file_name))
+        try:
+            with os.fdopen(handle, "w", encoding="utf8") as file1:
+                json.dump({"cells": cells}, file1)
+            # the last writer wins, the entries are the same.
+            os.replace(temp_file_name, cache_file_name)
+        except OSError:
+            os.remove(temp_file_name)
+            raise
+    except OSError:
+        pass
+
+
+@functools.lru_cache(maxsize=INCLUDE_MEMORY_CACHE_SIZE)
+def _include_file_cells(file_name, hash1, cache_dir):
+    """
+    Returns the cells of an included file with the given hash, as a tuple of tuples.
+    """
+    cache_file_name = os.path.join(cache_dir, hash1[:2], hash1 + ".json") if cache_dir else None
+    if cache_file_name:
+        try:
+            with open(cache_file_name, "r", encoding="utf8") as handle:
+                return tuple(tuple(x) for x in json.load(handle)["cells"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    with open(file_name, "rb") as handle:
+        content = handle.read()
+    file_content, ranges = split_text_to_cell_ranges(content.decode("utf-8-sig"))
+    cells = [file_content[start1:stop1] for start1, stop1 in ranges]
+    if cache_file_name:
+        _write_include_cache_file(cache_file_name, cells)
+    return tuple(tuple(x) for x in cells)
+
+
+def read_include_cells(file_name, cache_dir=DEFAULT_INCLUDE_CACHE_DIR):
+    """
+    Returns the cells of an included file, as split_to_cells() does.
+
+    :type file_name: str
+    :type cache_dir: str
+    :param cache_dir: the directory of the disk cache, None to disable it.
+
+    The cells are cached by the hash of the file,
+    in memory for the last INCLUDE_MEMORY_CACHE_SIZE files and on disk for the later runs,
+    so a file included by many scripts is tokenized once.
+    The hash is found by the path, size and modification time,
+    so an unchanged file is not read again.
+    """
+    assert isinstance(file_name, str)
+
+    stat = os.stat(file_name)
+    hash1 = _include_file_hash((file_name, stat.st_size, stat.st_mtime_ns))
+    return [list(x) for x in _include_file_cells(file_name, hash1, cache_dir)]
+
+
+def is_inside_directory(file_name, directory):
+    """
+    Returns True if the real path of file_name is in directory, or in its subdirectories.
+
+    :type file_name: str
+    :type directory: str
+    """
+    real_directory = os.path.realpath(directory)
+    real_file_name = os.path.realpath(file_name)
+    return real_file_name.startswith(real_directory.rstrip(os.sep) + os.sep)
+
+
+def expand_includes(cells, base_dir, including_files=(), cache_dir=DEFAULT_INCLUDE_CACHE_DIR,
+                    root_dir=None, included_files=None):
+    """
+    Replaces the cells with include directives by the cells of the included files.
+    Raises ValueError for a missing file, a file outside root_dir or an include cycle.
+
+    :type cells: list
+    :param cells: the result of split_to_cells().
+    :type base_dir: str
+    :param base_dir: the include paths are relative to it.
+    :type including_files: tuple
+    :param including_files: the absolute paths of the files including the cells,
+        the first one is the converted file.
+    :type cache_dir: str
+    :param cache_dir: see read_include_cells().
+    :type root_dir: str
+    :param root_dir: if it is given, only the files in it can be included.
+    :type included_files: list
+    :param included_files: if it is given, the paths of the included files are appended to it.
+
+    The includes of the included files are expanded too,
+    their paths are relative to the included file.
+    The separator of a cell with a title, such as "# %% Setup", is kept before the included cells.
+    """
+    assert isinstance(cells, list)
+    assert isinstance(base_dir, str)
+
+    expanded_cells = []
+    for cell in cells:
+        path = cell_include(cell) if cell else None
+        if path is None:
+            expanded_cells.append(cell)
+            continue
+
+        file_name = os.path.abspath(os.path.join(base_dir, path))
+        if file_name in including_files:
+            chain = [os.path.basename(x) for x in including_files + (file_name,)]
+            raise ValueError("include cycle: " + " -> ".join(chain))
+        if root_dir is not None and not is_inside_directory(file_name, root_dir):
+            raise ValueError("included file is outside of %s: %s" % (root_dir, path))
+        if not os.path.isfile(file_name):
+            raise ValueError("included file not found: " + path)
+        if included_files is not None:
+            included_files.append(file_name)
+
+        title = cell_title(cell)
+        if title:
+            # the title of the cell with the directive is kept as a cell of its own.
+            expanded_cells.append([x for x in cell if x.strip()][:1])
+        included_cells = read_include_cells(file_name, cache_dir)
+        expanded_cells.extend(expand_includes(
+            included_cells, os.path.dirname(file_name), including_files + (file_name,), cache_dir,
+            root_dir, included_files))
+    return expanded_cells
+
+
+def find_py_files(topdir):
+    """
+    Returns the sorted list of .py files under topdir, recursively.
+    Hidden directories such as .git and .tox are skipped.
+
+    :type topdir: str
+    """
+    assert isinstance(topdir, str)
+
+    file_list = []
+    for root, dirs, files in os.walk(topdir):
+        dirs[:] = sorted(x for x in dirs if not x.startswith("."))
+        for name in sorted(files):
+            if name.endswith(".py"):
+                file_list.append(os.path.join(root, name))
+    return file_list
+
+
+def _skip_empty_transform(cell_type, lines):
+    """
+    Skips the cells that are empty or have only empty elements.
+    """
+    return (cell_type, lines) if is_list_having_non_empty_items(lines) else None
+
+
+def _ignore_cell_transform(cell_type, lines):
+    """
+    Skips the cells with the ignore marker, see cell_ignored().
+    """
+    return None if cell_ignored(lines) else (cell_type, lines)
+
+
+def _detect_type_transform(cell_type, lines):
+    """
+    Sets the cell type, see detect_cell_type().
+    A type set by an earlier transform is kept.
+    """
+    return cell_type or detect_cell_type(lines), lines
+
+
+def _prepare_markdown_transform(cell_type, lines):
+    """
+    See prepare_markdown_cell().
+    """
+    if cell_type == __CELL_TYPE_MARKDOWN:
+        lines = prepare_markdown_cell(lines)
+    return cell_type, lines
+
+
+def _strip_code_transform(cell_type, lines):
+    """
+    See remove_trailing_empty_elements().
+    """
+    if cell_type == __CELL_TYPE_CODE:
+        lines = remove_trailing_empty_elements(lines)
+    return cell_type, lines
+
+
+# the built-in cell transforms, as (order, name, function) tuples, in the order they run.
+# it is immutable, the other transforms are added to a copy, see add_transform().
+BUILTIN_TRANSFORMS = (
+    (100, "skip-empty", _skip_empty_transform),
+    (200, "ignore-cell", _ignore_cell_transform),
+    (400, "detect-type", _detect_type_transform),
+    (500, "prepare-markdown", _prepare_markdown_transform),
+    (600, "strip-code", _strip_code_transform),
+)
+
+
+def add_transform(transforms, name, function, order):
+    """
+    Returns a copy of the transforms with a new cell transform,
+    parse_cells() runs it on every cell.
+    A transform with the same name is replaced.
+
+    :type transforms: tuple
+    :param transforms: (order, name, function) tuples, such as BUILTIN_TRANSFORMS.
+    :type name: str
+    :param function: function(cell_type, lines), returns one of these:
+        None to skip the cell,
+        a (cell_type, lines) tuple for a single cell,
+        a list of (cell_type, lines) tuples to split the cell.
+        cell_type is None before the "detect-type" transform.
+    :type order: int
+    :param order: the transforms run from the lowest order to the highest.
+        The built-in transforms are:
+        100 skip-empty, 200 ignore-cell,
+        400 detect-type, 500 prepare-markdown, 600 strip-code
+
+    A transform stripping the solutions of the exercises, after the cell types are known:
+
+        def strip_solutions(cell_type, lines):
+            if cell_type == "code" and "# solution" in lines:
+                return cell_type, lines[:lines.index("# solution")] + ["# your code here"]
+            return cell_type, lines
+
+        transforms = spyondemain.add_transform(
+            spyondemain.BUILTIN_TRANSFORMS, "strip-solutions", strip_solutions, 450)
+        options = spyondemain.ConvertOptions(transforms=transforms)
+    """
+    assert isinstance(name, str)
+    assert callable(function)
+    assert isinstance(order, int)
+    items = [x for x in transforms if x[1] != name] + [(order, name, function)]
+    # sorted() is stable, so the transforms with the same order run in the order they are added.
+    return tuple(sorted(items, key=lambda x: x[0]))
+
+
+def remove_transform(transforms, name):
+    """
+    Returns a copy of the transforms without the named transform.
+
+    :type transforms: tuple
+    :type name: str
+    """
+    assert isinstance(name, str)
+    return tuple(x for x in transforms if x[1] != name)
+
+
+def transform_cell(cell_type, lines, transforms):
+    """
+    Runs the transforms on a cell, returns the list of resulting cells
+    as (cell_type, lines) tuples.
+
+    :type lines: list
+    :type transforms: list
+    :param transforms: (order, name, function) tuples, see add_transform().
+
+    The cells split from a cell run through the rest of the transforms.
+    """
+    assert isinstance(lines, list)
+
+    # (index of the next transform, cell_type, lines), the last one is processed first.
+    pending = [(0, cell_type, lines)]
+    results = []
+    while pending:
+        index, cell_type, lines = pending.pop()
+        while index < len(transforms):
+            result = transforms[index][2](cell_type, lines)
+            index += 1
+            if isinstance(result, list):
+                # split, keep the order of the parts.
+                pending.extend((index, x[0], x[1]) for x in reversed(result))
+                break
+            if result is None:
+                break
+            cell_type, lines = result
+        else:
+            results.append((cell_type, lines))
+    return results
+
+
+def parse_cells(cells, transforms=None):
     """
     Parses cells and builds a data to be written to a file.
 
     :type cells: list
+    :type transforms: list
+    :param transforms: (order, name, function) tuples,
+        BUILTIN_TRANSFORMS by default, see add_transform().
+
+    The transforms run on each cell, one after another,
+    before the next cell, so custom processing needs no second pass.
 
     Returns a data structure (parsed_cells) like:
 
@@ -599,27 +1118,30 @@ def parse_cells(cells):
     assert isinstance(cells[0], list)
     # assert isinstance(cells[0][0], str)
 
-    # TODO: 7 align_comment_cells() call
-    # cells = map(align_comment_cells, cells)
+    if transforms is None:
+        transforms = BUILTIN_TRANSFORMS
 
     parsed_cells = []
     for cell in cells:
-        if not is_list_having_non_empty_items(cell):
-            # if the cell is empty or has empty elements, ignore it.
-            continue
+        parsed_cells.extend(transform_cell(None, cell, transforms))
 
-        if cell_ignored(cell):
-            continue
-        cell_type = detect_cell_type(cell)
-        if cell_type == __CELL_TYPE_MARKDOWN:
-            cell = prepare_markdown_cell(cell)
+    return parsed_cells
 
-        if cell_type == __CELL_TYPE_CODE:
-            cell = remove_trailing_empty_elements(cell)
 
-        parsed_cells.append((cell_type, cell))
+def optimize_cell_sizes(data, options):
+    """
+    Merges the small markdown cells and splits the long code cells,
+    if options.merge_markdown_lines or options.split_code_lines is set.
+    Returns the new result of parse_cells().
 
-    return parsed_cells
+    :type data: list
+    :type options: ConvertOptions
+    """
+    if not options.merge_markdown_lines and not options.split_code_lines:
+        return data
+    import spyondegranularity  # pylint: disable=C0415,E0401
+    # C0415: import outside toplevel, it is only needed with --merge-markdown or --split-code.
+    return spyondegranularity.optimize_granularity(data, options.merge_markdown_lines, options.split_code_lines)
 
 
 def build_cell_dict(cell_data):
@@ -699,6 +1221,22 @@ def build_cell_dict(cell_data):
     return dct_cell
 
 
+def build_cell_dicts(data):
+    """
+    Returns the list of cell dictionaries for all the cell data.
+    See build_cell_dict() for a single cell.
+
+    :type data: list
+    """
+    assert isinstance(data, list)
+
+    all_cells_list = []
+    for cell_data in data:
+        cell_dict = build_cell_dict(cell_data)
+        all_cells_list.append(cell_dict)
+    return all_cells_list
+
+
 def build_notebook_json(data, pyversion):
     '''
     Iterates all the cell data, and returns a JSON string.
@@ -719,12 +1257,71 @@ def build_notebook_json(data, pyversion):
     assert isinstance(data, list)
     assert isinstance(pyversion, str)
 
-    all_cells_list = []
-    for cell_data in data:
-        cell_dict = build_cell_dict(cell_data)
-        all_cells_list.append(cell_dict)
+    all_cells_list = build_cell_dicts(data)
+    return serialize_notebook(all_cells_list, pyversion)
+
+
+def cell_id(cell, ordinal):
+    """
+    Returns the nbformat 4.5 id of a cell dictionary:
+    the hash of its type and source, and its ordinal among the identical cells.
+    An unchanged cell keeps its id when the notebook is generated again.
+
+    :type cell: dict
+    :type ordinal: int
+    :param ordinal: 0 for the first cell with the same content, 1 for the second...
+    """
+    assert isinstance(cell, dict)
+    assert isinstance(ordinal, int)
+
+    source = cell.get("source", "")
+    if isinstance(source, list):
+        source = "".join(source)
+    content = cell.get("cell_type", "") + "\n" + source
+    return "%s-%d" % (hashlib.sha1(content.encode("utf8")).hexdigest()[:16], ordinal)
+
+
+def assign_cell_ids(all_cells_list):
+    """
+    Sets the "id" of each cell dictionary, see cell_id().
+    Returns all_cells_list.
+
+    :type all_cells_list: list
+    :param all_cells_list: cell dictionaries, they are modified in place.
+    """
+    assert isinstance(all_cells_list, list)
+
+    ordinals = {}
+    for cell in all_cells_list:
+        cell.pop("id", None)
+        # the id is computed without the earlier one, then added as the last key.
+        first_id = cell_id(cell, 0)
+        ordinal = ordinals.get(first_id, 0)
+        ordinals[first_id] = ordinal + 1
+        cell["id"] = first_id if ordinal == 0 else cell_id(cell, ordinal)
+    return all_cells_list
+
+
+def notebook_format_minor(options):
+    """
+    Returns the nbformat_minor of the notebooks written with the options.
 
-    all_cells_as_json = json.dumps(all_cells_list, indent=4)
+    :type options: ConvertOptions
+    """
+    return NBFORMAT_MINOR_CELL_IDS if options.cell_ids else NBFORMAT_MINOR
+
+
+@functools.lru_cache(maxsize=32)
+def notebook_metadata_json(pyversion, nbformat_minor=NBFORMAT_MINOR):
+    """
+    Returns the part of the notebook JSON after the cells.
+    It is formatted once for each pyversion, the result is cached.
+
+    :type pyversion: str
+    :type nbformat_minor: int
+    """
+    assert isinstance(pyversion, str)
+    assert isinstance(nbformat_minor, int)
 
     metadata = """
 ,
@@ -749,16 +1346,251 @@ def build_notebook_json(data, pyversion):
   }
  },
  "nbformat": 4,
- "nbformat_minor": 2
+ "nbformat_minor": %d
 }
-    """ % (pyversion)
+    """ % (pyversion, nbformat_minor)
+    # serialize_notebook() strips the trailing whitespace.
+    return metadata.rstrip()
+
+
+@functools.lru_cache(maxsize=None)
+def _cell_templates():
+    """
+    Returns the pre-encoded JSON of the cells made by build_cell_dict(),
+    for each cell type, without and with an id as the last key:
+    {(cell_type, has_id): (keys, metadata repr, head, tail, closing)}
+    The source lines go between the head and the tail,
+    and the id, if there is one, between the tail and the closing.
+
+    It is computed once, from json.dumps() of empty cells,
+    so the templates are always the same as json.dumps().
+    """
+    templates = {}
+    marker = '"source": ['
+    id_marker = '"id": ""'
+    for cell_type in [__CELL_TYPE_MARKDOWN, __CELL_TYPE_CODE]:
+        for has_id in [False, True]:
+            cell = build_cell_dict((cell_type, []))
+            if has_id:
+                cell["id"] = ""
+            cell_as_json = "    " + json.dumps(cell, indent=4).replace("\n", "\n    ")
+            position = cell_as_json.index(marker + "]") + len(marker)
+            tail = cell_as_json[position + 1:]
+            closing = ""
+            if has_id:
+                id_position = tail.index(id_marker)
+                tail, closing = tail[:id_position + len(id_marker) - 2], tail[id_position + len(id_marker):]
+            templates[(cell_type, has_id)] = (
+                list(cell), repr(cell["metadata"]), cell_as_json[:position], tail, closing)
+    return templates
+
+
+def serialize_cell(cell):
+    """
+    Returns the JSON of a cell dictionary, as an item of the "cells" list:
+    indented by 4 spaces, like json.dumps(all_cells_list, indent=4).
+
+    :type cell: dict
+
+    The cells as made by build_cell_dict(), without outputs,
+    are written with pre-encoded templates, only their source lines
+    are encoded. The other cells are written by json.dumps().
+    """
+    cell_id1 = cell.get("id")
+    template = _cell_templates().get((cell.get("cell_type"), cell_id1 is not None))
+    if template is not None:
+        keys, metadata_repr, head, tail, closing = template
+        if (list(cell) == keys and repr(cell["metadata"]) == metadata_repr and
+                type(cell["source"]) is list and  # pylint: disable=C0123
+                (cell["cell_type"] != __CELL_TYPE_CODE or
+                 (cell["execution_count"] is None and cell["outputs"] == [])) and
+                (cell_id1 is None or isinstance(cell_id1, str))):
+            # C0123: a subclass of list may be written differently.
+            if closing:
+                closing = __ENCODE_STRING(cell_id1) + closing
+            if not cell["source"]:
+                return head + "]" + tail + closing
+            try:
+                lines = __SOURCE_LINE_SEPARATOR.join([__ENCODE_STRING(x) for x in cell["source"]])
+            except TypeError:
+                # not a str, json.dumps() knows what to do.
+                lines = None
+            if lines is not None:
+                return head + __SOURCE_LIST_START + lines + __SOURCE_LIST_END + tail + closing
+
+    # json.dumps() indents the items of the list by 4 spaces.
+    return "    " + json.dumps(cell, indent=4).replace("\n", "\n    ")
+
+
+def serialize_notebook(all_cells_list, pyversion, nbformat_minor=NBFORMAT_MINOR):
+    """
+    Returns the JSON string of a notebook with the cell dictionaries.
+
+    :type all_cells_list: list
+    :type pyversion: str
+    :type nbformat_minor: int
+    :param nbformat_minor: NBFORMAT_MINOR_CELL_IDS if the cells have ids.
+    """
+    assert isinstance(all_cells_list, list)
+    assert isinstance(pyversion, str)
 
-    output = """
-{
- "cells":
-    """ + all_cells_as_json + metadata
+    return "".join(iter_notebook_chunks(all_cells_list, pyversion, nbformat_minor))
 
-    return output.strip()
+
+def iter_notebook_chunks(cells, pyversion, nbformat_minor=NBFORMAT_MINOR):
+    """
+    Yields the JSON string of a notebook in chunks, a cell at a time.
+    The chunks make the same string as serialize_notebook(),
+    but the cells can come from a generator, so they do not have to be
+    in memory at the same time.
+
+    :param cells: an iterable of cell dictionaries.
+    :type pyversion: str
+    :type nbformat_minor: int
+    """
+    assert isinstance(pyversion, str)
+
+    yield '{\n "cells":\n    ['
+    separator = "\n"
+    for cell in cells:
+        yield separator + serialize_cell(cell)
+        separator = ",\n"
+    if separator == "\n":
+        # there are no cells.
+        yield "]"
+    else:
+        yield "\n]"
+    yield notebook_metadata_json(pyversion, nbformat_minor)
+
+
+def normalized_source_hash(source):
+    """
+    Returns a hash of the source of a cell, to find the same cell in another notebook.
+    Trailing whitespace and leading/trailing empty lines do not change the hash.
+
+    :param source: a string, or a list of strings as in .ipynb files.
+    """
+    if isinstance(source, list):
+        source = "".join(source)
+    assert isinstance(source, str)
+
+    lines = [x.rstrip() for x in source.splitlines()]
+    normalized = "\n".join(lines).strip("\n")
+    return hashlib.sha1(normalized.encode("utf8")).hexdigest()
+
+
+def read_previous_cells(output_file_name):
+    """
+    Returns the cells of an existing notebook,
+    or None if it does not exist or it can not be read.
+
+    :type output_file_name: str
+    """
+    assert isinstance(output_file_name, str)
+
+    if not os.path.isfile(output_file_name):
+        return None
+    try:
+        with open(output_file_name, "r", encoding="utf8") as handle:
+            notebook = json.load(handle)
+    except ValueError:
+        # not a valid JSON file, it will be overwritten.
+        return None
+    if not isinstance(notebook, dict) or not isinstance(notebook.get("cells"), list):
+        return None
+    return notebook["cells"]
+
+
+def copy_previous_outputs(all_cells_list, previous_cells):
+    """
+    Copies the outputs and execution counts of the unchanged code cells
+    from the cells of an earlier notebook.
+    Returns the number of cells with copied outputs.
+
+    :type all_cells_list: list
+    :param all_cells_list: cell dictionaries, they are modified in place.
+    :type previous_cells: list
+    :param previous_cells: cell dictionaries from read_previous_cells().
+
+    The cells are matched by normalized_source_hash(),
+    so moving a cell keeps its outputs, changing its source does not.
+    If the same source appears more than once,
+    the outputs are matched in order.
+    """
+    assert isinstance(all_cells_list, list)
+    assert isinstance(previous_cells, list)
+
+    outputs_by_hash = {}
+    for cell in previous_cells:
+        if not isinstance(cell, dict) or cell.get("cell_type") != __CELL_TYPE_CODE:
+            continue
+        if not cell.get("outputs") and cell.get("execution_count") is None:
+            continue
+        key = normalized_source_hash(cell.get("source", ""))
+        outputs_by_hash.setdefault(key, []).append(cell)
+
+    copied_count = 0
+    for cell in all_cells_list:
+        if cell["cell_type"] != __CELL_TYPE_CODE:
+            continue
+        candidates = outputs_by_hash.get(normalized_source_hash(cell["source"]))
+        if candidates:
+            previous_cell = candidates.pop(0)
+            cell["execution_count"] = previous_cell.get("execution_count")
+            cell["outputs"] = previous_cell.get("outputs", [])
+            copied_count += 1
+    return copied_count
+
+
+def notebook_cells_from_data(data, options, previous_cells=None, working_dir=None):
+    """
+    Returns the cell dictionaries of a notebook from parsed cells,
+    with the outputs copied from previous_cells or executed.
+
+    :type data: list
+    :param data: the result of parse_cells().
+    :type options: ConvertOptions
+    :type previous_cells: list
+    :param previous_cells: cells of an earlier notebook to copy outputs from.
+    :type working_dir: str
+    :param working_dir: the current directory to execute the cells in,
+        the directory of the images embedded with options.embed_images,
+        and of the sidecar files written with options.externalize_bytes.
+    """
+    assert isinstance(data, list)
+    assert isinstance(options, ConvertOptions)
+
+    all_cells_list = build_cell_dicts(data)
+    if options.externalize_bytes:
+        import spyondesidecar  # pylint: disable=C0415,E0401
+        # C0415: import outside toplevel, it is only needed with --externalize-bytes.
+        # before the outputs, the loaders are executed and matched.
+        spyondesidecar.externalize_cells(all_cells_list, working_dir or os.getcwd(), options.externalize_bytes)
+    if options.embed_images:
+        import spyondeattach  # pylint: disable=C0415,E0401
+        # C0415: import outside toplevel, it is only needed with --embed-images.
+        spyondeattach.embed_cell_images(all_cells_list, working_dir or os.getcwd())
+    if previous_cells:
+        copy_previous_outputs(all_cells_list, previous_cells)
+    if options.execute:
+        import spyondeexec  # pylint: disable=C0415,E0401
+        # C0415: import outside toplevel, it is only needed with --execute.
+        cache_dir = options.cache_dir or spyondeexec.DEFAULT_CACHE_DIR
+        spyondeexec.execute_cells(
+            all_cells_list, working_dir, options.timeout, cache_dir,
+            jobs=options.jobs, explain=options.explain)
+    if options.cell_ids:
+        assign_cell_ids(all_cells_list)
+    return all_cells_list
+
+
+def notebook_from_data(data, options, previous_cells=None, working_dir=None):
+    """
+    Returns the JSON string of a notebook from parsed cells.
+    See notebook_cells_from_data() for the parameters.
+    """
+    all_cells_list = notebook_cells_from_data(data, options, previous_cells, working_dir)
+    return serialize_notebook(all_cells_list, options.pyversion, notebook_format_minor(options))
 
 
 def generate_output_file_name(input_file_name):
@@ -772,12 +1604,22 @@ def generate_output_file_name(input_file_name):
     return output_file_name
 
 
-def convert_file(input_file_name, args_dict):
+def print_single_cell_message():
     """
-    Converts a .py file to a .ipynb file.
-    .py file must be written in a specific format to be converter.
+    Prints the message for the files skipped by --onlymulticell.
+    """
+    msg = "File has a single cell.\n"
+    msg += "It is probably an ordinary python file.\n"
+    msg += "Since --onlymulticell option is True by default, the file is skipped.\n"
+    msg += "To overwrite this behaviour, run Spyonde as follows:\n"
+    msg += "spyonde yourfile.py --onlymulticell=False\n"
+    print(msg)
+
+
+def options_from_args_dict(args_dict):
+    """
+    Returns a ConvertOptions from an args_dict of the earlier versions.
 
-    :type input_file_name: str
     :type args_dict: dict
 
     args_dict:
@@ -785,44 +1627,161 @@ def convert_file(input_file_name, args_dict):
         'output': 'outfile.ipynb',
         'pyversion': '3.8',
         'overwrite_confirmed': True,
+        'onlymulticell': 'True',
         'input': 'demo.py'
     }
-    """
 
-    assert isinstance(input_file_name, str)
+    onlymulticell can be a bool or a string such as "True" or "no".
+    The missing keys get their default values.
+    """
     assert isinstance(args_dict, dict)
 
-    output_file_name = args_dict["output"]
-    assert isinstance(output_file_name, str) or output_file_name is None
+    onlymulticell = args_dict.get("onlymulticell", True)
+    if isinstance(onlymulticell, str):
+        onlymulticell = if_affirmative(onlymulticell)
+
+    return ConvertOptions(
+        output=args_dict.get("output"),
+        pyversion=args_dict.get("pyversion", ConvertOptions().pyversion),
+        overwrite_confirmed=bool(args_dict.get("overwrite_confirmed", False)),
+        onlymulticell=bool(onlymulticell),
+        keep_outputs=bool(args_dict.get("keep_outputs", False)),
+        execute=bool(args_dict.get("execute", False)),
+        timeout=args_dict.get("timeout", ConvertOptions().timeout),
+        cache_dir=args_dict.get("cache_dir"),
+        jobs=args_dict.get("jobs", 1),
+        explain=bool(args_dict.get("explain", False)),
+        shard_cells=args_dict.get("shard_cells"),
+        shard_bytes=args_dict.get("shard_bytes"),
+        shard_headings=bool(args_dict.get("shard_headings", False)),
+        formats=args_dict.get("formats"),
+        validate=bool(args_dict.get("validate", False)),
+        cell_ids=bool(args_dict.get("cell_ids", False)),
+        embed_images=bool(args_dict.get("embed_images", False)),
+        externalize_bytes=args_dict.get("externalize_bytes"),
+        merge_markdown_lines=args_dict.get("merge_markdown_lines"),
+        split_code_lines=args_dict.get("split_code_lines"),
+        include_root=args_dict.get("include_root"),
+        transforms=args_dict.get("transforms"))
+
+
+def convert_text(text, options, previous_cells=None, base_dir=None):
+    """
+    Converts the contents of a .py file to the contents of a .ipynb file.
+    Returns None if options.onlymulticell is True and there is a single cell.
+    Nothing is printed or asked, so it is safe to call from services
+    and from multiple threads.
+    Only the caches of the includes and of the embedded images,
+    and the sidecar files of options.externalize_bytes are written.
+
+    :type text: str
+    :type options: ConvertOptions
+    :type previous_cells: list
+    :param previous_cells: cells of an earlier notebook to copy outputs from.
+    :type base_dir: str
+    :param base_dir: the directory of the text, the paths of the includes,
+        of the images of options.embed_images and of the sidecar files of
+        options.externalize_bytes are relative to it.
+        These are only done if it is given, and only the files in
+        options.include_root, or in base_dir, can be included.
+    """
+    assert isinstance(text, str)
+    assert isinstance(options, ConvertOptions)
 
-    if not output_file_name:
-        output_file_name = generate_output_file_name(input_file_name)
+    if base_dir is None:
+        # the current directory of a service is not the directory of the text.
+        options = options._replace(embed_images=False, externalize_bytes=None)
+
+    file_content, ranges = split_text_to_cell_ranges(text)
+    cells = [file_content[start1:stop1] for start1, stop1 in ranges]
+    if base_dir is not None:
+        cells = expand_includes(cells, base_dir, root_dir=options.include_root or base_dir)
+
+    data = parse_cells(cells, options.transforms)
+    if options.onlymulticell and len(data) < 2:
+        return None
+    data = optimize_cell_sizes(data, options)
+    return notebook_from_data(data, options, previous_cells, base_dir)
+
+
+def file_to_data(input_file_name, options, included_files=None):
+    """
+    Splits and parses a .py file.
+    Nothing is printed or asked, only the caches of the includes are written.
+
+    :type input_file_name: str
+    :type options: ConvertOptions
+    :type included_files: list
+    :param included_files: if it is given, the paths of the included files are appended to it.
+
+    Returns a tuple: (cell_count, data)
+    data is the result of parse_cells(),
+    or None if the file is skipped because of onlymulticell.
+    cell_count is None if the file is skipped even without parsing it.
+    """
+    assert isinstance(input_file_name, str)
+    assert isinstance(options, ConvertOptions)
+
+    if options.onlymulticell:
+        if not may_have_multiple_cells(input_file_name):
+            # rejected without tokenizing the file.
+            return None, None
 
     cells = split_to_cells(input_file_name)
+    input_path = os.path.abspath(input_file_name)
+    cells = expand_includes(cells, os.path.dirname(input_path), (input_path,),
+                            root_dir=options.include_root, included_files=included_files)
+
+    data = parse_cells(cells, options.transforms)
+    if options.onlymulticell and len(data) < 2:
+        return len(data), None
+    return len(data), optimize_cell_sizes(data, options)
+
+
+def file_to_notebook(input_file_name, options, previous_cells=None, included_files=None):
+    """
+    Converts a .py file to the contents of a .ipynb file, without writing it.
+    Nothing is printed, asked or written, so it is safe to call from services
+    and from multiple threads.
+    Only the caches of the includes, and the sidecar files of options.externalize_bytes are written.
+
+    :type input_file_name: str
+    :type options: ConvertOptions
+    :type previous_cells: list
+    :param previous_cells: cells of an earlier notebook to copy outputs from.
+    :type included_files: list
+    :param included_files: see file_to_data().
+
+    Returns a tuple: (cell_count, output_as_str)
+    output_as_str is None if the file is skipped because of onlymulticell.
+    cell_count is None if the file is skipped even without parsing it.
+    """
+    cell_count, data = file_to_data(input_file_name, options, included_files)
+    if data is None:
+        return cell_count, None
+
+    working_dir = os.path.dirname(os.path.abspath(input_file_name))
+    output_as_str = notebook_from_data(data, options, previous_cells, working_dir)
+    return cell_count, output_as_str
 
-    data = parse_cells(cells)
-    print("Number of cells in file:", len(data))
-    onlymulticell_as_str = args_dict["onlymulticell"]
-    onlymulticell = if_affirmative(onlymulticell_as_str)
-    if onlymulticell:
-        if len(data) < 2:
-            msg = "File has a single cell.\n"
-            msg += "It is probably an ordinary python file.\n"
-            msg += "Since --onlymulticell option is True by default, the file is skipped.\n"
-            msg += "To overwrite this behaviour, run Spyonde as follows:\n"
-            msg += "spyonde yourfile.py --onlymulticell=False\n"
-            print(msg)
-            return None
-
-    pyversion = args_dict["pyversion"]
-    output_as_str = build_notebook_json(data, pyversion)
+
+def confirm_overwrite(output_file_name, options):
+    """
+    Returns True if output_file_name can be written, False otherwise.
+    If the file exists and overwrite is not confirmed in the options,
+    the user is asked.
+
+    :type output_file_name: str
+    :type options: ConvertOptions
+    """
+    assert isinstance(output_file_name, str)
+    assert isinstance(options, ConvertOptions)
 
     if os.path.isfile(output_file_name):
         # file already exists.
         # will it be overwritten?
         to_be_written = False
-        overwrite_confirmed = args_dict["overwrite_confirmed"]
-        if overwrite_confirmed:
+        if options.overwrite_confirmed:
             to_be_written = True
         else:
             print("File exists: " + output_file_name)
@@ -834,12 +1793,121 @@ def convert_file(input_file_name, args_dict):
     else:
         # file does not exists.
         to_be_written = True
+    return to_be_written
+
+
+def notebook_is_valid(output_file_name, output_as_str, options):
+    """
+    Returns True if options.validate is False or the notebook is valid.
+    Otherwise, prints the errors and returns False.
+
+    :type output_file_name: str
+    :type output_as_str: str
+    :type options: ConvertOptions
+    """
+    if not options.validate:
+        return True
+    import spyondevalidate  # pylint: disable=C0415,E0401
+    # C0415: import outside toplevel, it is only needed with --validate.
+    errors = spyondevalidate.validate_notebook_json(output_as_str)
+    for error in errors:
+        print("%s: %s" % (output_file_name, error))
+    return not errors
+
+
+def create_temporary_file(file_name):
+    """
+    Creates an empty file with a unique name in the directory of file_name,
+    and returns its name.
+    It is meant to be renamed to file_name when it is complete,
+    so it has the permissions of a new file, not only the owner's.
 
-    if to_be_written:
-        # save the output as JSON.
-        handle = open(output_file_name, "w", encoding="utf8")
+    :type file_name: str
+    """
+    assert isinstance(file_name, str)
+    handle, temp_file_name = tempfile.mkstemp(
+        suffix=".tmp", prefix=os.path.basename(file_name) + ".", dir=os.path.dirname(os.path.abspath(file_name)))
+    os.close(handle)
+    # the umask can only be read by setting it.
+    umask = os.umask(0o022)
+    os.umask(umask)
+    os.chmod(temp_file_name, 0o666 & ~umask)
+    return temp_file_name
+
+
+def write_notebook(output_file_name, output_as_str):
+    """
+    Writes the contents of a .ipynb file.
+
+    :type output_file_name: str
+    :type output_as_str: str
+    """
+    assert isinstance(output_file_name, str)
+    assert isinstance(output_as_str, str)
+
+    # save the output as JSON.
+    with open(output_file_name, "w", encoding="utf8") as handle:
         handle.write(output_as_str)
-        handle.close()
+
+
+def convert_file(input_file_name, options):
+    """
+    Converts a .py file to a .ipynb file.
+    .py file must be written in a specific format to be converter.
+
+    :type input_file_name: str
+    :type options: ConvertOptions
+    :param options: an args_dict is also accepted, see options_from_args_dict().
+    """
+
+    assert isinstance(input_file_name, str)
+    if isinstance(options, dict):
+        options = options_from_args_dict(options)
+    assert isinstance(options, ConvertOptions)
+
+    output_file_name = options.output
+    assert isinstance(output_file_name, str) or output_file_name is None
+
+    if (options.externalize_bytes and output_file_name and
+            os.path.realpath(os.path.dirname(os.path.abspath(output_file_name))) !=
+            os.path.realpath(os.path.dirname(os.path.abspath(input_file_name)))):
+        # the loaders refer to the sidecar files relative to the .py file.
+        print("externalize_bytes needs the notebook in the directory of the .py file.")
+        print("file is not written.")
+        return None
+
+    if options.formats:
+        import spyondeformats  # pylint: disable=C0415,E0401
+        # C0415: import outside toplevel, it is only needed for --formats.
+        spyondeformats.convert_file_to_formats(input_file_name, options)
+        return None
+
+    if options.shard_cells or options.shard_bytes or options.shard_headings:
+        import spyondeshard  # pylint: disable=C0415,E0401
+        # C0415: import outside toplevel, it is only needed for sharding.
+        spyondeshard.convert_file_sharded(input_file_name, options)
+        return None
+
+    if not output_file_name:
+        output_file_name = generate_output_file_name(input_file_name)
+
+    previous_cells = None
+    if options.keep_outputs:
+        previous_cells = read_previous_cells(output_file_name)
+
+    cell_count, output_as_str = file_to_notebook(input_file_name, options, previous_cells)
+    if cell_count is not None:
+        print("Number of cells in file:", cell_count)
+    if output_as_str is None:
+        print_single_cell_message()
+        return None
+
+    if not notebook_is_valid(output_file_name, output_as_str, options):
+        print("file is not written.")
+        return None
+
+    if confirm_overwrite(output_file_name, options):
+        write_notebook(output_file_name, output_as_str)
         print("created: ", output_file_name)
     else:
         print("file is not written.")
@@ -862,38 +1930,56 @@ def main_trial():
     input_file_dir = os.path.join(module_path, "../")
     input_file_dir = os.path.join(input_file_dir, "examples")
 
-    args_dict = {'output': None, 'pyversion': '3.8', 'overwrite_confirmed': False}
+    options = ConvertOptions(pyversion='3.8')
+
+    for file_name in ["demo.py", "simple1.py", "simple2.py", "empty1.py", "regular1.py"]:
+        input_file_name = os.path.join(input_file_dir, file_name)
+        convert_file(input_file_name, options)
 
-    input_file_name = os.path.join(input_file_dir, "demo.py")
-    args_dict["input"] = input_file_name
-    convert_file(input_file_name, args_dict)
 
-    input_file_name = os.path.join(input_file_dir, "simple1.py")
-    args_dict["input"] = input_file_name
-    convert_file(input_file_name, args_dict)
+def find_changed_files(ref, staged, pathspecs, remove_stale):
+    """
+    Returns the list of .py files changed in git, or None if git fails.
 
-    input_file_name = os.path.join(input_file_dir, "simple2.py")
-    args_dict["input"] = input_file_name
-    convert_file(input_file_name, args_dict)
+    :type ref: str
+    :type staged: bool
+    :type pathspecs: list
+    :type remove_stale: bool
+    """
+    import spyondegit  # pylint: disable=C0415,E0401
+    # C0415: import outside toplevel, git is only needed in this mode.
 
-    input_file_name = os.path.join(input_file_dir, "empty1.py")
-    args_dict["input"] = input_file_name
-    convert_file(input_file_name, args_dict)
+    try:
+        changed, deleted = spyondegit.changed_python_files(ref, staged, pathspecs)
+    except subprocess.CalledProcessError as ex:
+        print("git failed:", ex.stderr.decode("utf8", "replace").strip())
+        return None
+    except OSError as ex:
+        print("git could not be run:", ex)
+        return None
 
-    input_file_name = os.path.join(input_file_dir, "regular1.py")
-    args_dict["input"] = input_file_name
-    convert_file(input_file_name, args_dict)
+    print("Number of changed files:", len(changed))
+    if remove_stale:
+        for output_file_name in spyondegit.remove_stale_notebooks(deleted):
+            print("removed: ", output_file_name)
+    return changed
 
 
 def start_command_line():
     """
     When called from command line, this function is executed.
     """
+    if len(sys.argv) > 1 and sys.argv[1] in __SUBCOMMANDS:
+        module_name, function_name = __SUBCOMMANDS[sys.argv[1]]
+        module = importlib.import_module(module_name)
+        getattr(module, function_name)(sys.argv[2:])
+        return
+
     print("Spyonde started.")
     parser = argparse.ArgumentParser()
 
-    help1 = "List of .py files to be converted."
-    parser.add_argument('files', nargs='+', help=help1)
+    help1 = "List of .py files to be converted. With --changed-since or --staged, the paths to search for changes. With --to-py, .ipynb files."
+    parser.add_argument('files', nargs='*', help=help1)
 
     help1 = 'The version string to be embedded into the Jupyter file. It is "3.7.4" by default.'
     parser.add_argument('--nbversion', nargs='?', help=help1, default="3.7.4")
@@ -904,22 +1990,176 @@ def start_command_line():
     help1 = 'Convert only files with multiple cells.'
     parser.add_argument('--onlymulticell', nargs='?', help=help1, default="True")
 
+    help1 = 'Convert only the .py files changed since this git revision.'
+    parser.add_argument('--changed-since', help=help1, default=None, metavar='REF')
+
+    help1 = 'Convert only the .py files staged for commit in git.'
+    parser.add_argument('--staged', action='store_true', help=help1)
+
+    help1 = 'With --changed-since or --staged, remove the generated notebooks of deleted .py files.'
+    parser.add_argument('--remove-stale', action='store_true', help=help1)
+
+    help1 = 'Keep the outputs of the unchanged code cells of an existing notebook.'
+    parser.add_argument('--keep-outputs', action='store_true', help=help1)
+
+    help1 = 'Execute the code cells in a Python subprocess and store their outputs.'
+    parser.add_argument('--execute', action='store_true', help=help1)
+
+    help1 = 'With --execute, maximum seconds for each cell. 0 means no limit. It is 60 by default.'
+    parser.add_argument('--timeout', type=float, help=help1, default=60)
+
+    help1 = 'With --execute, the directory to cache the outputs of the cells. It is ~/.cache/spyonde/outputs by default.'
+    parser.add_argument('--cache-dir', nargs='?', help=help1, default=None)
+
+    help1 = 'With --execute, the number of independent cell groups to execute at the same time. It is 1 by default.'
+    parser.add_argument('--jobs', type=int, help=help1, default=1)
+
+    help1 = 'With --execute, print why each code cell is executed or not.'
+    parser.add_argument('--explain', action='store_true', help=help1)
+
+    help1 = 'Split the notebook into linked notebooks of at most this many cells.'
+    parser.add_argument('--shard-cells', type=int, help=help1, default=None, metavar='N')
+
+    help1 = 'Split the notebook into linked notebooks of at most this many bytes.'
+    parser.add_argument('--shard-bytes', type=int, help=help1, default=None, metavar='N')
+
+    help1 = 'Split the notebook into linked notebooks at each top level heading.'
+    parser.add_argument('--shard-headings', action='store_true', help=help1)
+
+    help1 = 'Comma separated output formats, written from a single parse: ipynb, md and html. It is ipynb by default.'
+    parser.add_argument('--formats', nargs='?', help=help1, default=None)
+
+    help1 = 'Write the cells as self-contained HTML slides instead of a notebook.'
+    parser.add_argument('--slides', action='store_true', help=help1)
+
+    help1 = 'Write nbformat 4.5 notebooks with stable cell ids, derived from the contents of the cells.'
+    parser.add_argument('--cell-ids', action='store_true', help=help1)
+
+    help1 = 'Embed the local images of the markdown cells as attachments, so the notebooks do not need the image files.'
+    parser.add_argument('--embed-images', action='store_true', help=help1)
+
+    help1 = 'Move the source of the code cells larger than this many bytes to sidecar files, loaded when the cells run.'
+    parser.add_argument('--externalize-bytes', type=int, help=help1, default=None, metavar='N')
+
+    help1 = 'Merge the consecutive markdown cells while the merged cell has at most this many lines.'
+    parser.add_argument('--merge-markdown', type=int, help=help1, default=None, metavar='N')
+
+    help1 = 'Split the code cells longer than this many lines between their top level statements.'
+    parser.add_argument('--split-code', type=int, help=help1, default=None, metavar='N')
+
+    help1 = 'Validate the notebooks before writing them, invalid notebooks are not written.'
+    parser.add_argument('--validate', action='store_true', help=help1)
+
+    help1 = 'A module with a TRANSFORMS list of (order, name, function) cell transforms, see spyondemain.add_transform(). It can be given more than once.'
+    parser.add_argument('--transform', action='append', help=help1, default=[], metavar='MODULE')
+
+    help1 = 'Write all the notebooks to a single .zip, .tar, .tar.gz, .tar.bz2 or .tar.xz file.'
+    parser.add_argument('--archive', nargs='?', help=help1, default=None, metavar='FILE')
+
+    help1 = 'Convert .ipynb files back to cell separated .py files.'
+    parser.add_argument('--to-py', action='store_true', help=help1)
+
     args = parser.parse_args()
 
     print("args:")
     print(" ", args)
 
-    args_dict = {}
-
-    args_dict["output"] = None
-    args_dict["pyversion"] = args.nbversion
-    args_dict["overwrite_confirmed"] = args.overwrite
-    args_dict["onlymulticell"] = args.onlymulticell
-
-    for file_name in args.files:
-        if os.path.isfile(file_name):
-            args_dict["input"] = file_name
-            convert_file(file_name, args_dict)
+    if args.changed_since is not None and not args.changed_since.strip():
+        parser.error("--changed-since needs a git revision")
+    if args.remove_stale and not (args.changed_since or args.staged):
+        parser.error("--remove-stale can only be used with --changed-since or --staged")
+
+    file_names = args.files
+    if args.changed_since or args.staged:
+        file_names = find_changed_files(args.changed_since, args.staged, args.files, args.remove_stale)
+        if file_names is None:
+            return
+    elif not file_names:
+        parser.error("the following arguments are required: files")
+
+    if args.transform and os.getcwd() not in sys.path:
+        # the transform modules are usually next to the lectures.
+        sys.path.append(os.getcwd())
+    transforms = None
+    for module_name in args.transform:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError as ex:
+            parser.error("--transform module could not be imported: %s" % ex)
+        if not isinstance(getattr(module, "TRANSFORMS", None), (list, tuple)):
+            parser.error("--transform module has no TRANSFORMS list: %s" % module_name)
+        for order, name, function in module.TRANSFORMS:
+            transforms = add_transform(transforms or BUILTIN_TRANSFORMS, name, function, order)
+
+    for name, value in (("--merge-markdown", args.merge_markdown), ("--split-code", args.split_code),
+                        ("--externalize-bytes", args.externalize_bytes)):
+        if value is not None and value < 1:
+            parser.error("%s must be at least 1" % name)
+
+    formats = None
+    if args.formats:
+        import spyondeformats  # pylint: disable=C0415,E0401
+        try:
+            formats = tuple(spyondeformats.parse_formats(args.formats))
+        except ValueError as ex:
+            parser.error(str(ex))
+        if args.shard_cells or args.shard_bytes or args.shard_headings:
+            parser.error("--formats can not be used with sharding")
+
+    # the same options are used for all the files.
+    options = ConvertOptions(
+        output=None,
+        pyversion=args.nbversion,
+        overwrite_confirmed=args.overwrite,
+        onlymulticell=if_affirmative(args.onlymulticell),
+        keep_outputs=args.keep_outputs,
+        execute=args.execute,
+        timeout=args.timeout or None,
+        cache_dir=args.cache_dir,
+        jobs=args.jobs,
+        explain=args.explain,
+        shard_cells=args.shard_cells,
+        shard_bytes=args.shard_bytes,
+        shard_headings=args.shard_headings,
+        formats=formats,
+        validate=args.validate,
+        cell_ids=args.cell_ids,
+        embed_images=args.embed_images,
+        externalize_bytes=args.externalize_bytes,
+        merge_markdown_lines=args.merge_markdown,
+        split_code_lines=args.split_code,
+        transforms=transforms)
+
+    import spyondearchive  # pylint: disable=C0415,E0401
+    if args.archive:
+        if args.to_py or args.slides or formats or args.shard_cells or args.shard_bytes or args.shard_headings:
+            parser.error("--archive can only be used for .ipynb files")
+        if args.externalize_bytes:
+            parser.error("--archive can not be used with --externalize-bytes, the sidecar files are not archived")
+        if not spyondearchive.is_archive(args.archive):
+            parser.error("--archive must be a .zip, .tar, .tar.gz, .tgz, .tar.bz2 or .tar.xz file")
+        spyondearchive.convert_to_archive(file_names, args.archive, options)
+        return
+
+    convert_function = convert_file
+    if args.to_py:
+        import spyondetopy  # pylint: disable=C0415,E0401
+        convert_function = spyondetopy.convert_notebook_file
+    elif args.slides:
+        import spyondehtml  # pylint: disable=C0415,E0401
+        convert_function = spyondehtml.convert_file_to_slides
+
+    for file_name in file_names:
+        if convert_function is convert_file and spyondearchive.is_archive(file_name):
+            # the notebooks of an archive are written to another archive.
+            output_file_name = spyondearchive.generate_archive_file_name(file_name)
+            spyondearchive.convert_to_archive([file_name], output_file_name, options)
+        elif os.path.isfile(file_name):
+            try:
+                convert_function(file_name, options)
+            except ValueError as ex:
+                # an include cycle, a missing included file or a malformed notebook.
+                print("file could not be converted:", file_name, ex)
         else:
             print("NOT a file: ", file_name)
 
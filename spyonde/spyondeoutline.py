@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""
+Returns the outline of a cell separated script: cell titles and line ranges.
+It is meant for editor integrations, no notebook is built or written.
+
+    spyonde outline lecture.py
+    spyonde outline - < lecture.py
+"""
+
+import argparse
+import io
+import json
+import sys
+import tokenize
+
+import spyondemain  # pylint: disable=E0401
+
+__CELL_TYPE_IGNORED = "ignored"
+
+
+def find_separator_line_numbers_by_lines(file_content):
+    """
+    Returns the indices of the lines that look like cell separators.
+
+    :type file_content: list
+
+    This is used when the file can not be tokenized,
+    which is common while a buffer is being edited.
+    Unlike find_separator_line_numbers(),
+    "#%%" lines in multi-line strings are accepted as separators.
+    """
+    assert isinstance(file_content, list)
+
+    separator_line_numbers = []
+    for i, line in enumerate(file_content):
+        if i == 0 or line[:1].isspace():
+            # the same lines are skipped by find_separator_line_numbers().
+            continue
+        if spyondemain.is_cell_separator(line):
+            separator_line_numbers.append(i)
+    return separator_line_numbers
+
+
+def outline_ranges(file_content, ranges):
+    """
+    Returns the outline of the cells in the ranges.
+
+    :type file_content: list
+    :type ranges: list
+
+    Returns a list of dictionaries like:
+
+    [
+        {"number": 1, "start_line": 1, "end_line": 6, "cell_type": "code", "title": ""},
+        {"number": 2, "start_line": 8, "end_line": 12, "cell_type": "markdown", "title": "Python"}
+    ]
+
+    Line numbers start from 1, end_line is the last non-empty line of the cell.
+    number is the position of the cell in the notebook, starting from 1,
+    the same as the cell_number of "spyonde search".
+    Cells with the ignore comment have the "ignored" cell_type and None as number,
+    they are not in the notebook. Empty cells are not in the outline.
+    """
+    assert isinstance(file_content, list)
+    assert isinstance(ranges, list)
+
+    outline = []
+    number = 0
+    for start1, stop1 in ranges:
+        lines = spyondemain.remove_trailing_empty_elements(file_content[start1:stop1])
+        if not spyondemain.is_list_having_non_empty_items(lines):
+            continue
+
+        if spyondemain.cell_ignored(lines):
+            cell_type = __CELL_TYPE_IGNORED
+        else:
+            cell_type = spyondemain.detect_cell_type(lines)
+            number += 1
+
+        outline.append({
+            "number": number if cell_type != __CELL_TYPE_IGNORED else None,
+            "start_line": start1 + 1,
+            "end_line": start1 + len(lines),
+            "cell_type": cell_type,
+            "title": spyondemain.cell_title(lines),
+        })
+    return outline
+
+
+def outline_text(text):
+    """
+    Returns the outline of a script given as a string.
+    See outline_ranges() for the returned data.
+
+    :type text: str
+    """
+    assert isinstance(text, str)
+    try:
+        file_content, ranges = spyondemain.split_text_to_cell_ranges(text)
+    except (SyntaxError, tokenize.TokenError):
+        # the buffer is probably in the middle of an edit.
+        file_content = [x.rstrip() for x in io.StringIO(text).readlines()]
+        separator_line_numbers = find_separator_line_numbers_by_lines(file_content)
+        ranges = spyondemain.cell_line_ranges(separator_line_numbers, len(file_content))
+    return outline_ranges(file_content, ranges)
+
+
+def outline_file(input_file_name):
+    """
+    Returns the outline of a .py file.
+    See outline_ranges() for the returned data.
+
+    :type input_file_name: str
+    """
+    assert isinstance(input_file_name, str)
+    with open(input_file_name, "r", encoding="utf8") as handle:
+        text = handle.read()
+    return outline_text(text)
+
+
+def outline_command_line(argv):
+    """
+    Runs "spyonde outline" with the arguments after "outline".
+    The outline is printed as JSON.
+
+    :type argv: list
+    """
+    parser = argparse.ArgumentParser(prog="spyonde outline")
+
+    help1 = 'The .py file. If it is "-", the script is read from standard input.'
+    parser.add_argument('file', help=help1)
+
+    args = parser.parse_args(argv)
+
+    if args.file == "-":
+        outline = outline_text(sys.stdin.read())
+    else:
+        outline = outline_file(args.file)
+    print(json.dumps(outline, indent=1))
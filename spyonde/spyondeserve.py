@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+
+"""
+Serves the .py files of a directory as notebooks, converted on each request.
+
+    spyonde serve lectures --port 8000
+
+http://localhost:8000/lecture.py gives the notebook of the current lecture.py,
+and http://localhost:8000/ lists the .py files.
+
+The notebooks are kept in a LRU cache, keyed by the path, the size and the
+modification time of the file and of its included files,
+so an unchanged lecture is not converted again.
+Each notebook has an ETag, the hash of its contents,
+and a request with a matching If-None-Match header gets 304 Not Modified.
+The requests are handled in threads, a slow conversion does not block the others.
+The paths outside the served directory give 404,
+and the lectures can only include the files in it.
+"""
+
+import argparse
+import collections
+import hashlib
+import html
+import http.server
+import os
+import socketserver
+import threading
+import tokenize
+import urllib.parse
+
+import spyondemain  # pylint: disable=E0401
+
+_NOTEBOOK_CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+def _file_signature(file_name):
+    """
+    Returns (size, mtime_ns) of a file, or None if it is missing.
+    """
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class NotebookCache:
+    """
+    A thread safe LRU cache of the notebooks of .py files.
+
+        cache = NotebookCache(128)
+        etag, body = cache.get("lecture.py")
+    """
+
+    def __init__(self, max_size=128, options=None):
+        """
+        :type max_size: int
+        :param max_size: the number of notebooks kept in memory.
+        :type options: ConvertOptions
+        :param options: the options of the conversions.
+            Single cell files are converted too by default.
+        """
+        assert isinstance(max_size, int) and max_size > 0
+        self.max_size = max_size
+        self.options = options or spyondemain.ConvertOptions(onlymulticell=False)
+        # file name: ((size, mtime_ns), {included file name: (size, mtime_ns)}, etag, body)
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_name):
+        """
+        Returns (etag, body) of the notebook of a .py file,
+        body is the notebook as UTF-8 bytes.
+        Raises OSError if the file can not be read.
+
+        :type file_name: str
+        """
+        assert isinstance(file_name, str)
+
+        stat = os.stat(file_name)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            entry = self.entries.get(file_name)
+        if (entry is not None and entry[0] == signature and
+                all(_file_signature(x) == y for x, y in entry[1].items())):
+            with self.lock:
+                if file_name in self.entries:
+                    self.entries.move_to_end(file_name)
+                self.hits += 1
+            return entry[2], entry[3]
+        with self.lock:
+            self.misses += 1
+
+        # converted without the lock, the other requests are not blocked.
+        included_files = []
+        _, output_as_str = spyondemain.file_to_notebook(file_name, self.options, None, included_files)
+        if output_as_str is None:
+            output_as_str = spyondemain.serialize_notebook([], self.options.pyversion)
+        body = output_as_str.encode("utf8")
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        included_signatures = {x: _file_signature(x) for x in included_files}
+
+        with self.lock:
+            self.entries[file_name] = (signature, included_signatures, etag, body)
+            self.entries.move_to_end(file_name)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return etag, body
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Returns True if an If-None-Match header value matches the etag.
+
+    :type if_none_match: str
+    :type etag: str
+    """
+    if not if_none_match:
+        return False
+    tags = [x.strip() for x in if_none_match.split(",")]
+    # weak tags are the same for GET requests.
+    return "*" in tags or etag in tags or ("W/" + etag) in tags
+
+
+def directory_listing(directory, url_path):
+    """
+    Returns the HTML list of the .py files and the directories in a directory.
+
+    :type directory: str
+    :type url_path: str
+    """
+    if not url_path.endswith("/"):
+        url_path += "/"
+    items = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("."):
+            continue
+        if os.path.isdir(os.path.join(directory, name)):
+            name += "/"
+        elif not name.endswith(".py"):
+            continue
+        items.append('<li><a href="%s">%s</a></li>' % (
+            html.escape(urllib.parse.quote(url_path + name), quote=True), html.escape(name, quote=False)))
+    title = html.escape(url_path, quote=False)
+    return ('<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8"><title>%s</title></head>\n'
+            '<body>\n<h1>%s</h1>\n<ul>\n%s\n</ul>\n</body>\n</html>\n' % (title, title, "\n".join(items)))
+
+
+class _Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    A HTTP server handling each request in a thread,
+    http.server.ThreadingHTTPServer is only in Python 3.7 and later.
+    """
+
+    daemon_threads = True
+
+
+class NotebookRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handles the requests of "spyonde serve".
+    The server has the root_dir and the cache attributes, see make_server().
+    """
+
+    def do_GET(self):  # pylint: disable=C0103
+        """
+        Sends a notebook or a directory listing.
+        """
+        self.send_content(True)
+
+    def do_HEAD(self):  # pylint: disable=C0103
+        """
+        Sends the headers of do_GET().
+        """
+        self.send_content(False)
+
+    def translate_path(self):
+        """
+        Returns (url_path, file_name) of the request,
+        file_name is None if it is outside the root directory.
+        """
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        root_dir = self.server.root_dir
+        file_name = os.path.realpath(os.path.join(root_dir, *[x for x in url_path.split("/") if x]))
+        if file_name != root_dir and not file_name.startswith(root_dir + os.sep):
+            return url_path, None
+        return url_path, file_name
+
+    def send_body(self, status, content_type, body, write_body, headers=()):
+        """
+        Sends a response.
+        """
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if write_body:
+            self.wfile.write(body)
+
+    def send_content(self, write_body):
+        """
+        Sends the response of a GET or a HEAD request.
+        """
+        url_path, file_name = self.translate_path()
+        if file_name is None or not os.path.exists(file_name):
+            self.send_body(404, "text/plain; charset=utf-8", b"not found\n", write_body)
+            return
+
+        if os.path.isdir(file_name):
+            body = directory_listing(file_name, url_path).encode("utf8")
+            self.send_body(200, "text/html; charset=utf-8", body, write_body)
+            return
+
+        if not file_name.endswith(".py"):
+            self.send_body(404, "text/plain; charset=utf-8", b"not a .py file\n", write_body)
+            return
+
+        try:
+            etag, body = self.server.cache.get(file_name)
+        except (OSError, SyntaxError, tokenize.TokenError, UnicodeDecodeError, ValueError) as ex:
+            message = "could not be converted: %s\n" % ex
+            self.send_body(500, "text/plain; charset=utf-8", message.encode("utf8"), write_body)
+            return
+
+        headers = [("ETag", etag), ("Cache-Control", "no-cache")]
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        self.send_body(200, _NOTEBOOK_CONTENT_TYPE, body, write_body, headers)
+
+
+def make_server(root_dir, port=8000, bind="127.0.0.1", cache_size=128):
+    """
+    Returns a threading HTTP server serving root_dir, it is not started.
+
+    :type root_dir: str
+    :type port: int
+    :param port: 0 selects a free port, see server.server_address.
+    :type bind: str
+    :type cache_size: int
+    """
+    assert isinstance(root_dir, str)
+
+    server = _Server((bind, port), NotebookRequestHandler)
+    server.root_dir = os.path.realpath(root_dir)
+    options = spyondemain.ConvertOptions(onlymulticell=False, include_root=server.root_dir)
+    server.cache = NotebookCache(cache_size, options)
+    return server
+
+
+def serve_command_line(argv):
+    """
+    Runs "spyonde serve" with the arguments after "serve".
+
+    :type argv: list
+    """
+    parser = argparse.ArgumentParser(prog="spyonde serve")
+
+    help1 = "The directory of the .py files. The current directory by default."
+    parser.add_argument('dir', nargs='?', help=help1, default=".")
+
+    help1 = "The port to listen on. It is 8000 by default."
+    parser.add_argument('--port', type=int, help=help1, default=8000)
+
+    help1 = 'The address to listen on. It is "127.0.0.1" by default, only this computer can connect.'
+    parser.add_argument('--bind', nargs='?', help=help1, default="127.0.0.1")
+
+    help1 = "The number of notebooks kept in memory. It is 128 by default."
+    parser.add_argument('--cache-size', type=int, help=help1, default=128)
+
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.dir):
+        print("NOT a directory: ", args.dir)
+        return
+    if args.cache_size < 1:
+        parser.error("--cache-size must be at least 1")
+
+    server = make_server(args.dir, args.port, args.bind, args.cache_size)
+    host, port = server.server_address[:2]
+    print("serving %s at http://%s:%d/" % (os.path.abspath(args.dir), host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("stopped.")
+    finally:
+        server.server_close()
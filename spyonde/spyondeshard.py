@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+"""
+Splits the notebook of a huge script into several linked notebooks.
+
+    spyonde --overwrite --shard-headings --shard-cells 200 lecture.py
+
+Jupyter gets slow on notebooks with thousands of cells.
+The shards are written as lecture.py.gen.part001.ipynb,
+lecture.py.gen.part002.ipynb and so on, each one with links to the
+previous and the next shard.
+lecture.py.gen.ipynb becomes an index notebook with links to all the shards.
+When all of them are written, the shards left by an earlier conversion
+with more shards are removed.
+"""
+
+import concurrent.futures
+import json
+import os
+
+import spyondemain  # pylint: disable=E0401
+
+__CELL_TYPE_MARKDOWN = "markdown"
+__HEADING_PREFIX = "# "
+
+
+def is_heading_cell(cell):
+    """
+    Returns True if the cell dictionary is a markdown cell
+    starting with a top level heading, like the ones
+    prepare_markdown_cell() makes from "# %% Title" lines.
+
+    :type cell: dict
+    """
+    assert isinstance(cell, dict)
+    return (cell["cell_type"] == __CELL_TYPE_MARKDOWN and
+            bool(cell["source"]) and
+            cell["source"][0].startswith(__HEADING_PREFIX))
+
+
+def cell_size(cell):
+    """
+    Returns the approximate size of a cell in the notebook, in bytes.
+
+    :type cell: dict
+    """
+    return len(json.dumps(cell, indent=4).encode("utf8"))
+
+
+def shard_cells(all_cells_list, max_cells=None, max_bytes=None, by_heading=False):
+    """
+    Splits the cell dictionaries into shards, returns a list of lists.
+
+    :type all_cells_list: list
+    :type max_cells: int
+    :param max_cells: the maximum number of cells in a shard, None for no limit.
+    :type max_bytes: int
+    :param max_bytes: the maximum size of a shard, None for no limit.
+        A single cell larger than max_bytes gets a shard of its own.
+    :type by_heading: bool
+    :param by_heading: if True, a shard starts at each top level heading.
+    """
+    assert isinstance(all_cells_list, list)
+
+    shards = []
+    shard = []
+    shard_bytes = 0
+    for cell in all_cells_list:
+        size = cell_size(cell) if max_bytes else 0
+        if shard:
+            new_shard = by_heading and is_heading_cell(cell)
+            new_shard = new_shard or (max_cells and len(shard) >= max_cells)
+            new_shard = new_shard or (max_bytes and shard_bytes + size > max_bytes)
+            if new_shard:
+                shards.append(shard)
+                shard = []
+                shard_bytes = 0
+        shard.append(cell)
+        shard_bytes += size
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def shard_title(shard, number):
+    """
+    Returns the title of a shard: its first heading, or "Part 3".
+
+    :type shard: list
+    :type number: int
+    """
+    for cell in shard:
+        if is_heading_cell(cell):
+            return cell["source"][0][len(__HEADING_PREFIX):].strip()
+    return "Part %d" % number
+
+
+def generate_shard_file_name(output_file_name, number):
+    """
+    Returns the file name of a shard.
+
+    :type output_file_name: str
+    :type number: int
+
+    "demo.py.gen.ipynb", 2 gives "demo.py.gen.part002.ipynb"
+    """
+    assert isinstance(output_file_name, str)
+    base, ext = os.path.splitext(output_file_name)
+    return "%s.part%03d%s" % (base, number, ext)
+
+
+def navigation_cell(index_file_name, previous_file_name, next_file_name):
+    """
+    Returns a markdown cell dictionary with the links to the index
+    and the previous and next shards, None for the missing ones.
+    The cell is skipped in the slideshow.
+    """
+    links = []
+    if previous_file_name:
+        links.append("[Previous](%s)" % os.path.basename(previous_file_name))
+    links.append("[Index](%s)" % os.path.basename(index_file_name))
+    if next_file_name:
+        links.append("[Next](%s)" % os.path.basename(next_file_name))
+
+    cell = spyondemain.build_cell_dict((__CELL_TYPE_MARKDOWN, [" | ".join(links)]))
+    cell["metadata"] = {"slideshow": {"slide_type": "skip"}}
+    return cell
+
+
+def index_cells(title, shard_file_names, titles):
+    """
+    Returns the cell dictionaries of the index notebook.
+
+    :type title: str
+    :type shard_file_names: list
+    :type titles: list
+    """
+    lines = [__HEADING_PREFIX + title, ""]
+    for number, (file_name, shard_title1) in enumerate(zip(shard_file_names, titles), 1):
+        lines.append("%d. [%s](%s)" % (number, shard_title1, os.path.basename(file_name)))
+    return [spyondemain.build_cell_dict((__CELL_TYPE_MARKDOWN, lines))]
+
+
+def linked_shards(shards, output_file_name):
+    """
+    Adds the navigation cells to the shards.
+    Returns a list of (file_name, all_cells_list) tuples,
+    the index notebook is the first one.
+
+    :type shards: list
+    :type output_file_name: str
+    """
+    file_names = [generate_shard_file_name(output_file_name, i + 1) for i in range(len(shards))]
+    titles = [shard_title(shard, i + 1) for i, shard in enumerate(shards)]
+
+    title = os.path.basename(output_file_name)
+    notebooks = [(output_file_name, index_cells(title, file_names, titles))]
+    for i, shard in enumerate(shards):
+        previous_file_name = file_names[i - 1] if i > 0 else None
+        next_file_name = file_names[i + 1] if i + 1 < len(file_names) else None
+        navigation = navigation_cell(output_file_name, previous_file_name, next_file_name)
+        # the same links at the top and at the bottom.
+        notebooks.append((file_names[i], [navigation] + shard + [dict(navigation)]))
+    return notebooks
+
+
+def read_previous_shard_cells(output_file_name):
+    """
+    Returns the cells of the existing shards of a notebook, for --keep-outputs.
+
+    :type output_file_name: str
+    """
+    previous_cells = []
+    number = 1
+    while True:
+        cells = spyondemain.read_previous_cells(generate_shard_file_name(output_file_name, number))
+        if cells is None:
+            break
+        previous_cells.extend(cells)
+        number += 1
+    return previous_cells
+
+
+def remove_stale_shards(output_file_name, count):
+    """
+    Removes the shards after the first count shards, left by an earlier
+    conversion with more shards, so --keep-outputs does not read them back.
+    Returns the list of file names removed.
+
+    :type output_file_name: str
+    :type count: int
+    """
+    removed = []
+    number = count + 1
+    while True:
+        file_name = generate_shard_file_name(output_file_name, number)
+        if not os.path.isfile(file_name):
+            break
+        os.remove(file_name)
+        removed.append(file_name)
+        number += 1
+    return removed
+
+
+def _write_shard(file_name, all_cells_list, options):
+    """
+    Serializes and writes a single notebook.
+    Returns None if it is not valid.
+    """
+    if options.cell_ids:
+        # the navigation cells need ids too.
+        spyondemain.assign_cell_ids(all_cells_list)
+    output_as_str = spyondemain.serialize_notebook(
+        all_cells_list, options.pyversion, spyondemain.notebook_format_minor(options))
+    if not spyondemain.notebook_is_valid(file_name, output_as_str, options):
+        return None
+    spyondemain.write_notebook(file_name, output_as_str)
+    return file_name
+
+
+def convert_file_sharded(input_file_name, options):
+    """
+    Converts a .py file to an index notebook and its shards.
+    Returns the list of file names written.
+
+    :type input_file_name: str
+    :type options: ConvertOptions
+    :param options: options.shard_cells, options.shard_bytes and
+        options.shard_headings select how the cells are split.
+
+    Overwriting is confirmed for all the files first,
+    then they are written in parallel.
+    """
+    assert isinstance(input_file_name, str)
+    assert isinstance(options, spyondemain.ConvertOptions)
+
+    output_file_name = options.output or spyondemain.generate_output_file_name(input_file_name)
+
+    cell_count, data = spyondemain.file_to_data(input_file_name, options)
+    if cell_count is not None:
+        print("Number of cells in file:", cell_count)
+    if data is None:
+        spyondemain.print_single_cell_message()
+        return []
+
+    previous_cells = read_previous_shard_cells(output_file_name) if options.keep_outputs else None
+    working_dir = os.path.dirname(os.path.abspath(input_file_name))
+    all_cells_list = spyondemain.notebook_cells_from_data(data, options, previous_cells, working_dir)
+
+    shards = shard_cells(all_cells_list, options.shard_cells, options.shard_bytes, options.shard_headings)
+    notebooks = linked_shards(shards, output_file_name)
+    notebooks = [x for x in notebooks if spyondemain.confirm_overwrite(x[0], options)]
+
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        futures = [executor.submit(_write_shard, file_name, cells, options)
+                   for file_name, cells in notebooks]
+        written = [x.result() for x in futures]
+    written = [x for x in written if x is not None]
+
+    for file_name in written:
+        print("created: ", file_name)
+    if len(written) < len(shards) + 1:
+        print("some files are not written.")
+    else:
+        for file_name in remove_stale_shards(output_file_name, len(shards)):
+            print("removed: ", file_name)
+    return written
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+Moves the source of huge code cells to sidecar files,
+and replaces the cells with small loaders.
+
+    spyonde --overwrite --externalize-bytes 100000 generated.py
+
+A cell assigning a single literal, like "table = [...]", is written as JSON,
+and its loader reads it with json.load().
+The other huge cells are written as .py files, and their loaders run them
+with exec(), in the namespace of the notebook.
+The comment lines at the top of a cell are kept in its loader.
+
+The sidecar files are named by the hash of their contents and written to the
+"spyonde-data" directory next to the .py file, so unchanged cells keep
+their files and their loaders, and the cells shared by many scripts are
+stored once.
+The loaders use relative paths, they work when the notebook is next to
+the .py file, as it is by default, a notebook in another directory is not written.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import tempfile
+
+__CELL_TYPE_CODE = "code"
+
+SIDECAR_DIR_NAME = "spyonde-data"
+
+
+def cell_literal(source):
+    """
+    Returns (name, value) if the source only assigns a JSON compatible literal
+    to a name, None otherwise.
+
+    :type source: str
+
+    Tuples, non string keys and the other values JSON would change
+    are not JSON compatible.
+    """
+    assert isinstance(source, str)
+
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Assign):
+        return None
+    statement = tree.body[0]
+    if len(statement.targets) != 1 or not isinstance(statement.targets[0], ast.Name):
+        return None
+    try:
+        value = ast.literal_eval(statement.value)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+    if not isinstance(value, (list, dict)):
+        return None
+    try:
+        if json.loads(json.dumps(value)) != value:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return statement.targets[0].id, value
+
+
+def leading_comments(lines):
+    """
+    Returns the comment lines at the top of the source lines of a cell.
+
+    :type lines: list
+    """
+    comments = []
+    for line in lines:
+        if not line.lstrip().startswith("#"):
+            break
+        comments.append(line)
+    return comments
+
+
+def sidecar_content(source):
+    """
+    Returns (extension, content, loader_lines) of the sidecar file of a cell source.
+    The loader lines refer to the file as "{path}", see externalize_cell().
+
+    :type source: str
+    """
+    assert isinstance(source, str)
+
+    literal = cell_literal(source)
+    if literal is not None:
+        name, value = literal
+        content = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        loader_lines = [
+            "import json\n",
+            "with open(\"{path}\", encoding=\"utf8\") as handle:\n",
+            "    %s = json.load(handle)\n" % name]
+        return ".json", content, loader_lines
+
+    loader_lines = [
+        "with open(\"{path}\", encoding=\"utf8\") as handle:\n",
+        "    exec(compile(handle.read(), \"{path}\", \"exec\"))\n"]
+    return ".py", source, loader_lines
+
+
+def write_sidecar_file(file_name, content):
+    """
+    Writes a sidecar file, unless it is already there.
+    The names are hashes of the contents, so an existing file is the same file.
+
+    :type file_name: str
+    :type content: str
+    """
+    if os.path.isfile(file_name):
+        return
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    # a unique temporary file, the threads and processes writing the same file do not clash.
+    handle, temp_file_name = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(file_name))
+    try:
+        with os.fdopen(handle, "w", encoding="utf8", newline="\n") as file1:
+            file1.write(content)
+        os.replace(temp_file_name, file_name)
+    except OSError:
+        os.remove(temp_file_name)
+        raise
+
+
+def externalize_cell(cell, base_dir, max_bytes):
+    """
+    Moves the source of a code cell larger than max_bytes to a sidecar file,
+    and replaces it with a loader.
+    Returns the name of the sidecar file, or None if the cell is not changed.
+
+    :type cell: dict
+    :param cell: a cell dictionary, it is modified in place.
+    :type base_dir: str
+    :param base_dir: the directory of the .py file, the sidecar directory is in it.
+    :type max_bytes: int
+    """
+    assert isinstance(cell, dict)
+    assert isinstance(base_dir, str)
+    assert isinstance(max_bytes, int)
+
+    if cell.get("cell_type") != __CELL_TYPE_CODE:
+        return None
+    source = "".join(cell["source"])
+    if len(source.encode("utf8")) <= max_bytes:
+        return None
+
+    extension, content, loader_lines = sidecar_content(source)
+    hash1 = hashlib.sha1(content.encode("utf8")).hexdigest()[:16]
+    # forward slashes, the loaders work on every platform.
+    path = SIDECAR_DIR_NAME + "/" + hash1 + extension
+    write_sidecar_file(os.path.join(base_dir, SIDECAR_DIR_NAME, hash1 + extension), content)
+
+    comments = [x.rstrip("\n") + "\n" for x in leading_comments(cell["source"])]
+    cell["source"] = comments + [x.replace("{path}", path) for x in loader_lines]
+    return path
+
+
+def externalize_cells(all_cells_list, base_dir, max_bytes):
+    """
+    Externalizes the code cells larger than max_bytes, see externalize_cell().
+    Returns the number of cells externalized.
+
+    :type all_cells_list: list
+    :type base_dir: str
+    :type max_bytes: int
+    """
+    assert isinstance(all_cells_list, list)
+    return sum(externalize_cell(cell, base_dir, max_bytes) is not None for cell in all_cells_list)
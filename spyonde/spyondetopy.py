@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+
+"""
+Converts Jupyter notebooks back to cell separated Python scripts.
+
+    spyonde --to-py lecture.ipynb
+
+The notebook is read incrementally, only the type and source of the cells
+are kept in memory. Outputs, attachments and metadata are skipped
+while they are being read, so notebooks with large embedded outputs
+do not have to fit in memory.
+
+The cells are written with the conventions of the .py to .ipynb conversion,
+so converting the .py file again gives the same notebook.
+The .py files have no raw cells, a raw cell is written as a markdown cell
+without a title, so its text is kept as comments and it is a markdown cell
+in the notebook converted from the .py file.
+"""
+
+import json
+import re
+
+import spyondemain  # pylint: disable=E0401
+
+__CELL_TYPE_CODE = "code"
+__CELL_TYPE_MARKDOWN = "markdown"
+__CELL_TYPE_RAW = "raw"
+__CELL_TYPES = (__CELL_TYPE_CODE, __CELL_TYPE_MARKDOWN, __CELL_TYPE_RAW)
+__CELL_SEPARATOR = "# %%"
+__COMMENT_STARTER = "#"
+
+# empty lines written after a code cell.
+# markdown cells keep their own trailing empty lines.
+__LINES_AFTER_CODE_CELL = ["", ""]
+
+_WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+_STRING_PART_PATTERN = re.compile(r'[^"\\]*')
+_LITERAL_PATTERN = re.compile(r'[-+0-9.eEtrufalsn]*')
+
+
+class JsonStreamReader:
+    """
+    Reads a JSON document from a text handle, a chunk at a time.
+
+    Objects and arrays are walked with iter_object() and iter_array(),
+    and each value must be consumed by read_value() or skip_value().
+    skip_value() does not build the value, so skipping a large string
+    only costs the time to find its end.
+    """
+
+    def __init__(self, handle, chunk_size=1 << 16):
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self):
+        """
+        Reads the next chunk, returns False at the end of the file.
+        """
+        chunk = self.handle.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skips the whitespace and returns the next character without consuming it.
+        Returns an empty string at the end of the file.
+        """
+        while True:
+            self.pos = _WHITESPACE_PATTERN.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        """
+        Consumes the next character, which must be char.
+        """
+        if self.peek() != char:
+            raise ValueError("expected %r at %r" % (char, self.buffer[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def _scan_string(self, keep):
+        """
+        Consumes a string, returns its raw contents if keep is True.
+        """
+        self.expect('"')
+        parts = []
+        while True:
+            end = _STRING_PART_PATTERN.match(self.buffer, self.pos).end()
+            if keep:
+                parts.append(self.buffer[self.pos:end])
+            self.pos = end
+            if end + 1 >= len(self.buffer):
+                # the quote or the escaped character may be in the next chunk.
+                if not self._fill():
+                    if self.pos < len(self.buffer) and self.buffer[self.pos] == '"':
+                        self.pos += 1
+                        return "".join(parts)
+                    raise ValueError("unterminated string")
+                continue
+            char = self.buffer[self.pos]
+            if char == '"':
+                self.pos += 1
+                return "".join(parts)
+            # a backslash, keep it with the escaped character.
+            if keep:
+                parts.append(self.buffer[self.pos:self.pos + 2])
+            self.pos += 2
+
+    def read_string(self):
+        """
+        Consumes a string and returns it.
+        """
+        raw = self._scan_string(keep=True)
+        return json.loads('"' + raw + '"')
+
+    def _read_literal(self):
+        """
+        Consumes a number, true, false or null, and returns its text.
+        """
+        self.peek()
+        while True:
+            end = _LITERAL_PATTERN.match(self.buffer, self.pos).end()
+            if end < len(self.buffer) or not self._fill():
+                break
+        end = _LITERAL_PATTERN.match(self.buffer, self.pos).end()
+        literal = self.buffer[self.pos:end]
+        self.pos = end
+        return literal
+
+    def iter_object(self):
+        """
+        Consumes an object, yields its keys.
+        The value of each key must be consumed before the next one.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def iter_array(self):
+        """
+        Consumes an array, yields once for each element.
+        Each element must be consumed before the next one.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+    def read_value(self):
+        """
+        Consumes a value and returns it as a Python object.
+        """
+        char = self.peek()
+        if char == '"':
+            return self.read_string()
+        if char == "{":
+            return {key: self.read_value() for key in self.iter_object()}
+        if char == "[":
+            return [self.read_value() for _ in self.iter_array()]
+        return json.loads(self._read_literal())
+
+    def skip_value(self):
+        """
+        Consumes a value without building it.
+        """
+        char = self.peek()
+        if char == '"':
+            self._scan_string(keep=False)
+        elif char == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        elif char == "[":
+            for _ in self.iter_array():
+                self.skip_value()
+        else:
+            self._read_literal()
+
+
+def iter_notebook_cells(handle):
+    """
+    Yields the cells of a notebook as (cell_type, lines) tuples.
+
+    :param handle: a text handle of a .ipynb file.
+
+    ('markdown', ['# Python strings', '- immutable'])
+
+    Raises ValueError for a cell without a known cell_type or with a source
+    that is not a string or a list of strings.
+    """
+    reader = JsonStreamReader(handle)
+    for key in reader.iter_object():
+        if key != "cells":
+            reader.skip_value()
+            continue
+        for index in reader.iter_array():
+            cell_type = None
+            source = ""
+            for cell_key in reader.iter_object():
+                if cell_key == "cell_type":
+                    cell_type = reader.read_value()
+                elif cell_key == "source":
+                    source = reader.read_value()
+                else:
+                    # outputs, attachments, metadata...
+                    reader.skip_value()
+            if cell_type not in __CELL_TYPES:
+                raise ValueError("cell %d has an invalid cell_type: %r" % (index, cell_type))
+            if isinstance(source, list) and all(isinstance(x, str) for x in source):
+                source = "".join(source)
+            if not isinstance(source, str):
+                raise ValueError("cell %d has an invalid source" % index)
+            yield cell_type, source.splitlines()
+
+
+def cell_to_py_lines(cell_type, lines):
+    """
+    Returns the lines of a .py file for a single cell.
+
+    :type cell_type: str
+    :type lines: list
+
+    A markdown cell:
+    ['# Python strings', '', ' - immutable']
+
+    becomes:
+    ['# %% Python strings', '', '# - immutable']
+
+    A code cell:
+    ['s1 = "stuff"']
+
+    becomes:
+    ['# %%', 's1 = "stuff"', '', '']
+
+    A raw cell is written like a markdown cell, but its first line is not a title.
+    """
+    assert isinstance(cell_type, str)
+    assert isinstance(lines, list)
+
+    if cell_type not in __CELL_TYPES:
+        raise ValueError("invalid cell_type: %r" % cell_type)
+
+    if cell_type == __CELL_TYPE_CODE:
+        return [__CELL_SEPARATOR] + spyondemain.remove_trailing_empty_elements(lines) + __LINES_AFTER_CODE_CELL
+
+    py_lines = []
+    if cell_type == __CELL_TYPE_MARKDOWN and lines and lines[0].startswith("# "):
+        # the title of the cell, as produced by prepare_markdown_cell().
+        py_lines.append(__CELL_SEPARATOR + " " + lines[0][2:].strip())
+        lines = lines[1:]
+    else:
+        py_lines.append(__CELL_SEPARATOR)
+
+    for line in lines:
+        if line:
+            py_lines.append(__COMMENT_STARTER + line)
+        else:
+            py_lines.append("")
+    return py_lines
+
+
+def notebook_to_py(handle):
+    """
+    Returns the contents of a .py file for a notebook.
+
+    :param handle: a text handle of a .ipynb file.
+    """
+    py_lines = []
+    for cell_type, lines in iter_notebook_cells(handle):
+        if not spyondemain.is_list_having_non_empty_items(lines):
+            continue
+        py_lines.extend(cell_to_py_lines(cell_type, lines))
+    py_lines = spyondemain.remove_trailing_empty_elements(py_lines)
+    return "\n".join(py_lines) + "\n"
+
+
+def generate_py_file_name(input_file_name):
+    """
+    Generates a .py file name from a notebook file name.
+
+    :type input_file_name: str
+    """
+    assert isinstance(input_file_name, str)
+    return input_file_name + ".gen.py"
+
+
+def convert_notebook_file(input_file_name, options):
+    """
+    Converts a .ipynb file to a .py file.
+
+    :type input_file_name: str
+    :type options: ConvertOptions
+    """
+    assert isinstance(input_file_name, str)
+
+    output_file_name = options.output
+    if not output_file_name:
+        output_file_name = generate_py_file_name(input_file_name)
+
+    with open(input_file_name, "r", encoding="utf8") as handle:
+        output_as_str = notebook_to_py(handle)
+
+    if spyondemain.confirm_overwrite(output_file_name, options):
+        with open(output_file_name, "w", encoding="utf8") as handle:
+            handle.write(output_as_str)
+        print("created: ", output_file_name)
+    else:
+        print("file is not written.")
+
+    return output_as_str
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""
+Validates notebooks against the subset of nbformat v4 that Spyonde writes,
+without jsonschema or nbformat.
+
+    spyonde --validate lecture.py
+    spyonde validate notebooks
+
+The checks are written by hand for the structure of the notebooks,
+so they are much cheaper than a schema driven validation,
+but notebooks using other parts of nbformat, such as widgets metadata,
+are only checked for the common structure.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+
+__CELL_KEYS = {
+    "markdown": {"cell_type", "metadata", "source", "attachments", "id"},
+    "raw": {"cell_type", "metadata", "source", "attachments", "id"},
+    "code": {"cell_type", "metadata", "source", "execution_count", "outputs", "id"},
+}
+__REQUIRED_CELL_KEYS = {
+    "markdown": {"cell_type", "metadata", "source"},
+    "raw": {"cell_type", "metadata", "source"},
+    "code": {"cell_type", "metadata", "source", "execution_count", "outputs"},
+}
+__SLIDE_TYPES = {"slide", "subslide", "fragment", "skip", "notes", "-"}
+__STREAM_NAMES = {"stdout", "stderr"}
+__CELL_ID_PATTERN = re.compile(r'[a-zA-Z0-9_-]{1,64}\Z')
+
+
+def _is_multiline_string(value):
+    """
+    Returns True for a string or a list of strings, as in "source".
+    """
+    if isinstance(value, str):
+        return True
+    return isinstance(value, list) and all(isinstance(x, str) for x in value)
+
+
+def _is_execution_count(value):
+    """
+    Returns True for None or a non-negative int.
+    """
+    return value is None or (isinstance(value, int) and not isinstance(value, bool) and value >= 0)
+
+
+def validate_mimebundle(data, where):
+    """
+    Returns the errors of the "data" of an output.
+
+    :type where: str
+    """
+    if not isinstance(data, dict):
+        return [where + ": data must be an object"]
+    errors = []
+    for mimetype, value in data.items():
+        if "/" not in mimetype:
+            errors.append("%s: invalid mimetype %r" % (where, mimetype))
+        elif not mimetype.endswith("json") and not _is_multiline_string(value):
+            errors.append("%s: %s must be a string or a list of strings" % (where, mimetype))
+    return errors
+
+
+def validate_output(output, where):
+    """
+    Returns the errors of an output of a code cell.
+
+    :type where: str
+    """
+    if not isinstance(output, dict):
+        return [where + ": must be an object"]
+
+    output_type = output.get("output_type")
+    errors = []
+    if output_type == "stream":
+        if output.get("name") not in __STREAM_NAMES:
+            errors.append(where + ": name must be stdout or stderr")
+        if not _is_multiline_string(output.get("text")):
+            errors.append(where + ": text must be a string or a list of strings")
+    elif output_type in ("display_data", "execute_result"):
+        errors.extend(validate_mimebundle(output.get("data"), where))
+        if not isinstance(output.get("metadata"), dict):
+            errors.append(where + ": metadata must be an object")
+        if output_type == "execute_result" and not _is_execution_count(output.get("execution_count", -1)):
+            errors.append(where + ": execution_count must be null or a non-negative integer")
+    elif output_type == "error":
+        for key in ["ename", "evalue"]:
+            if not isinstance(output.get(key), str):
+                errors.append("%s: %s must be a string" % (where, key))
+        traceback = output.get("traceback")
+        if not isinstance(traceback, list) or not all(isinstance(x, str) for x in traceback):
+            errors.append(where + ": traceback must be a list of strings")
+    else:
+        errors.append("%s: unknown output_type %r" % (where, output_type))
+    return errors
+
+
+def validate_cell(cell, index=0, nbformat_minor=2):
+    """
+    Returns the list of errors of a cell dictionary, empty if it is valid.
+
+    :type cell: dict
+    :type index: int
+    :param index: the position of the cell, used in the messages.
+    :type nbformat_minor: int
+    :param nbformat_minor: cells must have an id from 4.5,
+        and they can not have one before.
+    """
+    where = "cells[%d]" % index
+    if not isinstance(cell, dict):
+        return [where + ": must be an object"]
+
+    cell_type = cell.get("cell_type")
+    if cell_type not in __CELL_KEYS:
+        return ["%s: unknown cell_type %r" % (where, cell_type)]
+
+    errors = []
+    keys = set(cell)
+    for key in sorted(__REQUIRED_CELL_KEYS[cell_type] - keys):
+        errors.append("%s: missing %s" % (where, key))
+    for key in sorted(keys - __CELL_KEYS[cell_type]):
+        errors.append("%s: unexpected %s in a %s cell" % (where, key, cell_type))
+
+    if nbformat_minor >= 5:
+        if not (isinstance(cell.get("id"), str) and __CELL_ID_PATTERN.match(cell["id"])):
+            errors.append(where + ": id must be 1 to 64 letters, digits, - or _")
+    elif "id" in cell:
+        errors.append(where + ": id is not allowed before nbformat 4.5")
+
+    if "source" in cell and not _is_multiline_string(cell["source"]):
+        errors.append(where + ": source must be a string or a list of strings")
+
+    metadata = cell.get("metadata", {})
+    if not isinstance(metadata, dict):
+        errors.append(where + ": metadata must be an object")
+    else:
+        slideshow = metadata.get("slideshow", {})
+        if not isinstance(slideshow, dict) or slideshow.get("slide_type", "-") not in __SLIDE_TYPES:
+            errors.append(where + ": invalid slideshow metadata")
+        if "scrolled" in metadata and metadata["scrolled"] not in (True, False, "auto"):
+            errors.append(where + ": scrolled must be a boolean or \"auto\"")
+
+    if cell_type == "code":
+        if not _is_execution_count(cell.get("execution_count")):
+            errors.append(where + ": execution_count must be null or a non-negative integer")
+        outputs = cell.get("outputs", [])
+        if not isinstance(outputs, list):
+            errors.append(where + ": outputs must be a list")
+        else:
+            for i, output in enumerate(outputs):
+                errors.extend(validate_output(output, "%s.outputs[%d]" % (where, i)))
+    return errors
+
+
+def validate_notebook(notebook):
+    """
+    Returns the list of errors of a notebook, empty if it is valid.
+
+    :param notebook: the notebook, as loaded by json.load().
+    """
+    if not isinstance(notebook, dict):
+        return ["the notebook must be an object"]
+
+    errors = []
+    if notebook.get("nbformat") != 4:
+        errors.append("nbformat must be 4")
+    minor = notebook.get("nbformat_minor")
+    if not isinstance(minor, int) or isinstance(minor, bool) or minor < 0:
+        errors.append("nbformat_minor must be a non-negative integer")
+    for key in sorted(set(notebook) - {"cells", "metadata", "nbformat", "nbformat_minor"}):
+        errors.append("unexpected " + key)
+
+    metadata = notebook.get("metadata")
+    if not isinstance(metadata, dict):
+        errors.append("metadata must be an object")
+    else:
+        kernelspec = metadata.get("kernelspec", {"name": "", "display_name": ""})
+        if not isinstance(kernelspec, dict) or not all(
+                isinstance(kernelspec.get(x), str) for x in ["name", "display_name"]):
+            errors.append("metadata.kernelspec must have string name and display_name")
+        language_info = metadata.get("language_info", {"name": ""})
+        if not isinstance(language_info, dict) or not isinstance(language_info.get("name"), str):
+            errors.append("metadata.language_info must have a string name")
+
+    cells = notebook.get("cells")
+    if not isinstance(cells, list):
+        errors.append("cells must be a list")
+    else:
+        if not isinstance(minor, int):
+            minor = 0
+        for i, cell in enumerate(cells):
+            errors.extend(validate_cell(cell, i, minor))
+    return errors
+
+
+def validate_notebook_json(output_as_str):
+    """
+    Returns the list of errors of a notebook given as a JSON string.
+
+    :type output_as_str: str
+    """
+    assert isinstance(output_as_str, str)
+    try:
+        notebook = json.loads(output_as_str)
+    except ValueError as ex:
+        return ["invalid JSON: %s" % ex]
+    return validate_notebook(notebook)
+
+
+def validate_file(file_name):
+    """
+    Returns the list of errors of a .ipynb file.
+
+    :type file_name: str
+    """
+    assert isinstance(file_name, str)
+    try:
+        with open(file_name, "r", encoding="utf8") as handle:
+            notebook = json.load(handle)
+    except (OSError, UnicodeDecodeError) as ex:
+        return ["could not be read: %s" % ex]
+    except ValueError as ex:
+        return ["invalid JSON: %s" % ex]
+    return validate_notebook(notebook)
+
+
+def find_notebook_files(paths):
+    """
+    Returns the .ipynb files in the paths, searching directories recursively.
+    Hidden directories such as .ipynb_checkpoints are skipped.
+
+    :type paths: list
+    """
+    file_names = []
+    for path in paths:
+        if not os.path.isdir(path):
+            file_names.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(x for x in dirs if not x.startswith("."))
+            for name in sorted(files):
+                if name.endswith(".ipynb"):
+                    file_names.append(os.path.join(root, name))
+    return file_names
+
+
+def validate_command_line(argv):
+    """
+    Runs "spyonde validate" with the arguments after "validate".
+    Exits with status 1 if a notebook is not valid.
+
+    :type argv: list
+    """
+    parser = argparse.ArgumentParser(prog="spyonde validate")
+
+    help1 = ".ipynb files or directories to search for them. The current directory by default."
+    parser.add_argument('paths', nargs='*', help=help1, default=["."])
+
+    args = parser.parse_args(argv)
+
+    file_names = find_notebook_files(args.paths)
+    invalid_count = 0
+    for file_name in file_names:
+        errors = validate_file(file_name)
+        if errors:
+            invalid_count += 1
+            for error in errors:
+                print("%s: %s" % (file_name, error))
+
+    print("notebooks:", len(file_names), "invalid:", invalid_count)
+    if invalid_count:
+        sys.exit(1)
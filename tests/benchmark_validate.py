@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compares the speed of spyondevalidate with nbformat.validate().
+
+    python tests/benchmark_validate.py
+
+nbformat is optional, without it only spyondevalidate is measured.
+"""
+
+import json
+import os
+import sys
+import timeit
+
+
+# add spyonde directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+import spyondevalidate  # pylint: disable=C0413,E0402,E0401
+
+
+def build_notebook(cell_count):
+    """
+    Returns a notebook dictionary with cell_count cells, as Spyonde writes it.
+    """
+    data = []
+    for i in range(cell_count):
+        if i % 2:
+            data.append(("code", ["x%d = %d" % (i, i), "print(x%d)" % i]))
+        else:
+            data.append(("markdown", ["## Section %d" % i, "Some text."]))
+    output_as_str = spyondemain.serialize_notebook(spyondemain.build_cell_dicts(data), "3.7.4")
+    return json.loads(output_as_str)
+
+
+def main():
+    """
+    Prints the time of validating a notebook with each validator.
+    """
+    number = 5
+    for cell_count in [100, 1000]:
+        notebook = build_notebook(cell_count)
+        assert not spyondevalidate.validate_notebook(notebook)
+        seconds = timeit.timeit(lambda: spyondevalidate.validate_notebook(notebook), number=number) / number
+        print("cells: %5d spyondevalidate: %8.2f ms" % (cell_count, seconds * 1000))
+
+        try:
+            import nbformat  # pylint: disable=C0415,E0401
+            # C0415: import outside toplevel, nbformat is optional.
+        except ImportError:
+            print("nbformat is not installed, skipped.")
+            continue
+        node = nbformat.from_dict(notebook)
+        seconds = timeit.timeit(lambda: nbformat.validate(node), number=number) / number
+        print("cells: %5d nbformat:        %8.2f ms" % (cell_count, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main()
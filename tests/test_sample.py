@@ -7,8 +7,12 @@ Includes tests for spyondemain module.
 
 # python setup.py test
 
+import concurrent.futures
+import json
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 
@@ -109,5 +113,361 @@ class TestStartsWith(unittest.TestCase):
         self.assertEqual(False, actual)
 
 
+class TestMayHaveMultipleCells(unittest.TestCase):
+    """
+    Tests may_have_multiple_cells() method.
+    """
+
+    def _probe(self, content):
+        """
+        Writes content to a temporary file and probes it.
+        """
+        handle = tempfile.NamedTemporaryFile("w", suffix=".py", delete=False, encoding="utf8")
+        handle.write(content)
+        handle.close()
+        try:
+            return spyondemain.may_have_multiple_cells(handle.name)
+        finally:
+            os.remove(handle.name)
+
+    def test_may_have_multiple_cells_true(self):
+        """
+        Tests the may_have_multiple_cells() method.
+        """
+        actual = self._probe("# %% one\nprint(1)\n#%% two\nprint(2)\n")
+        self.assertEqual(True, actual)
+
+        actual = self._probe("print(1)\n# %%\nprint(2)\n")
+        self.assertEqual(True, actual)
+
+        actual = self._probe("print(1)\n# <codecell>\nprint(2)\n")
+        self.assertEqual(True, actual)
+
+    def test_may_have_multiple_cells_false(self):
+        """
+        Tests the may_have_multiple_cells() method.
+        """
+        actual = self._probe("")
+        self.assertEqual(False, actual)
+
+        actual = self._probe("import os\nprint(os.getcwd())\n")
+        self.assertEqual(False, actual)
+
+        actual = self._probe("\n\n# %% the only cell\nprint(1)\n")
+        self.assertEqual(False, actual)
+
+        actual = self._probe("print(1)  # %% not a separator\n")
+        self.assertEqual(False, actual)
+
+    def test_probe_agrees_with_parse_cells(self):
+        """
+        Files rejected by the probe must have less than 2 cells.
+        """
+        examples_dir = os.path.join(_MODULE_PATH, "../examples")
+        for file_name in sorted(os.listdir(examples_dir)):
+            if not file_name.endswith(".py"):
+                continue
+            file_path = os.path.join(examples_dir, file_name)
+            if not spyondemain.may_have_multiple_cells(file_path):
+                cells = spyondemain.split_to_cells(file_path)
+                cell_count = len(spyondemain.parse_cells(cells))
+                self.assertLess(cell_count, 2, file_name)
+
+
+class TestThreadSafety(unittest.TestCase):
+    """
+    Tests that conversions give the same results when run concurrently.
+    """
+
+    def test_concurrent_conversions(self):
+        """
+        Runs many conversions in a thread pool and compares them with sequential ones.
+        """
+        examples_dir = os.path.join(_MODULE_PATH, "../examples")
+        file_paths = [os.path.join(examples_dir, x) for x in sorted(os.listdir(examples_dir))
+                      if x.endswith(".py")]
+        options_list = [
+            spyondemain.ConvertOptions(),
+            spyondemain.ConvertOptions(pyversion="3.8", onlymulticell=False),
+        ]
+        jobs = [(x, y) for x in file_paths for y in options_list] * 20
+
+        def convert(job):
+            file_path, options = job
+            with open(file_path, "r", encoding="utf8") as handle:
+                text = handle.read()
+            return spyondemain.file_to_notebook(file_path, options), spyondemain.convert_text(text, options)
+
+        expected = {}
+        for job in jobs[:len(file_paths) * len(options_list)]:
+            expected[job] = convert(job)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=16) as executor:
+            actual = list(executor.map(convert, jobs))
+
+        for job, result in zip(jobs, actual):
+            self.assertEqual(expected[job], result)
+
+
+class TestKeepOutputs(unittest.TestCase):
+    """
+    Tests copy_previous_outputs() method.
+    """
+
+    def test_unchanged_cells_keep_outputs(self):
+        """
+        Unchanged code cells keep their outputs, changed ones are emptied.
+        """
+        options = spyondemain.ConvertOptions(keep_outputs=True)
+        text = "# %% one\nprint(1)\n# %% two\nprint(2)\n# %% three\nprint(3)\n"
+        previous_cells = json.loads(spyondemain.convert_text(text, options))["cells"]
+        for i, cell in enumerate(previous_cells):
+            cell["execution_count"] = i + 1
+            cell["outputs"] = [{"name": "stdout", "output_type": "stream", "text": [str(i + 1) + "\n"]}]
+
+        # the second cell is changed and the third cell is moved to the top.
+        text = "# %% three\nprint(3)  \n# %% one\nprint(1)\n# %% two\nprint(22)\n"
+        cells = json.loads(spyondemain.convert_text(text, options, previous_cells))["cells"]
+
+        self.assertEqual([3, 1, None], [x["execution_count"] for x in cells])
+        self.assertEqual(previous_cells[2]["outputs"], cells[0]["outputs"])
+        self.assertEqual(previous_cells[0]["outputs"], cells[1]["outputs"])
+        self.assertEqual([], cells[2]["outputs"])
+
+
+class TestSerializeNotebook(unittest.TestCase):
+    """
+    Tests serialize_notebook() method.
+    """
+
+    def test_same_as_json_dumps(self):
+        """
+        Pre-encoded templates give the same string as json.dumps().
+        """
+        cells = spyondemain.build_cell_dicts([
+            ("markdown", ["# Title", "", "- \u00fc \"quoted\" \\ \t"]),
+            ("code", ["print('\u20ac')"]),
+            ("code", []),
+            ("markdown", []),
+            ("code", ["x = 1"]),
+            ("code", ["y = 2"]),
+        ])
+        # these are written by json.dumps().
+        cells[4]["outputs"] = [{"name": "stdout", "output_type": "stream", "text": ["1\n"]}]
+        cells[4]["execution_count"] = 1
+        cells[5]["metadata"] = {"slideshow": {"slide_type": "skip"}, "scrolled": True}
+
+        expected = """
+{
+ "cells":
+    """ + json.dumps(cells, indent=4) + spyondemain.notebook_metadata_json("3.8")
+        self.assertEqual(expected.strip(), spyondemain.serialize_notebook(cells, "3.8"))
+        self.assertEqual("    " + json.dumps(cells[0], indent=4).replace("\n", "\n    "),
+                         spyondemain.serialize_cell(cells[0]))
+
+    def test_cells_with_ids(self):
+        """
+        Cells with ids are written like json.dumps() too.
+        """
+        cells = spyondemain.assign_cell_ids(spyondemain.build_cell_dicts([
+            ("markdown", ["# Title"]),
+            ("code", ["x = 1"]),
+            ("code", []),
+        ]))
+        for cell in cells:
+            self.assertEqual("    " + json.dumps(cell, indent=4).replace("\n", "\n    "),
+                             spyondemain.serialize_cell(cell))
+        output_as_str = spyondemain.serialize_notebook(cells, "3.8", spyondemain.NBFORMAT_MINOR_CELL_IDS)
+        self.assertEqual(5, json.loads(output_as_str)["nbformat_minor"])
+
+
+class TestCellIds(unittest.TestCase):
+    """
+    Tests assign_cell_ids() method.
+    """
+
+    def test_stable_ids(self):
+        """
+        Unchanged cells keep their ids, identical cells get their ordinals.
+        """
+        cells = spyondemain.assign_cell_ids(spyondemain.build_cell_dicts([
+            ("code", ["x = 1"]), ("markdown", ["x = 1"]), ("code", ["x = 1"]), ("code", ["y = 2"])]))
+        ids = [x["id"] for x in cells]
+        self.assertEqual(len(set(ids)), 4)
+        self.assertEqual(ids[0][:-2], ids[2][:-2])
+        self.assertEqual(["0", "0", "1", "0"], [x.split("-")[1] for x in ids])
+
+        # a new cell at the top does not change the ids of the others.
+        new_cells = spyondemain.assign_cell_ids(spyondemain.build_cell_dicts([
+            ("code", ["z = 3"]), ("code", ["x = 1"]), ("markdown", ["x = 1"]), ("code", ["x = 1"]),
+            ("code", ["y = 2"])]))
+        self.assertEqual(ids, [x["id"] for x in new_cells[1:]])
+
+        # assigning again gives the same ids.
+        self.assertEqual(ids, [x["id"] for x in spyondemain.assign_cell_ids(cells)])
+
+
+class TestIncludes(unittest.TestCase):
+    """
+    Tests the include directive.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, name, text):
+        """
+        Writes a file to the temporary directory, returns its path.
+        """
+        file_name = os.path.join(self.temp_dir, name)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, "w", encoding="utf8") as handle:
+            handle.write(text)
+        return file_name
+
+    def test_include(self):
+        """
+        Tests that the cells of the included files are spliced in place.
+        """
+        self.write(os.path.join("shared", "setup.py"),
+                   "#%% setup\nimport os\n#%%\n# spyonde:include more.py\n")
+        self.write(os.path.join("shared", "more.py"), "#%% more\nx = 1\n")
+        lecture = self.write("lecture.py", "#%%\n# # Title\n#%%\n# spyonde:include shared/setup.py\n#%%\nprint(x)\n")
+
+        cells = spyondemain.split_to_cells(lecture)
+        cells = spyondemain.expand_includes(cells, self.temp_dir, (lecture,), self.cache_dir)
+        data = spyondemain.parse_cells(cells)
+        self.assertEqual("markdown", data[0][0])
+        self.assertEqual(["#%% setup", "import os"], data[1][1])
+        self.assertEqual(["#%% more", "x = 1"], data[2][1])
+        self.assertEqual(["#%%", "print(x)"], data[3][1])
+
+    def test_include_only_cells(self):
+        """
+        Tests that a file whose cells all come from an include is not skipped by onlymulticell,
+        and the title of the cell with the directive is kept.
+        """
+        self.write("shared.py", "# %%\nx = 1\n# %%\ny = 2\n")
+        lecture = self.write("lecture.py", "# %% intro\n# spyonde:include shared.py\n")
+        with open(lecture, "rb") as handle:
+            self.assertTrue(spyondemain.content_may_have_multiple_cells(handle.read()))
+        cell_count, data = spyondemain.file_to_data(lecture, spyondemain.ConvertOptions())
+        self.assertEqual(3, cell_count)
+        self.assertEqual(("markdown", ["# intro"]), data[0])
+        self.assertEqual(["# %%", "y = 2"], data[2][1])
+
+    def test_include_cycle(self):
+        """
+        Tests that include cycles and missing files raise ValueError.
+        """
+        first = self.write("a.py", "#%%\n# spyonde:include b.py\n")
+        self.write("b.py", "#%%\n# spyonde:include a.py\n")
+        cells = spyondemain.split_to_cells(first)
+        with self.assertRaisesRegex(ValueError, "a.py -> b.py -> a.py"):
+            spyondemain.expand_includes(cells, self.temp_dir, (first,), self.cache_dir)
+        with self.assertRaises(ValueError):
+            spyondemain.expand_includes([["# spyonde:include missing.py"]], self.temp_dir, (), None)
+
+    def test_include_in_string(self):
+        """
+        Tests that only a comment is an include directive, and the code of a cell is not dropped.
+        """
+        lecture = self.write("lecture.py", '#%%\nx = 1\ns = """\n    # spyonde:include setup.py\n"""\n#%%\ny = 2\n')
+        cells = spyondemain.split_to_cells(lecture)
+        self.assertEqual(cells, spyondemain.expand_includes(cells, self.temp_dir, (lecture,), self.cache_dir))
+        with self.assertRaisesRegex(ValueError, "cell with code"):
+            spyondemain.cell_include(["#%%", "x = 1", "# spyonde:include setup.py"])
+
+    def test_include_in_text(self):
+        """
+        Tests that the includes of a text are only expanded with a base directory, and confined to it.
+        """
+        self.write("setup.py", "#%%\nimport os\n")
+        text = "#%%\n# # Title\n#%%\n# spyonde:include setup.py\n"
+        options = spyondemain.ConvertOptions()
+        cells = json.loads(spyondemain.convert_text(text, options))["cells"]
+        self.assertEqual("markdown", cells[1]["cell_type"])
+        cells = json.loads(spyondemain.convert_text(text, options, base_dir=self.temp_dir))["cells"]
+        self.assertEqual(["import os\n"], cells[1]["source"])
+        with self.assertRaisesRegex(ValueError, "outside"):
+            spyondemain.convert_text(text.replace("setup.py", "../setup.py"), options,
+                                     base_dir=os.path.join(self.temp_dir, "lectures"))
+
+    def test_include_cache_not_writable(self):
+        """
+        Tests that a cache directory that can not be written does not stop the conversion.
+        """
+        setup = self.write("other.py", "#%%\nimport re\n")
+        cache_dir = self.write("not-a-directory", "")
+        self.assertEqual([["#%%", "import re"]], spyondemain.read_include_cells(setup, cache_dir))
+
+    def test_include_cache(self):
+        """
+        Tests that an included file is split once, and the cached cells are copies.
+        """
+        setup = self.write("setup.py", "#%%\nimport os\n#%%\nimport sys\n")
+        first = spyondemain.read_include_cells(setup, self.cache_dir)
+        first[0].append("changed")
+        self.assertEqual([["#%%", "import os"], ["#%%", "import sys"]],
+                         spyondemain.read_include_cells(setup, self.cache_dir))
+        cache_files = [x for _, _, files in os.walk(self.cache_dir) for x in files]
+        self.assertEqual(1, len(cache_files))
+
+
+class TestTransforms(unittest.TestCase):
+    """
+    Tests the cell transform pipeline.
+    """
+
+    cells = [
+        ["#%%", "# # Title", "# spyonde:ignore-cell"],
+        ["#%%", "x = 1", "# ---", "y = 2", ""],
+        ["#%%", "# # Notes"],
+    ]
+
+    def test_builtin_transforms(self):
+        """
+        Tests that the built-in transforms run in their order.
+        """
+        names = [x[1] for x in spyondemain.BUILTIN_TRANSFORMS]
+        self.assertEqual(["skip-empty", "ignore-cell", "detect-type", "prepare-markdown", "strip-code"], names)
+        data = spyondemain.parse_cells(self.cells)
+        self.assertEqual([("code", ["#%%", "x = 1", "# ---", "y = 2"]), ("markdown", [" # Notes"])], data)
+
+    def test_custom_transforms(self):
+        """
+        Tests a transform splitting the cells and another one skipping them.
+        """
+        def split_code(cell_type, lines):
+            if cell_type != "code" or "# ---" not in lines:
+                return cell_type, lines
+            position = lines.index("# ---")
+            return [(cell_type, lines[:position]), (cell_type, lines[position + 1:])]
+
+        def skip_notes(cell_type, lines):
+            return None if "Notes" in "".join(lines) else (cell_type, lines)
+
+        transforms = spyondemain.add_transform(spyondemain.BUILTIN_TRANSFORMS, "test-split", split_code, 450)
+        transforms = spyondemain.add_transform(transforms, "test-skip", skip_notes, 50)
+        self.assertEqual("test-skip", transforms[0][1])
+        data = spyondemain.parse_cells(self.cells, transforms)
+        # the second part still runs through strip-code.
+        self.assertEqual([("code", ["#%%", "x = 1"]), ("code", ["y = 2"])], data)
+        self.assertEqual(3, len(spyondemain.parse_cells(self.cells, spyondemain.remove_transform(transforms, "test-skip"))))
+        # the built-in transforms are not changed.
+        self.assertEqual(2, len(spyondemain.parse_cells(self.cells)))
+
+        options = spyondemain.ConvertOptions(transforms=transforms)
+        cells = json.loads(spyondemain.convert_text("#%%\nx = 1\n# ---\ny = 2\n", options))["cells"]
+        self.assertEqual(2, len(cells))
+
+        transforms = [(0, "upper", lambda cell_type, lines: ("code", [x.upper() for x in lines]))]
+        self.assertEqual([("code", ["#%%", "X = 1"])], spyondemain.parse_cells([["#%%", "x = 1"]], transforms))
+
+
 if __name__ == '__main__':
     unittest.main()
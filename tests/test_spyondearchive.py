@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondearchive module.
+"""
+
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondearchive  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+
+class TestArchive(unittest.TestCase):
+    """
+    Tests convert_to_archive() method.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.demo_file_name = os.path.join(_MODULE_PATH, "../examples/demo.py")
+        self.options = spyondemain.ConvertOptions(overwrite_confirmed=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_member_name(self):
+        """
+        Member names can not point outside of the archive.
+        """
+        self.assertEqual("a/b.py", spyondearchive.member_name("/a/./b.py"))
+        self.assertEqual("etc/x", spyondearchive.member_name("../../etc/x"))
+        self.assertEqual("x/y", spyondearchive.member_name("C:\\x\\y"))
+
+    def test_zip_to_tar(self):
+        """
+        The .py members of a zip file are converted to a tar.gz file.
+        """
+        input_file_name = os.path.join(self.temp_dir, "sources.zip")
+        with zipfile.ZipFile(input_file_name, "w") as archive:
+            archive.write(self.demo_file_name, "course/demo.py")
+            archive.writestr("course/single.py", "x = 1\n")
+            archive.writestr("course/readme.txt", "# %%\n# %%\n")
+
+        output_file_name = os.path.join(self.temp_dir, "notebooks.tar.gz")
+        count = spyondearchive.convert_to_archive([input_file_name], output_file_name, self.options)
+        self.assertEqual(1, count)
+
+        with open(self.demo_file_name, "r", encoding="utf8") as handle:
+            expected = spyondemain.convert_text(handle.read(), self.options)
+        with tarfile.open(output_file_name) as archive:
+            self.assertEqual(["course/demo.py.gen.ipynb"], archive.getnames())
+            content = archive.extractfile("course/demo.py.gen.ipynb").read().decode("utf8")
+        self.assertEqual(expected, content)
+
+    def test_files_to_zip(self):
+        """
+        .py files and tar members are converted to a zip file.
+        """
+        input_file_name = os.path.join(self.temp_dir, "sources.tar")
+        with tarfile.open(input_file_name, "w") as archive:
+            archive.add(self.demo_file_name, "demo2.py")
+
+        output_file_name = os.path.join(self.temp_dir, "notebooks.zip")
+        file_names = [os.path.relpath(self.demo_file_name), input_file_name]
+        count = spyondearchive.convert_to_archive(file_names, output_file_name, self.options)
+        self.assertEqual(2, count)
+        with zipfile.ZipFile(output_file_name) as archive:
+            names = archive.namelist()
+        self.assertEqual(2, len(names))
+        self.assertTrue(names[0].endswith("examples/demo.py.gen.ipynb"))
+        self.assertEqual("demo2.py.gen.ipynb", names[1])
+
+    def test_failed_member(self):
+        """
+        The members and the archives that can not be converted are skipped.
+        """
+        input_file_name = os.path.join(self.temp_dir, "sources.zip")
+        with zipfile.ZipFile(input_file_name, "w") as archive:
+            archive.write(self.demo_file_name, "demo.py")
+            archive.writestr("broken.py", b"# %%\nx = '\xff'\n# %%\n")
+
+        missing_file_name = os.path.join(self.temp_dir, "missing.zip")
+        output_file_name = os.path.join(self.temp_dir, "notebooks.zip")
+        count = spyondearchive.convert_to_archive(
+            [missing_file_name, input_file_name], output_file_name, self.options)
+        self.assertEqual(1, count)
+        with zipfile.ZipFile(output_file_name) as archive:
+            self.assertEqual(["demo.py.gen.ipynb"], archive.namelist())
+        self.assertEqual(["notebooks.zip"], [x for x in os.listdir(self.temp_dir) if x.startswith("notebooks")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeasync module.
+"""
+
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondeasync  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+_EXAMPLES_DIR = os.path.join(_MODULE_PATH, "../examples")
+
+
+def _run(coroutine):
+    """
+    Runs a coroutine in a new event loop, asyncio.run() is only in Python 3.7 and later.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _collect(paths_or_buffers, **kwargs):
+    """
+    Runs convert_many() and returns the results as a list.
+    """
+    async def collect():
+        results = []
+        async for result in spyondeasync.convert_many(paths_or_buffers, **kwargs):
+            results.append(result)
+        return results
+    return _run(collect())
+
+
+class TestConvertMany(unittest.TestCase):
+    """
+    Tests convert_many() method.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_buffers_match_files(self):
+        """
+        Buffers are converted like the files with the same contents.
+        """
+        buffers = []
+        expected = {}
+        for file_name in ["demo.py", "simple1.py", "simple2.py"]:
+            file_path = os.path.join(_EXAMPLES_DIR, file_name)
+            with open(file_path, "rb") as handle:
+                buffer = io.BytesIO(handle.read())
+            buffers.append(buffer)
+            data = spyondemain.parse_cells(spyondemain.split_to_cells(file_path))
+            expected[id(buffer)] = spyondemain.build_notebook_json(data, "3.8")
+
+        results = _collect(buffers, concurrency=2, pyversion="3.8")
+        self.assertEqual(3, len(results))
+        for result in results:
+            self.assertEqual(spyondeasync.STATUS_CONVERTED, result["status"])
+            self.assertEqual(expected[id(result["input"])], result["notebook"])
+
+    def test_files_are_written_without_prompting(self):
+        """
+        Existing notebooks are kept unless overwrite is True.
+        """
+        file_name = os.path.join(self.temp_dir, "simple1.py")
+        shutil.copyfile(os.path.join(_EXAMPLES_DIR, "simple1.py"), file_name)
+        single = os.path.join(self.temp_dir, "regular1.py")
+        shutil.copyfile(os.path.join(_EXAMPLES_DIR, "regular1.py"), single)
+        missing = os.path.join(self.temp_dir, "missing.py")
+
+        results = _collect([file_name, single, missing])
+        statuses = {x["input"]: x["status"] for x in results}
+        self.assertEqual(spyondeasync.STATUS_WRITTEN, statuses[file_name])
+        self.assertEqual(spyondeasync.STATUS_SINGLE_CELL, statuses[single])
+        self.assertEqual(spyondeasync.STATUS_FAILED, statuses[missing])
+        self.assertTrue(os.path.isfile(file_name + ".gen.ipynb"))
+
+        results = _collect([file_name])
+        self.assertEqual(spyondeasync.STATUS_EXISTS, results[0]["status"])
+        results = _collect([file_name], overwrite=True)
+        self.assertEqual(spyondeasync.STATUS_WRITTEN, results[0]["status"])
+
+    def test_stop_iterating(self):
+        """
+        Breaking out of the loop cancels the remaining conversions.
+        """
+        buffers = [b"# %% a\nx = 1\n# %% b\ny = 2\n"] * 20
+
+        async def first_result():
+            generator = spyondeasync.convert_many(buffers, concurrency=3)
+            async for result in generator:
+                await generator.aclose()
+                return result
+            return None
+
+        result = _run(first_result())
+        self.assertEqual(spyondeasync.STATUS_CONVERTED, result["status"])
+
+    def test_cancel(self):
+        """
+        A cancelled conversion is cancelled, not failed.
+        """
+        event = threading.Event()
+
+        class SlowBuffer:  # pylint: disable=R0903
+            """
+            A buffer read until the event is set.
+            """
+            def read(self):  # pylint: disable=R0201
+                """
+                Returns the contents.
+                """
+                event.wait(10)
+                return b"# %% a\nx = 1\n# %% b\ny = 2\n"
+
+        async def cancel():
+            task = asyncio.ensure_future(spyondeasync.convert_one(SlowBuffer()))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                return await task
+            finally:
+                event.set()
+
+        self.assertRaises(asyncio.CancelledError, _run, cancel())
+
+
+if __name__ == '__main__':
+    unittest.main()
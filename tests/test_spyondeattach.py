@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeattach module.
+"""
+
+import base64
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondeattach  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+import spyondevalidate  # pylint: disable=C0413,E0402,E0401
+
+_PNG = b"\x89PNG\r\n\x1a\n fake image"
+
+
+class TestEmbedImages(unittest.TestCase):
+    """
+    Tests embedding images as attachments.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "cache")
+        os.makedirs(os.path.join(self.temp_dir, "img"))
+        with open(os.path.join(self.temp_dir, "img", "plot.png"), "wb") as handle:
+            handle.write(_PNG)
+        spyondeattach._HASHES.clear()  # pylint: disable=W0212
+        spyondeattach._ENCODINGS.clear()  # pylint: disable=W0212
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_embed_images(self):
+        """
+        Tests that local images become attachments and the others are left as they are.
+        """
+        cells = spyondemain.build_cell_dicts([
+            ("markdown", ["# Plot", '![a plot](img/plot.png "title")',
+                          "![](https://example.com/x.png)", "![](missing.png)"]),
+            ("code", ['s = "![](img/plot.png)"']),
+        ])
+        count = spyondeattach.embed_cell_images(cells, self.temp_dir, self.cache_dir)
+        self.assertEqual(1, count)
+        self.assertEqual('![a plot](attachment:plot.png "title")\n', cells[0]["source"][1])
+        self.assertEqual("![](https://example.com/x.png)\n", cells[0]["source"][2])
+        self.assertEqual("![](missing.png)\n", cells[0]["source"][3])
+        self.assertEqual({"plot.png": {"image/png": base64.b64encode(_PNG).decode("ascii")}},
+                         cells[0]["attachments"])
+        self.assertNotIn("attachments", cells[1])
+
+        output_as_str = spyondemain.serialize_notebook(cells, "3.8")
+        self.assertEqual([], spyondevalidate.validate_notebook_json(output_as_str))
+
+        source = spyondeattach.resolve_attachments(cells[0])
+        self.assertTrue(source[1].startswith("![a plot](data:image/png;base64,"))
+
+    def test_disk_cache(self):
+        """
+        Tests that a later run uses the disk cache, without reading the image.
+        """
+        file_name = os.path.join(self.temp_dir, "img", "plot.png")
+        expected = spyondeattach.encode_image(file_name, self.cache_dir)
+        spyondeattach._HASHES.clear()  # pylint: disable=W0212
+        spyondeattach._ENCODINGS.clear()  # pylint: disable=W0212
+
+        stat = os.stat(file_name)
+        with open(file_name, "wb") as handle:
+            handle.write(b"x" * len(_PNG))
+        # the same size and modification time, as if the file is not changed.
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(expected, spyondeattach.encode_image(file_name, self.cache_dir))
+
+    def test_memory_cache_size(self):
+        """
+        Tests that only the recently used encodings are kept in memory.
+        """
+        cache = spyondeattach._LruCache(2)  # pylint: disable=W0212
+        cache.put("a", "1")
+        cache.put("b", "2")
+        self.assertEqual("1", cache.get("a"))
+        cache.put("c", "3")
+        self.assertEqual(["a", "c"], list(cache.items))
+        self.assertIsNone(cache.get("b"))
+        self.assertLessEqual(len(spyondeattach._ENCODINGS.items),  # pylint: disable=W0212
+                             spyondeattach.IMAGE_MEMORY_CACHE_SIZE)
+
+    def test_same_name(self):
+        """
+        Tests that different images with the same name get different attachment names.
+        """
+        os.makedirs(os.path.join(self.temp_dir, "other"))
+        with open(os.path.join(self.temp_dir, "other", "plot.png"), "wb") as handle:
+            handle.write(_PNG + b"2")
+        cell = spyondemain.build_cell_dict(("markdown", ["![](img/plot.png) ![](other/plot.png)"]))
+        self.assertEqual(2, spyondeattach.embed_images(cell, self.temp_dir, None))
+        self.assertEqual(2, len(cell["attachments"]))
+
+    def test_cache_not_writable(self):
+        """
+        Tests that an image is embedded when its cache can not be written.
+        """
+        cache_file_name = os.path.join(self.temp_dir, "cache_file")
+        with open(cache_file_name, "w", encoding="utf8") as handle:
+            handle.write("")
+        result = spyondeattach.encode_image(os.path.join(self.temp_dir, "img", "plot.png"), cache_file_name)
+        self.assertEqual(base64.b64encode(_PNG).decode("ascii"), result[1])
+
+    def test_convert_text(self):
+        """
+        Tests that convert_text() only embeds the images relative to an explicit base_dir.
+        """
+        options = spyondemain.ConvertOptions(onlymulticell=False, embed_images=True)
+        text = "#%%\n# ![](img/plot.png)\n#%%\nx = 1\n"
+        cells = json.loads(spyondemain.convert_text(text, options))["cells"]
+        self.assertNotIn("attachments", cells[0])
+        cells = json.loads(spyondemain.convert_text(text, options, base_dir=self.temp_dir))["cells"]
+        self.assertIn("plot.png", cells[0]["attachments"])
+
+
+if __name__ == '__main__':
+    unittest.main()
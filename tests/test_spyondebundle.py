@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondebundle module.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondebundle  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+
+class TestBundle(unittest.TestCase):
+    """
+    Tests bundle() method.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _write(self, relative_path, text):
+        file_name = os.path.join(self.temp_dir, relative_path)
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, "w", encoding="utf8") as handle:
+            handle.write(text)
+
+    def test_bundle(self):
+        """
+        The cells of the files are bundled in sorted order, after their headings.
+        """
+        self._write("b.py", "# %% B\n# text\n# %%\nb = 1\n")
+        self._write("a/z.py", "z = 1\n")
+        self._write("a/empty.py", "")
+        output_file_name = os.path.join(self.temp_dir, "out.ipynb")
+
+        count = spyondebundle.bundle(self.temp_dir, output_file_name, "3.8")
+        # the empty file is not bundled.
+        self.assertEqual(2, count)
+        with open(output_file_name, "r", encoding="utf8") as handle:
+            output_as_str = handle.read()
+
+        cells = spyondemain.build_cell_dicts([
+            ("markdown", ["# a/z.py"]),
+            ("code", ["z = 1"]),
+            ("markdown", ["# b.py"]),
+            ("markdown", ["# B", " text"]),
+            ("code", ["b = 1"]),
+        ])
+        self.assertEqual(spyondemain.serialize_notebook(cells, "3.8"), output_as_str)
+        json.loads(output_as_str)
+
+    def test_order_with_few_threads(self):
+        """
+        The files are in order when more files are parsed than the threads.
+        """
+        file_names = []
+        for number in range(7):
+            self._write("f%d.py" % number, "x = %d\n" % number)
+            file_names.append(os.path.join(self.temp_dir, "f%d.py" % number))
+        bundled_files = []
+        cells = list(spyondebundle.iter_bundle_cells(self.temp_dir, file_names, 1, bundled_files))
+        self.assertEqual(["x = %d\n" % x for x in range(7)], [x["source"][0] for x in cells[1::2]])
+        self.assertEqual(file_names, bundled_files)
+
+    def test_notebook_chunks(self):
+        """
+        The streamed notebook is the same as the serialized one.
+        """
+        for file_name in ["demo.py", "simple1.py"]:
+            cells = spyondemain.build_cell_dicts(spyondemain.parse_cells(
+                spyondemain.split_to_cells(os.path.join(_MODULE_PATH, "../examples", file_name))))
+            self.assertEqual(spyondemain.serialize_notebook(cells, "3.8"),
+                             "".join(spyondemain.iter_notebook_chunks(iter(cells), "3.8")))
+        self.assertEqual(spyondemain.serialize_notebook([], "3.8"),
+                         "".join(spyondemain.iter_notebook_chunks([], "3.8")))
+
+
+if __name__ == '__main__':
+    unittest.main()
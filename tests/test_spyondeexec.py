@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeexec module.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondeexec  # pylint: disable=C0413,E0402,E0401
+import spyondeflow  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+
+def _cells(text):
+    """
+    Returns the cell dictionaries of a script.
+    """
+    file_content, ranges = spyondemain.split_text_to_cell_ranges(text)
+    cells = [file_content[start1:stop1] for start1, stop1 in ranges]
+    return spyondemain.build_cell_dicts(spyondemain.parse_cells(cells))
+
+
+class TestExecuteCells(unittest.TestCase):
+    """
+    Tests execute_cells() method.
+    """
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_outputs_and_cache(self):
+        """
+        Outputs are captured, and read from the cache the second time.
+        """
+        text = "# %% Title\n# - text\n# %%\nx = 41\nprint('hi')\n# %%\nx + 1\n"
+        cells = _cells(text)
+        counts = spyondeexec.execute_cells(cells, timeout=30, cache_dir=self.cache_dir)
+        self.assertEqual({"cached": 0, "executed": 2}, counts)
+        self.assertEqual([None, 1, 2], [x.get("execution_count") for x in cells])
+        self.assertEqual(["hi\n"], cells[1]["outputs"][0]["text"])
+        self.assertEqual({"text/plain": ["42"]}, cells[2]["outputs"][0]["data"])
+
+        cells2 = _cells(text)
+        counts = spyondeexec.execute_cells(cells2, timeout=30, cache_dir=self.cache_dir)
+        self.assertEqual({"cached": 2, "executed": 0}, counts)
+        self.assertEqual(cells, cells2)
+
+        # only the changed cell is executed, the first one comes from the cache.
+        cells3 = _cells(text.replace("x + 1", "x + 2"))
+        counts = spyondeexec.execute_cells(cells3, timeout=30, cache_dir=self.cache_dir)
+        self.assertEqual({"cached": 1, "executed": 1}, counts)
+        self.assertEqual({"text/plain": ["43"]}, cells3[2]["outputs"][0]["data"])
+
+    def test_error_and_timeout_stop_execution(self):
+        """
+        Execution stops at an error or a timeout.
+        """
+        cells = _cells("# %%\n1 / 0\n# %%\nprint('never')\n")
+        spyondeexec.execute_cells(cells, timeout=30, cache_dir=None)
+        self.assertEqual("ZeroDivisionError", cells[0]["outputs"][-1]["ename"])
+        self.assertEqual([], cells[1]["outputs"])
+
+        cells = _cells("# %%\nimport time\ntime.sleep(30)\n# %%\nprint('never')\n")
+        spyondeexec.execute_cells(cells, timeout=0.5, cache_dir=None)
+        self.assertEqual("TimeoutError", cells[0]["outputs"][0]["ename"])
+        self.assertEqual([], cells[1]["outputs"])
+
+    def test_output_without_line_break(self):
+        """
+        Output written to the file descriptor without a line break does not hide the result.
+        """
+        cells = _cells("# %%\nimport os\nos.write(1, b'partial')\nprint('hi')\n# %%\nos.write(1, b'line\\n')\n")
+        spyondeexec.execute_cells(cells, timeout=10, cache_dir=None)
+        self.assertEqual(["partialhi\n"], cells[0]["outputs"][0]["text"])
+        self.assertEqual(["line\n"], cells[1]["outputs"][0]["text"])
+        self.assertEqual({"text/plain": ["5"]}, cells[1]["outputs"][1]["data"])
+
+    def test_timeout_of_printing_cell(self):
+        """
+        A cell printing all the time still times out, the timeout is for the whole cell.
+        """
+        cells = _cells("# %%\nimport time\nwhile True:\n    print('x', flush=True)\n    time.sleep(0.05)\n")
+        spyondeexec.execute_cells(cells, timeout=0.5, cache_dir=None)
+        self.assertEqual("TimeoutError", cells[0]["outputs"][0]["ename"])
+
+    def test_invalid_output_and_cache(self):
+        """
+        Output that is not UTF-8 is replaced, and a cache that can not be written is skipped.
+        """
+        cache_dir = os.path.join(self.cache_dir, "not-a-directory")
+        with open(cache_dir, "w", encoding="utf8") as handle:
+            handle.write("")
+        cells = _cells("# %%\nimport os\nos.write(1, b'a\\xff\\n')\n")
+        counts = spyondeexec.execute_cells(cells, timeout=10, cache_dir=cache_dir)
+        self.assertEqual({"cached": 0, "executed": 1}, counts)
+        self.assertEqual(["a\ufffd\n"], cells[0]["outputs"][0]["text"])
+
+    def test_only_dependents_are_executed(self):
+        """
+        After an edit, only the cells using the changed names are executed.
+        """
+        text = "# %%\nimport math\nx = 2\n# %%\ny = [1]\n# %%\nx * 10\n# %%\ny.append(2)\nlen(y)\n"
+        cells = _cells(text)
+        counts = spyondeexec.execute_cells(cells, timeout=30, cache_dir=self.cache_dir)
+        self.assertEqual({"cached": 0, "executed": 4}, counts)
+
+        cells = _cells(text.replace("x = 2", "x = 3"))
+        counts = spyondeexec.execute_cells(cells, timeout=30, cache_dir=self.cache_dir)
+        self.assertEqual({"cached": 2, "executed": 2}, counts)
+        self.assertEqual({"text/plain": ["30"]}, cells[2]["outputs"][0]["data"])
+        self.assertEqual({"text/plain": ["2"]}, cells[3]["outputs"][0]["data"])
+
+        # the unchanged dependency is run again for the state, with its cached outputs.
+        cells = _cells(text.replace("len(y)", "len(y) + 0"))
+        counts = spyondeexec.execute_cells(cells, timeout=30, cache_dir=self.cache_dir, jobs=2)
+        self.assertEqual({"cached": 3, "executed": 1}, counts)
+        self.assertEqual({"text/plain": ["2"]}, cells[3]["outputs"][0]["data"])
+
+
+class TestDependencyGraph(unittest.TestCase):
+    """
+    Tests dependency_graph() method.
+    """
+
+    def test_dependency_graph(self):
+        """
+        Names defined, modified and used make the dependencies.
+        """
+        sources = [
+            "import numpy as np\nx = 1\n",
+            "def f(a):\n    b = a + x\n    return b\n",
+            "data = np.zeros(3)\n",
+            "data[0] = f(2)\n",
+            "print(data, [b for b in range(3)])\n",
+            "from os import *\n",
+            "z = 1\n",
+        ]
+        graph = spyondeflow.dependency_graph(sources)
+        self.assertEqual({}, graph[0])
+        self.assertEqual({0: ["x"]}, graph[1])
+        self.assertEqual({0: ["np"]}, graph[2])
+        # f reads x when it is called.
+        self.assertEqual({0: ["x"], 1: ["f"], 2: ["data"]}, graph[3])
+        self.assertEqual({2: ["data"], 3: ["data"]}, graph[4])
+        self.assertEqual({0: ["*"], 1: ["*"], 2: ["*"], 3: ["*"], 4: ["*"]}, graph[5])
+        self.assertEqual({5: ["*"]}, graph[6])
+        self.assertEqual([[0, 1, 2, 3, 4]], spyondeflow.connected_groups(graph, {0, 1, 2, 3, 4}))
+        self.assertEqual([[0], [4]], spyondeflow.connected_groups(graph, {0, 4}))
+
+    def test_call_time_names(self):
+        """
+        A cell calling a function depends on the latest writers of its free names.
+        """
+        graph = spyondeflow.dependency_graph(["x = 1", "def g():\n    return x", "x = 2", "g()"])
+        self.assertEqual({0: ["x"], 1: ["g"], 2: ["x"]}, graph[3])
+
+        # methods, through an instance.
+        graph = spyondeflow.dependency_graph([
+            "y = 1", "class C:\n    def m(self, a):\n        return a + y", "o = C()", "y = 2", "o.m(1)"])
+        self.assertEqual({0: ["y"], 2: ["o"], 3: ["y"]}, graph[4])
+
+    def test_augmented_assignment(self):
+        """
+        x += 1 uses x.
+        """
+        graph = spyondeflow.dependency_graph(["x = 1", "x += 1", "print(x)"])
+        self.assertEqual({0: ["x"]}, graph[1])
+        self.assertEqual({0: ["x"], 1: ["x"]}, graph[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
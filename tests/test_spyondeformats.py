@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeformats module.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondeformats  # pylint: disable=C0413,E0402,E0401
+import spyondehtml  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+
+class TestFormats(unittest.TestCase):
+    """
+    Tests convert_file_to_formats() method.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_parse_formats(self):
+        """
+        Formats are separated by commas, unknown ones are rejected.
+        """
+        self.assertEqual(["ipynb", "md"], spyondeformats.parse_formats("ipynb, MD,ipynb,"))
+        self.assertRaises(ValueError, spyondeformats.parse_formats, "ipynb,pdf")
+
+    def test_convert_file_to_formats(self):
+        """
+        Each format is the same as its own conversion.
+        """
+        input_file_name = os.path.join(self.temp_dir, "demo.py")
+        shutil.copy(os.path.join(_MODULE_PATH, "../examples/demo.py"), input_file_name)
+
+        options = spyondemain.ConvertOptions(
+            pyversion="3.8", overwrite_confirmed=True, formats=("ipynb", "md", "html"))
+        written = spyondeformats.convert_file_to_formats(input_file_name, options)
+        self.assertEqual([input_file_name + ".gen.ipynb", input_file_name + ".gen.md",
+                          input_file_name + ".gen.html"], written)
+
+        outputs = []
+        for file_name in written:
+            with open(file_name, "r", encoding="utf8") as handle:
+                outputs.append(handle.read())
+
+        cells = spyondemain.build_cell_dicts(spyondemain.parse_cells(spyondemain.split_to_cells(input_file_name)))
+        self.assertEqual(spyondemain.serialize_notebook(cells, "3.8"), outputs[0])
+        self.assertIn('```python\n# - this is a cell without a header.\n', outputs[1])
+        self.assertIn("# Welcome to Tiny Python Introduction\n", outputs[1])
+        self.assertEqual(spyondehtml.render_slides(cells, "demo.py"), outputs[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
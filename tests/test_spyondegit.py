@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondegit module.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondegit  # pylint: disable=C0413,E0402,E0401
+
+
+class TestParseNameStatus(unittest.TestCase):
+    """
+    Tests parse_name_status() method.
+    """
+
+    def test_parse_name_status(self):
+        """
+        Tests the parse_name_status() method.
+        """
+        output = "M\0a.py\0R100\0old.py\0new.py\0D\0gone.py\0A\0b.txt\0"
+        changed, deleted = spyondegit.parse_name_status(output)
+        self.assertEqual(["a.py", "new.py", "b.txt"], changed)
+        self.assertEqual(["old.py", "gone.py"], deleted)
+
+        self.assertEqual(([], []), spyondegit.parse_name_status(""))
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class TestChangedPythonFiles(unittest.TestCase):
+    """
+    Tests changed_python_files() method on a temporary repository.
+    """
+
+    def setUp(self):
+        self.repo_dir = os.path.realpath(tempfile.mkdtemp())
+        self._git("init", "-q")
+        self._git("config", "user.email", "test@example.com")
+        self._git("config", "user.name", "test")
+        self._write("kept.py", "print(1)\n")
+        self._write("gone.py", "print(2)\n")
+        self._write("notes.txt", "notes\n")
+        self._git("add", "-A")
+        self._git("commit", "-q", "-m", "first")
+
+    def tearDown(self):
+        shutil.rmtree(self.repo_dir, ignore_errors=True)
+
+    def _git(self, *arguments):
+        subprocess.run(["git"] + list(arguments), cwd=self.repo_dir, check=True,
+                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _write(self, file_name, content):
+        with open(os.path.join(self.repo_dir, file_name), "w", encoding="utf8") as handle:
+            handle.write(content)
+
+    def test_changed_since_and_staged(self):
+        """
+        Tests the changed_python_files() and remove_stale_notebooks() methods.
+        """
+        self._write("kept.py", "print(10)\n")
+        self._write("added.py", "print(3)\n")
+        self._write("notes.txt", "changed\n")
+        self._write("gone.py.gen.ipynb", "{}")
+        os.remove(os.path.join(self.repo_dir, "gone.py"))
+        self._git("add", "added.py", "gone.py")
+
+        changed, deleted = spyondegit.changed_python_files(staged=True, cwd=self.repo_dir)
+        self.assertEqual([os.path.join(self.repo_dir, "added.py")], changed)
+        self.assertEqual([os.path.join(self.repo_dir, "gone.py")], deleted)
+
+        changed, deleted = spyondegit.changed_python_files("HEAD", cwd=self.repo_dir)
+        self.assertEqual(["added.py", "kept.py"], sorted(os.path.basename(x) for x in changed))
+
+        removed = spyondegit.remove_stale_notebooks(deleted)
+        self.assertEqual([os.path.join(self.repo_dir, "gone.py.gen.ipynb")], removed)
+        self.assertFalse(os.path.isfile(removed[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondegranularity module.
+"""
+
+import json
+import os
+import sys
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondegranularity  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+_CODE_LINES = [
+    "#%% setup",
+    "import os",
+    "import sys",
+    "",
+    "# a helper",
+    "@staticmethod",
+    "def f():",
+    "    return 1",
+    "",
+    "x = 1; y = 2",
+    "z = [",
+    "    1,",
+    "    2]",
+]
+
+
+class TestGranularity(unittest.TestCase):
+    """
+    Tests merging and splitting the cells.
+    """
+
+    def test_merge_markdown_cells(self):
+        """
+        Tests that only the consecutive markdown cells within the limit are merged.
+        """
+        data = [
+            ("markdown", ["# A"]),
+            ("markdown", ["b"]),
+            ("code", ["x = 1"]),
+            ("markdown", ["# C", "d"]),
+            ("markdown", ["e", "f", "g"]),
+        ]
+        merged = spyondegranularity.merge_markdown_cells(data, 5)
+        self.assertEqual([
+            ("markdown", ["# A", "", "b"]),
+            ("code", ["x = 1"]),
+            ("markdown", ["# C", "d"]),
+            ("markdown", ["e", "f", "g"]),
+        ], merged)
+
+    def test_statement_start_lines(self):
+        """
+        Tests that the comments and the decorators stay with their statements.
+        """
+        self.assertEqual([1, 2, 3, 8, 10], spyondegranularity.statement_start_lines(_CODE_LINES))
+        self.assertIsNone(spyondegranularity.statement_start_lines(["%matplotlib inline", "x = 1"]))
+
+    def test_split_code_cell(self):
+        """
+        Tests splitting between the top level statements.
+        """
+        parts = spyondegranularity.split_code_cell(_CODE_LINES, 5)
+        self.assertEqual([
+            ["#%% setup", "import os", "import sys"],
+            ["# a helper", "@staticmethod", "def f():", "    return 1"],
+            ["x = 1; y = 2", "z = [", "    1,", "    2]"],
+        ], parts)
+        self.assertEqual([_CODE_LINES], spyondegranularity.split_code_cell(_CODE_LINES, 20))
+        # a statement longer than the limit is not split.
+        self.assertEqual(3, len(spyondegranularity.split_code_cell(_CODE_LINES[5:], 2)))
+
+    def test_split_after_string(self):
+        """
+        Tests that the end of a string looking like a comment stays in its statement.
+        """
+        parts = spyondegranularity.split_code_cell(['a = 1', 's = """', 'text', '#"""', 'b = 2', 'c = 3'], 2)
+        self.assertEqual([["a = 1"], ['s = """', "text", '#"""'], ["b = 2", "c = 3"]], parts)
+        for part in parts:
+            compile("\n".join(part), "part", "exec")
+
+    def test_convert_text(self):
+        """
+        Tests the options of a conversion.
+        """
+        text = "#%%\n# # A\n#%%\n# b\n#%%\n" + "".join("x%d = %d\n" % (i, i) for i in range(10))
+        options = spyondemain.ConvertOptions(merge_markdown_lines=10, split_code_lines=4)
+        cells = json.loads(spyondemain.convert_text(text, options))["cells"]
+        self.assertEqual(["markdown", "code", "code", "code"], [x["cell_type"] for x in cells])
+        self.assertEqual(["x7 = 7\n", "x8 = 8\n", "x9 = 9\n"], cells[-1]["source"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondehtml module.
+"""
+
+import os
+import sys
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondehtml  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+
+class TestRenderMarkdown(unittest.TestCase):
+    """
+    Tests render_markdown() and render_inline() methods.
+    """
+
+    def test_render_inline(self):
+        """
+        Inline markup is rendered, everything else is escaped.
+        """
+        self.assertEqual(
+            'a <strong>b</strong> <em>c</em> <code>d&lt;e</code> my_var_name &amp;',
+            spyondehtml.render_inline("a **b** *c* `d<e` my_var_name &"))
+        self.assertEqual(
+            '<a href="https://en.wikipedia.org/wiki/Python_(language)">says</a>',
+            spyondehtml.render_inline("[says](https://en.wikipedia.org/wiki/Python_(language))"))
+        self.assertEqual('<a href="#">x</a>', spyondehtml.render_inline("[x](javascript:alert(1))"))
+        self.assertEqual('<img src="a.png" alt="&quot;">', spyondehtml.render_inline('![\"](a.png)'))
+
+    def test_render_markdown(self):
+        """
+        Headings, lists, paragraphs and fenced code are rendered.
+        """
+        lines = ["# Title", "", "- a", "  more", "- b", "", "text", "", "```", "x < 1", "```", "1. one"]
+        expected = "\n".join([
+            "<h1>Title</h1>",
+            "<ul>", "<li>a more</li>", "<li>b</li>", "</ul>",
+            "<p>text</p>",
+            "<pre><code>x &lt; 1</code></pre>",
+            "<ol>", "<li>one</li>", "</ol>",
+        ])
+        self.assertEqual(expected, spyondehtml.render_markdown(lines))
+
+
+class TestRenderSlides(unittest.TestCase):
+    """
+    Tests render_slides() method.
+    """
+
+    def test_render_slides(self):
+        """
+        Each cell is a slide, skipped cells are not rendered.
+        """
+        cells = spyondemain.build_cell_dicts([
+            ("markdown", ["# A <b>", "- item"]),
+            ("code", ["print('<hi>')"]),
+            ("markdown", ["skipped"]),
+        ])
+        cells[1]["outputs"] = [{"name": "stdout", "output_type": "stream", "text": ["<hi>\n"]}]
+        cells[2]["metadata"]["slideshow"]["slide_type"] = "skip"
+        page = spyondehtml.render_slides(cells, "demo & co")
+
+        self.assertEqual(2, page.count('<section class="slide">'))
+        self.assertIn("<title>demo &amp; co</title>", page)
+        self.assertIn("<h1>A &lt;b&gt;</h1>", page)
+        self.assertIn("<pre><code>print('&lt;hi&gt;')</code></pre>", page)
+        self.assertIn('<pre class="output">&lt;hi&gt;</pre>', page)
+        self.assertNotIn("skipped", page)
+        self.assertNotIn("http", page)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeindex module.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondeindex  # pylint: disable=C0413,E0402,E0401
+
+
+class TestIndex(unittest.TestCase):
+    """
+    Tests index_tree() and search() methods.
+    """
+
+    def setUp(self):
+        self.topdir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.topdir, "lecture.py")
+        self._write("# %% Generators\n# - lazy sequences\n\n"
+                    "# %% A generator function\ndef gen():\n    yield 1\n\n\n")
+        self.connection = spyondeindex.open_index(":memory:")
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.topdir, ignore_errors=True)
+
+    def _write(self, content):
+        with open(self.file_name, "w", encoding="utf8") as handle:
+            handle.write(content)
+
+    def test_catalog_cells(self):
+        """
+        Tests the catalog_cells() method.
+        """
+        rows = spyondeindex.catalog_cells(self.file_name)
+        self.assertEqual([(1, 1, 2, "markdown", "Generators"), (2, 4, 6, "code", "A generator function")],
+                         [x[:5] for x in rows])
+
+    def test_index_and_search(self):
+        """
+        Tests indexing incrementally and searching.
+        """
+        self.assertEqual((1, 0, 0), spyondeindex.index_tree(self.connection, self.topdir))
+        self.assertEqual((0, 1, 0), spyondeindex.index_tree(self.connection, self.topdir))
+
+        results = spyondeindex.search(self.connection, "generators")
+        self.assertEqual([2, 1], sorted([x[1] for x in results], reverse=True))
+        self.assertEqual(os.path.abspath(self.file_name), results[0][0])
+
+        self._write("# %% Decorators\nx = 1\n# %% Closures\ny = 2\n")
+        os.utime(self.file_name, (1, 1))
+        self.assertEqual((1, 0, 0), spyondeindex.index_tree(self.connection, self.topdir))
+        self.assertEqual([], spyondeindex.search(self.connection, "generators"))
+        self.assertEqual(1, len(spyondeindex.search(self.connection, "closures")))
+
+        os.remove(self.file_name)
+        self.assertEqual((0, 0, 1), spyondeindex.index_tree(self.connection, self.topdir))
+        self.assertEqual([], spyondeindex.search(self.connection, "closures"))
+
+
+if __name__ == '__main__':
+    unittest.main()
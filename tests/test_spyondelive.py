@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondelive module.
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondelive  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+
+_TEXT = "#%%\n# # Title\n#%%\nx = 1\n#%%\nprint(x)\n#%%\ny = 2\n"
+
+
+def apply_patch(cells, patch):
+    """
+    Applies a patch to a list of cells, as an editor plugin would.
+    """
+    if patch is not None:
+        cells[patch["start"]:patch["start"] + patch["delete"]] = patch["cells"]
+
+
+class TestLiveDocument(unittest.TestCase):
+    """
+    Tests the incremental splitting of the buffers.
+    """
+
+    def check_edit(self, document, cells, edit):
+        """
+        Applies an edit, checks that the patched cells are the same as splitting the buffer again.
+        """
+        patch = document.apply_edit(*edit)
+        apply_patch(cells, patch)
+        self.assertEqual(spyondelive.LiveDocument("\n".join(document.lines)).cells(), cells)
+        return patch
+
+    def test_cells(self):
+        """
+        Tests that the cells of a buffer are the cells of its notebook.
+        """
+        options = spyondemain.ConvertOptions(onlymulticell=False)
+        expected = json.loads(spyondemain.convert_text(_TEXT, options))["cells"]
+        self.assertEqual(expected, spyondelive.LiveDocument(_TEXT).cells())
+
+    def test_edits(self):
+        """
+        Tests that the patches only have the changed cells.
+        """
+        document = spyondelive.LiveDocument(_TEXT)
+        cells = document.cells()
+        self.assertEqual(4, len(cells))
+
+        patch = self.check_edit(document, cells, (3, 4, 3, 5, "10"))
+        self.assertEqual((1, 1), (patch["start"], patch["delete"]))
+        self.assertEqual(["x = 10\n"], patch["cells"][0]["source"])
+
+        # removing a separator merges two cells.
+        patch = self.check_edit(document, cells, (4, 0, 5, 0, ""))
+        self.assertEqual((1, 2), (patch["start"], patch["delete"]))
+        self.assertEqual(3, len(cells))
+
+        # adding one splits a cell.
+        self.check_edit(document, cells, (3, 6, 3, 6, "\n#%% new"))
+        self.assertEqual(4, len(cells))
+
+        # an unterminated string can not be tokenized, the lines are split as they are.
+        self.check_edit(document, cells, (0, 0, 0, 0, 's = """\n'))
+        self.assertFalse(document.tokenized)
+        self.assertEqual(5, len(cells))
+        patch = self.check_edit(document, cells, (0, 4, 0, 7, "1"))
+        self.assertTrue(document.tokenized)
+        self.assertEqual((0, 1), (patch["start"], patch["delete"]))
+        self.assertEqual(5, len(cells))
+
+    def test_separator_in_string(self):
+        """
+        Tests that separators in strings do not split the cells.
+        """
+        document = spyondelive.LiveDocument('#%%\ns = """\n#%%\n"""\n#%%\nx = 1\n')
+        self.assertEqual([0, 4], document.starts)
+
+    def test_indentation_between_cells(self):
+        """
+        Tests that an edit breaking the indentation of the next cell splits the whole buffer again.
+        """
+        document = spyondelive.LiveDocument("#%%\nx = 1\n#%%\n  y = 2\n")
+        cells = document.cells()
+        self.check_edit(document, cells, (1, 0, 1, 0, "if x:\n    "))
+        self.assertFalse(document.tokenized)
+
+
+class TestProtocol(unittest.TestCase):
+    """
+    Tests the JSON-RPC messages.
+    """
+
+    def test_serve(self):
+        """
+        Tests a session from open to shutdown.
+        """
+        requests = [
+            {"jsonrpc": "2.0", "id": 1, "method": "open", "params": {"uri": "a.py", "text": _TEXT}},
+            {"jsonrpc": "2.0", "id": 2, "method": "edit", "params": {"uri": "a.py", "edits": [
+                {"range": {"start": {"line": 7, "character": 4}, "end": {"line": 7, "character": 5}}, "text": "3"},
+                {"text": "#%%\nz = 1\n"}]}},
+            {"jsonrpc": "2.0", "id": 3, "method": "edit", "params": {"uri": "b.py", "edits": []}},
+            {"jsonrpc": "2.0", "id": 4, "method": "unknown"},
+            {"jsonrpc": "2.0", "method": "close", "params": {"uri": "a.py"}},
+            {"jsonrpc": "2.0", "id": 5, "method": "shutdown"},
+            {"jsonrpc": "2.0", "id": 6, "method": "cells", "params": {"uri": "a.py"}},
+        ]
+        input_stream = io.StringIO("".join(json.dumps(x) + "\n" for x in requests) + "not json\n")
+        output_stream = io.StringIO()
+        spyondelive.serve(input_stream, output_stream)
+        responses = [json.loads(x) for x in output_stream.getvalue().splitlines()]
+
+        self.assertEqual([1, 2, 3, 4, 5], [x["id"] for x in responses])
+        self.assertEqual(4, len(responses[0]["result"]["cells"]))
+        patches = responses[1]["result"]["patches"]
+        self.assertEqual(2, len(patches))
+        self.assertEqual((3, 1), (patches[0]["start"], patches[0]["delete"]))
+        self.assertEqual(1, responses[1]["result"]["cell_count"])
+        self.assertEqual(-32602, responses[2]["error"]["code"])
+        self.assertEqual(-32601, responses[3]["error"]["code"])
+        self.assertIsNone(responses[4]["result"])
+
+    def test_invalid_params(self):
+        """
+        Tests that the parameters of the wrong types are reported, and the server keeps running.
+        """
+        requests = [
+            {"jsonrpc": "2.0", "id": 1, "method": "open", "params": {"uri": ["a.py"], "text": ""}},
+            {"jsonrpc": "2.0", "id": 2, "method": "open", "params": {"uri": "a.py", "text": _TEXT}},
+            {"jsonrpc": "2.0", "id": 3, "method": "edit", "params": {"uri": "a.py", "edits": [{"text": 5}]}},
+            {"jsonrpc": "2.0", "id": 4, "method": "edit", "params": {"uri": "a.py", "edits": [
+                {"range": {"start": {"line": "1", "character": 0}, "end": {"line": 1, "character": 0}},
+                 "text": ""}]}},
+            {"jsonrpc": "2.0", "id": 5, "method": "edit", "params": {"uri": "a.py", "edits": [
+                {"range": {"start": {"line": 0, "character": 0}}, "text": ""}]}},
+            {"jsonrpc": "2.0", "id": 6, "method": "cells", "params": {"uri": {}}},
+            {"jsonrpc": "2.0", "id": 7, "method": "edit", "params": {"uri": "a.py", "edits": {}}},
+            {"jsonrpc": "2.0", "id": 8, "method": "cells", "params": {"uri": "a.py"}},
+        ]
+        input_stream = io.StringIO("".join(json.dumps(x) + "\n" for x in requests))
+        output_stream = io.StringIO()
+        spyondelive.serve(input_stream, output_stream)
+        responses = [json.loads(x) for x in output_stream.getvalue().splitlines()]
+
+        self.assertEqual(list(range(1, 9)), [x["id"] for x in responses])
+        for index in [0, 2, 3, 4, 5, 6]:
+            self.assertEqual(-32602, responses[index]["error"]["code"])
+        self.assertEqual(4, len(responses[7]["result"]["cells"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
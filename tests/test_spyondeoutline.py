@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeoutline module.
+"""
+
+import os
+import sys
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondeindex  # pylint: disable=C0413,E0402,E0401
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+import spyondeoutline  # pylint: disable=C0413,E0402,E0401
+
+
+class TestOutline(unittest.TestCase):
+    """
+    Tests outline_text() and outline_file() methods.
+    """
+
+    def test_outline_text(self):
+        """
+        Tests the outline_text() method.
+        """
+        text = "import os\n\n# %% Title\n# - item\n\n\n#%%\nprint(1)\n# spyonde:ignore-cell\n"
+        expected = [
+            {"number": 1, "start_line": 1, "end_line": 1, "cell_type": "code", "title": ""},
+            {"number": 2, "start_line": 3, "end_line": 4, "cell_type": "markdown", "title": "Title"},
+            {"number": None, "start_line": 7, "end_line": 9, "cell_type": "ignored", "title": ""},
+        ]
+        self.assertEqual(expected, spyondeoutline.outline_text(text))
+
+        # the numbers of the cells after an ignored cell are their numbers in the notebook.
+        outline = spyondeoutline.outline_text(text + "#%%\nprint(2)\n")
+        self.assertEqual([1, 2, None, 3], [x["number"] for x in outline])
+
+    def test_outline_text_while_editing(self):
+        """
+        A buffer that can not be tokenized still has an outline.
+        """
+        text = "x = (\n# %% one\ny = 1\n# %% two\n"
+        actual = [x["title"] for x in spyondeoutline.outline_text(text)]
+        self.assertEqual(["", "one", "two"], actual)
+
+    def test_outline_file_matches_notebook(self):
+        """
+        The cells in the outline are the cells in the notebook.
+        """
+        file_name = os.path.join(_MODULE_PATH, "../examples/demo.py")
+        outline = spyondeoutline.outline_file(file_name)
+        data = spyondemain.parse_cells(spyondemain.split_to_cells(file_name))
+        actual = [x["cell_type"] for x in outline if x["cell_type"] != "ignored"]
+        self.assertEqual([x[0] for x in data], actual)
+
+    def test_outline_numbers_match_search(self):
+        """
+        The outline and the search catalog number the cells the same way.
+        """
+        file_name = os.path.join(_MODULE_PATH, "../examples/demo.py")
+        outline = spyondeoutline.outline_file(file_name)
+        actual = [(x["number"], x["start_line"]) for x in outline if x["number"] is not None]
+        expected = [(x[0], x[1]) for x in spyondeindex.catalog_cells(file_name)]
+        self.assertEqual(expected, actual)
+
+
+if __name__ == '__main__':
+    unittest.main()
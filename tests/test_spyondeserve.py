@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeserve module.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondeserve  # pylint: disable=C0413,E0402,E0401
+
+
+class TestServe(unittest.TestCase):
+    """
+    Tests the preview server.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.temp_dir, "lecture.py")
+        self.write("#%%\n# # Title\n#%%\nprint(1)\n")
+        self.server = spyondeserve.make_server(self.temp_dir, port=0, cache_size=2)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.base_url = "http://127.0.0.1:%d/" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, text):
+        """
+        Writes the lecture, with a new modification time.
+        """
+        mtime = os.stat(self.file_name).st_mtime_ns if os.path.isfile(self.file_name) else 0
+        with open(self.file_name, "w", encoding="utf8") as handle:
+            handle.write(text)
+        os.utime(self.file_name, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+    def request(self, path, etag=None):
+        """
+        Returns (status, headers, body) of a GET request.
+        """
+        request = urllib.request.Request(self.base_url + path)
+        if etag:
+            request.add_header("If-None-Match", etag)
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as ex:
+            return ex.code, ex.headers, ex.read()
+
+    def test_etag(self):
+        """
+        Tests that unchanged lectures get 304, and changed ones are converted again.
+        """
+        status, headers, body = self.request("lecture.py")
+        self.assertEqual(200, status)
+        self.assertEqual(2, len(json.loads(body.decode("utf8"))["cells"]))
+        etag = headers["ETag"]
+
+        status, _, body = self.request("lecture.py", etag)
+        self.assertEqual(304, status)
+        self.assertEqual(b"", body)
+        self.assertEqual(1, self.server.cache.hits)
+
+        self.write("#%%\n# # Title\n#%%\nprint(2)\n#%%\nprint(3)\n")
+        status, headers, body = self.request("lecture.py", etag)
+        self.assertEqual(200, status)
+        self.assertNotEqual(etag, headers["ETag"])
+        self.assertEqual(3, len(json.loads(body.decode("utf8"))["cells"]))
+
+    def test_not_found(self):
+        """
+        Tests that the files outside the directory and the other files are not served.
+        """
+        self.assertEqual(404, self.request("missing.py")[0])
+        self.assertEqual(404, self.request("..%2f..%2fetc%2fpasswd")[0])
+        status, _, body = self.request("")
+        self.assertEqual(200, status)
+        self.assertIn(b'href="/lecture.py"', body)
+
+    def test_includes(self):
+        """
+        Tests that an edit of an included file converts the lecture again,
+        and the files outside the directory can not be included.
+        """
+        include_file_name = os.path.join(self.temp_dir, "setup.py")
+        with open(include_file_name, "w", encoding="utf8") as handle:
+            handle.write("x = 1\n")
+        self.write("#%%\n# # Title\n#%%\n# spyonde:include setup.py\n#%%\nprint(x)\n")
+        status, headers, body = self.request("lecture.py")
+        self.assertEqual(200, status)
+        self.assertIn("x = 1", body.decode("utf8"))
+        etag = headers["ETag"]
+
+        mtime = os.stat(include_file_name).st_mtime_ns
+        with open(include_file_name, "w", encoding="utf8") as handle:
+            handle.write("x = 2\n")
+        os.utime(include_file_name, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+        status, headers, body = self.request("lecture.py", etag)
+        self.assertEqual(200, status)
+        self.assertNotEqual(etag, headers["ETag"])
+        self.assertIn("x = 2", body.decode("utf8"))
+
+        self.write("#%%\n# # Title\n#%%\n# spyonde:include ../outside.py\n")
+        status, _, body = self.request("lecture.py")
+        self.assertEqual(500, status)
+        self.assertIn(b"outside", body)
+
+    def test_lru(self):
+        """
+        Tests that the least recently used notebooks are removed from the cache.
+        """
+        cache = spyondeserve.NotebookCache(2)
+        for name in ["a.py", "b.py", "c.py"]:
+            with open(os.path.join(self.temp_dir, name), "w", encoding="utf8") as handle:
+                handle.write("x = 1\n")
+            cache.get(os.path.join(self.temp_dir, name))
+        self.assertEqual(["b.py", "c.py"], [os.path.basename(x) for x in cache.entries])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondeshard module.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+import spyondeshard  # pylint: disable=C0413,E0402,E0401
+
+
+class TestShardCells(unittest.TestCase):
+    """
+    Tests shard_cells() method.
+    """
+
+    def test_shard_cells(self):
+        """
+        Shards start at headings and are limited by the number of cells.
+        """
+        data = [
+            ("markdown", ["# First", "- text"]),
+            ("code", ["x = 1"]),
+            ("code", ["y = 2"]),
+            ("code", ["z = 3"]),
+            ("markdown", ["# Second"]),
+            ("markdown", ["## Not a top level heading"]),
+        ]
+        cells = spyondemain.build_cell_dicts(data)
+        self.assertEqual([6], [len(x) for x in spyondeshard.shard_cells(cells)])
+        self.assertEqual([4, 2], [len(x) for x in spyondeshard.shard_cells(cells, by_heading=True)])
+        shards = spyondeshard.shard_cells(cells, max_cells=3, by_heading=True)
+        self.assertEqual([3, 1, 2], [len(x) for x in shards])
+        self.assertEqual(["First", "Part 2", "Second"],
+                         [spyondeshard.shard_title(x, i + 1) for i, x in enumerate(shards)])
+        max_bytes = spyondeshard.cell_size(cells[1]) * 2
+        shards = spyondeshard.shard_cells(cells, max_bytes=max_bytes)
+        self.assertEqual(cells, [x for shard in shards for x in shard])
+        for shard in shards:
+            self.assertLessEqual(sum(spyondeshard.cell_size(x) for x in shard), max_bytes)
+
+
+class TestConvertFileSharded(unittest.TestCase):
+    """
+    Tests convert_file_sharded() method.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_linked_shards(self):
+        """
+        An index notebook and linked shards are written.
+        """
+        input_file_name = os.path.join(self.temp_dir, "lecture.py")
+        with open(input_file_name, "w", encoding="utf8") as handle:
+            handle.write("# %% One\n# text\n# %%\nx = 1\n# %% Two\n# text\n# %%\ny = 2\n# %% Three\n")
+
+        options = spyondemain.ConvertOptions(overwrite_confirmed=True, shard_headings=True)
+        written = spyondeshard.convert_file_sharded(input_file_name, options)
+        output_file_name = input_file_name + ".gen.ipynb"
+        self.assertEqual(output_file_name, written[0])
+        self.assertEqual(4, len(written))
+
+        with open(output_file_name, "r", encoding="utf8") as handle:
+            index = json.load(handle)
+        self.assertEqual(
+            ["# lecture.py.gen.ipynb\n", "\n",
+             "1. [One](lecture.py.gen.part001.ipynb)\n",
+             "2. [Two](lecture.py.gen.part002.ipynb)\n",
+             "3. [Three](lecture.py.gen.part003.ipynb)\n"],
+            index["cells"][0]["source"])
+
+        with open(written[2], "r", encoding="utf8") as handle:
+            shard = json.load(handle)
+        navigation = ["[Previous](lecture.py.gen.part001.ipynb) | [Index](lecture.py.gen.ipynb)"
+                      " | [Next](lecture.py.gen.part003.ipynb)\n"]
+        self.assertEqual(navigation, shard["cells"][0]["source"])
+        self.assertEqual(navigation, shard["cells"][-1]["source"])
+        self.assertEqual(["y = 2\n"], shard["cells"][2]["source"])
+
+    def test_fewer_shards(self):
+        """
+        The shards of an earlier conversion with more shards are removed.
+        """
+        input_file_name = os.path.join(self.temp_dir, "lecture.py")
+        with open(input_file_name, "w", encoding="utf8") as handle:
+            handle.write("# %% One\n# %%\nx = 1\n# %% Two\n# %%\ny = 2\n# %% Three\n")
+        options = spyondemain.ConvertOptions(overwrite_confirmed=True, shard_headings=True, keep_outputs=True)
+        self.assertEqual(4, len(spyondeshard.convert_file_sharded(input_file_name, options)))
+
+        with open(input_file_name, "w", encoding="utf8") as handle:
+            handle.write("# %% One\n# %%\nx = 1\n")
+        self.assertEqual(2, len(spyondeshard.convert_file_sharded(input_file_name, options)))
+        output_file_name = input_file_name + ".gen.ipynb"
+        self.assertTrue(os.path.isfile(spyondeshard.generate_shard_file_name(output_file_name, 1)))
+        self.assertFalse(os.path.exists(spyondeshard.generate_shard_file_name(output_file_name, 2)))
+        self.assertFalse(os.path.exists(spyondeshard.generate_shard_file_name(output_file_name, 3)))
+        self.assertEqual(4, len(spyondeshard.read_previous_shard_cells(output_file_name)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondesidecar module.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+import spyondesidecar  # pylint: disable=C0413,E0402,E0401
+
+
+def run_cell(cell, working_dir):
+    """
+    Runs the source of a cell in working_dir, returns its namespace.
+    """
+    namespace = {}
+    current_dir = os.getcwd()
+    os.chdir(working_dir)
+    try:
+        exec("".join(cell["source"]), namespace)  # pylint: disable=W0122
+    finally:
+        os.chdir(current_dir)
+    return namespace
+
+
+class TestSidecar(unittest.TestCase):
+    """
+    Tests moving huge cells to sidecar files.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_cell_literal(self):
+        """
+        Tests finding the literals that can be stored as JSON.
+        """
+        self.assertEqual(("table", [1, "a", None]), spyondesidecar.cell_literal("# t\ntable = [1, 'a', None]\n"))
+        self.assertEqual(("d", {"a": [1.5]}), spyondesidecar.cell_literal("d = {'a': [1.5]}"))
+        self.assertIsNone(spyondesidecar.cell_literal("t = [(1, 2)]"))
+        self.assertIsNone(spyondesidecar.cell_literal("d = {1: 2}"))
+        self.assertIsNone(spyondesidecar.cell_literal("x = 1"))
+        self.assertIsNone(spyondesidecar.cell_literal("a = [1]\nb = [2]"))
+        self.assertIsNone(spyondesidecar.cell_literal("a = [f(1)]"))
+        self.assertIsNone(spyondesidecar.cell_literal("a = ["))
+
+    def test_externalize_cells(self):
+        """
+        Tests that the loaders give the same values as the cells.
+        """
+        table = list(range(500))
+        rows = {(i, i): i for i in range(200)}
+        cells = spyondemain.build_cell_dicts([
+            ("code", ["# the table", "table = %r" % table]),
+            ("code", ["rows = %r" % rows]),
+            ("code", ["small = [1]"]),
+            ("markdown", ["# " + "x" * 2000]),
+        ])
+        count = spyondesidecar.externalize_cells(cells, self.temp_dir, 1000)
+        self.assertEqual(2, count)
+        self.assertEqual("# the table\n", cells[0]["source"][0])
+        self.assertIn("json.load(handle)", cells[0]["source"][-1])
+        self.assertIn("exec(", cells[1]["source"][-1])
+        self.assertEqual(["small = [1]\n"], cells[2]["source"])
+        self.assertEqual(2, len(os.listdir(os.path.join(self.temp_dir, spyondesidecar.SIDECAR_DIR_NAME))))
+
+        self.assertEqual(table, run_cell(cells[0], self.temp_dir)["table"])
+        self.assertEqual(rows, run_cell(cells[1], self.temp_dir)["rows"])
+
+    def test_convert_file(self):
+        """
+        Tests that the loaders are stable between the conversions.
+        """
+        input_file_name = os.path.join(self.temp_dir, "generated.py")
+        with open(input_file_name, "w", encoding="utf8") as handle:
+            handle.write("#%%\ndata = {\n" + "".join('    "k%d": %d,\n' % (i, i) for i in range(100)) + "}\n#%%\nprint(len(data))\n")
+
+        options = spyondemain.ConvertOptions(externalize_bytes=500)
+        _, first = spyondemain.file_to_notebook(input_file_name, options)
+        _, second = spyondemain.file_to_notebook(input_file_name, options)
+        self.assertEqual(first, second)
+        cells = json.loads(first)["cells"]
+        self.assertEqual(2, len(cells))
+        self.assertEqual(100, len(run_cell(cells[0], self.temp_dir)["data"]))
+
+        _, plain = spyondemain.file_to_notebook(input_file_name, spyondemain.ConvertOptions())
+        self.assertGreater(len(plain), len(first))
+
+    def test_output_in_other_directory(self):
+        """
+        Tests that a notebook is not written away from its sidecar files.
+        """
+        input_file_name = os.path.join(self.temp_dir, "generated.py")
+        with open(input_file_name, "w", encoding="utf8") as handle:
+            handle.write("#%%\ndata = [" + "1, " * 500 + "]\n#%%\nprint(len(data))\n")
+        os.makedirs(os.path.join(self.temp_dir, "out"))
+        output_file_name = os.path.join(self.temp_dir, "out", "generated.ipynb")
+        options = spyondemain.ConvertOptions(
+            output=output_file_name, overwrite_confirmed=True, externalize_bytes=500)
+        self.assertIsNone(spyondemain.convert_file(input_file_name, options))
+        self.assertFalse(os.path.exists(output_file_name))
+
+        output_file_name = os.path.join(self.temp_dir, "generated.ipynb")
+        options = options._replace(output=output_file_name)
+        self.assertIsNotNone(spyondemain.convert_file(input_file_name, options))
+        self.assertTrue(os.path.exists(output_file_name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondetopy module.
+"""
+
+import io
+import json
+import os
+import sys
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+import spyondetopy  # pylint: disable=C0413,E0402,E0401
+
+
+class TestRoundTrip(unittest.TestCase):
+    """
+    Tests py -> ipynb -> py conversions.
+    """
+
+    def test_examples_round_trip(self):
+        """
+        Converting the generated .py file again gives the same notebook.
+        """
+        options = spyondemain.ConvertOptions(pyversion="3.8", onlymulticell=False)
+        examples_dir = os.path.join(_MODULE_PATH, "../examples")
+        for file_name in sorted(os.listdir(examples_dir)):
+            if not file_name.endswith(".py"):
+                continue
+            file_path = os.path.join(examples_dir, file_name)
+            notebook = spyondemain.file_to_notebook(file_path, options)[1]
+
+            py_text = spyondetopy.notebook_to_py(io.StringIO(notebook))
+            self.assertEqual(notebook, spyondemain.convert_text(py_text, options), file_name)
+
+            # and the .py file is stable from then on.
+            notebook2 = spyondemain.convert_text(py_text, options)
+            self.assertEqual(py_text, spyondetopy.notebook_to_py(io.StringIO(notebook2)), file_name)
+
+    def test_cell_to_py_lines(self):
+        """
+        Tests the cell_to_py_lines() method.
+        """
+        actual = spyondetopy.cell_to_py_lines("markdown", ["# Python strings", "", " - immutable"])
+        self.assertEqual(["# %% Python strings", "", "# - immutable"], actual)
+
+        actual = spyondetopy.cell_to_py_lines("code", ['s1 = "stuff"', ""])
+        self.assertEqual(["# %%", 's1 = "stuff"', "", ""], actual)
+
+        # the first line of a raw cell is not a title.
+        actual = spyondetopy.cell_to_py_lines("raw", ["# not a title", "", ".. raw text"])
+        self.assertEqual(["# %%", "## not a title", "", "#.. raw text"], actual)
+
+        with self.assertRaises(ValueError):
+            spyondetopy.cell_to_py_lines("heading", ["x"])
+
+
+class TestJsonStreamReader(unittest.TestCase):
+    """
+    Tests JsonStreamReader class.
+    """
+
+    def test_small_chunks(self):
+        """
+        Values split between chunks are read correctly.
+        """
+        document = {"a": ['x"y\\ç', 1.5e3, -2, True, False, None, {}, []], "b": {"c": "\n"}}
+        text = json.dumps(document)
+        for chunk_size in [1, 2, 3, 5, 64]:
+            reader = spyondetopy.JsonStreamReader(io.StringIO(text), chunk_size)
+            self.assertEqual(document, reader.read_value())
+
+    def test_outputs_are_skipped(self):
+        """
+        Only the cell types and sources are returned.
+        """
+        notebook = {
+            "cells": [
+                {"cell_type": "code", "execution_count": 1, "metadata": {},
+                 "outputs": [{"data": {"image/png": "QUJD" * 100000}, "output_type": "display_data"}],
+                 "source": ["print(1)\n", "print(2)"]},
+                {"cell_type": "markdown", "metadata": {}, "source": "# Title\n- item"},
+            ],
+            "metadata": {}, "nbformat": 4, "nbformat_minor": 2,
+        }
+        handle = io.StringIO(json.dumps(notebook))
+        actual = list(spyondetopy.iter_notebook_cells(handle))
+        expected = [("code", ["print(1)", "print(2)"]), ("markdown", ["# Title", "- item"])]
+        self.assertEqual(expected, actual)
+
+    def test_malformed_cells(self):
+        """
+        Cells without a valid cell_type or source raise ValueError.
+        """
+        for cell in [{"source": "x"}, {"cell_type": 1, "source": "x"}, {"cell_type": "heading", "source": "x"},
+                     {"cell_type": "code", "source": 1}, {"cell_type": "code", "source": ["x", None]}]:
+            handle = io.StringIO(json.dumps({"cells": [{"cell_type": "code", "source": ""}, cell]}))
+            with self.assertRaises(ValueError) as context:
+                list(spyondetopy.iter_notebook_cells(handle))
+            self.assertIn("cell 1 ", str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""
+Includes tests for spyondevalidate module.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+# add current directory to sys.path
+_MODULE_PATH = os.path.dirname(os.path.realpath(__file__))
+if _MODULE_PATH not in sys.path:
+    sys.path.append(_MODULE_PATH)
+
+# add spyonde directory to sys.path
+_SPYONDE_DIR = os.path.abspath(os.path.join(_MODULE_PATH, "../spyonde"))
+if _SPYONDE_DIR not in sys.path:
+    sys.path.append(_SPYONDE_DIR)
+
+import spyondemain  # pylint: disable=C0413,E0402,E0401
+import spyondevalidate  # pylint: disable=C0413,E0402,E0401
+
+
+class TestValidate(unittest.TestCase):
+    """
+    Tests the validation of notebooks.
+    """
+
+    def setUp(self):
+        data = [("markdown", ["# Title"]), ("code", ["print(1)"])]
+        self.output_as_str = spyondemain.serialize_notebook(spyondemain.build_cell_dicts(data), "3.7.4")
+
+    def test_generated_notebook_is_valid(self):
+        """
+        Tests that the notebooks Spyonde writes have no errors.
+        """
+        self.assertEqual(spyondevalidate.validate_notebook_json(self.output_as_str), [])
+
+    def test_invalid_cells(self):
+        """
+        Tests that broken cells are reported with their positions.
+        """
+        notebook = json.loads(self.output_as_str)
+        del notebook["cells"][1]["outputs"]
+        notebook["cells"][0]["id"] = "abc"
+        notebook["cells"][1]["execution_count"] = -1
+        errors = spyondevalidate.validate_notebook(notebook)
+        self.assertIn("cells[1]: missing outputs", errors)
+        self.assertIn("cells[0]: id is not allowed before nbformat 4.5", errors)
+        self.assertIn("cells[1]: execution_count must be null or a non-negative integer", errors)
+
+    def test_invalid_output(self):
+        """
+        Tests the validation of outputs.
+        """
+        output = {"output_type": "stream", "name": "stdin", "text": ["a"]}
+        self.assertEqual(spyondevalidate.validate_output(output, "x"), ["x: name must be stdout or stderr"])
+        output = {"output_type": "display_data", "data": {"text/plain": ["a"]}, "metadata": {}}
+        self.assertEqual(spyondevalidate.validate_output(output, "x"), [])
+
+    def test_invalid_json(self):
+        """
+        Tests that a broken JSON string is reported.
+        """
+        errors = spyondevalidate.validate_notebook_json(self.output_as_str[:-10])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("invalid JSON"))
+
+    def test_validate_option(self):
+        """
+        Tests that invalid notebooks are not written with --validate.
+        """
+        options = spyondemain.ConvertOptions(validate=True)
+        self.assertTrue(spyondemain.notebook_is_valid("a.ipynb", self.output_as_str, options))
+        self.assertFalse(spyondemain.notebook_is_valid("a.ipynb", "{}", options))
+        self.assertTrue(spyondemain.notebook_is_valid("a.ipynb", "{}", spyondemain.ConvertOptions()))
+
+
+class TestFindNotebookFiles(unittest.TestCase):
+    """
+    Tests searching notebooks in directories.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_find_notebook_files(self):
+        """
+        Tests that hidden directories and other files are skipped.
+        """
+        for name in ["a.ipynb", "b.py", os.path.join("sub", "c.ipynb"),
+                     os.path.join(".ipynb_checkpoints", "a.ipynb")]:
+            file_name = os.path.join(self.temp_dir, name)
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            with open(file_name, "w", encoding="utf8") as handle:
+                handle.write("{}")
+        names = [os.path.relpath(x, self.temp_dir) for x in spyondevalidate.find_notebook_files([self.temp_dir])]
+        self.assertEqual(names, ["a.ipynb", os.path.join("sub", "c.ipynb")])
+
+
+if __name__ == '__main__':
+    unittest.main()